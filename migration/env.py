@@ -10,9 +10,13 @@ from src.config import DATABASE_URL
 from src.database import Base
 from src.directions.models import Directions
 from src.expenses.models import Expense, order_expenses
+from src.exports.models import ExportJob
 from src.geography.models import City, District
+from src.notification.models import NotificationOutbox
 from src.orders.models import OrderItems, Orders, Payment
 from src.shipping.models import Shipping, ShippingRespond
+from src.statistics.models import (CourierDailyCounters, OrderDailyStatistics,
+                                   ShippingDailyStatistics, StatisticsDirtyDay)
 from src.tarifs.models import Tarifs
 from src.transportation_types.models import TransportationTypeDB
 from src.users.models import (EmailCode, Group, OTPSigningCode, Permission,
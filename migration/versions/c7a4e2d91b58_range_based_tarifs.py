@@ -0,0 +1,104 @@
+"""range based tarifs
+
+Revision ID: c7a4e2d91b58
+Revises: b3e19f4d2c6a
+Create Date: 2024-04-29 10:14:56.203118
+
+"""
+import math
+from itertools import groupby
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a4e2d91b58'
+down_revision: Union[str, None] = 'b3e19f4d2c6a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+tarifs = sa.table(
+    'tarifs',
+    sa.column('id', sa.Integer),
+    sa.column('calculation_type', sa.String),
+    sa.column('direction_id', sa.Integer),
+    sa.column('start_amount', sa.Integer),
+    sa.column('end_amount', sa.Integer),
+    sa.column('price', sa.Float),
+    sa.column('increment', sa.Float),
+    sa.column('is_limit', sa.Boolean),
+)
+
+
+def compact_tarifs() -> None:
+    """Merges runs of consecutive amounts whose price grows by a constant step into one range."""
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(
+        tarifs.c.id, tarifs.c.calculation_type, tarifs.c.direction_id, tarifs.c.start_amount,
+        tarifs.c.price, sa.func.coalesce(tarifs.c.is_limit, False).label('is_limit')
+    ).order_by(
+        tarifs.c.calculation_type, tarifs.c.direction_id, sa.text('is_limit'), tarifs.c.start_amount
+    )).all()
+    ranges = []
+    merged_ids = []
+    for _, group in groupby(rows, key=lambda row: (row.calculation_type, row.direction_id, row.is_limit)):
+        current = None
+        for row in group:
+            if current is not None and row.start_amount == current['end_amount'] + 1:
+                step = row.price - current['last_price']
+                is_single = current['end_amount'] == current['start_amount']
+                if is_single or math.isclose(step, current['increment'], abs_tol=1e-6):
+                    if is_single:
+                        current['increment'] = step
+                    current['end_amount'] = row.start_amount
+                    current['last_price'] = row.price
+                    merged_ids.append(row.id)
+                    continue
+            current = {'tarif_id': row.id, 'start_amount': row.start_amount, 'end_amount': row.start_amount,
+                       'increment': 0.0, 'last_price': row.price}
+            ranges.append(current)
+    if merged_ids:
+        bind.execute(tarifs.delete().where(tarifs.c.id.in_(merged_ids)))
+    if ranges:
+        bind.execute(
+            tarifs.update().where(tarifs.c.id == sa.bindparam('tarif_id')).values(
+                end_amount=sa.bindparam('end_amount'), increment=sa.bindparam('increment')),
+            [{'tarif_id': r['tarif_id'], 'end_amount': r['end_amount'], 'increment': r['increment']} for r in ranges]
+        )
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_constraint('idx_tarifs_calculation_type_direction_id_amount', 'tarifs', type_='unique')
+    op.alter_column('tarifs', 'amount', new_column_name='start_amount')
+    op.add_column('tarifs', sa.Column('end_amount', sa.Integer(), nullable=True))
+    op.add_column('tarifs', sa.Column('increment', sa.Float(), server_default=sa.text('0'), nullable=False))
+    op.execute('UPDATE tarifs SET end_amount = start_amount')
+    compact_tarifs()
+    op.alter_column('tarifs', 'end_amount', nullable=False)
+    op.create_unique_constraint('idx_tarifs_calculation_type_direction_id_start_amount', 'tarifs',
+                                ['calculation_type', 'direction_id', 'start_amount'])
+    op.create_check_constraint('check_tarifs_range', 'tarifs', 'end_amount >= start_amount')
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_constraint('check_tarifs_range', 'tarifs', type_='check')
+    op.drop_constraint('idx_tarifs_calculation_type_direction_id_start_amount', 'tarifs', type_='unique')
+    op.execute(
+        """
+        INSERT INTO tarifs (calculation_type, direction_id, start_amount, end_amount, price, increment, is_limit)
+        SELECT calculation_type, direction_id, amount, amount, price + (amount - start_amount) * increment, 0, is_limit
+        FROM tarifs, generate_series(start_amount + 1, end_amount) AS amount
+        WHERE end_amount > start_amount
+        """
+    )
+    op.drop_column('tarifs', 'increment')
+    op.drop_column('tarifs', 'end_amount')
+    op.alter_column('tarifs', 'start_amount', new_column_name='amount')
+    op.create_unique_constraint('idx_tarifs_calculation_type_direction_id_amount', 'tarifs',
+                                ['calculation_type', 'direction_id', 'amount'])
+    # ### end Alembic commands ###
@@ -1,5 +1,8 @@
-from fastapi import Depends, HTTPException
-from sqlalchemy import select
+from datetime import datetime
+
+from fastapi import Depends
+from sqlalchemy import (DateTime, Integer, String, and_, cast, column, exists,
+                        insert, literal, or_, select, values)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.action_history.models import (ACTION_CODE_TO_ACTION_DESCRIPTION,
@@ -14,59 +17,93 @@ from src.warehouse.models import Warehouse
 
 
 class ActionHistoryService:
-    async def get_action_code_description(self, action: ActionHistoryCreate, db: AsyncSession = Depends(get_db)) -> str:
+    def format_action_description(self, action: ActionHistoryCreate, users: dict[int, Users],
+                                  warehouses: dict[int, Warehouse], cities: dict[int, City]) -> str:
+        template = ACTION_CODE_TO_ACTION_DESCRIPTION[action.action_code]
         if (action.action_code == ActionCode.MANAGER_APPROVED):
-            manager = await db.execute(select(Users).where(Users.id == action.manager_id))
-            manager = manager.scalar_one_or_none()
-            action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[
-                action.action_code] % manager.full_name
+            return template % users[action.manager_id].full_name
         elif (action.action_code in [ActionCode.COURIER_DELIVERING_TO_WAREHOUSE, ActionCode.DELIVERING_TO_RECIPIENT]):
-            courier = await db.execute(select(Users).where(Users.id == action.courier_id))
-            courier = courier.scalar_one_or_none()
-            action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[
-                action.action_code] % courier.fl_name
+            return template % users[action.courier_id].fl_name
         elif (action.action_code in [ActionCode.ACCEPTED_TO_WAREHOUSE, ActionCode.ARRIVED_TO_DESTINATION]):
-            warehouse = await db.execute(select(Warehouse).where(Warehouse.id == action.warehouse_id))
-            warehouse = warehouse.scalar_one_or_none()
-            city = await db.execute(select(City).where(City.id == warehouse.city))
-            city = city.scalar_one_or_none()
-            manager = await db.execute(select(Users).where(Users.id == action.warehouse_manager_id))
-            manager = manager.scalar_one_or_none()
-            action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[action.action_code] % (
-                warehouse.name, city.name, manager.fl_name)
+            warehouse = warehouses[action.warehouse_id]
+            return template % (warehouse.name, cities[warehouse.city].name, users[action.warehouse_manager_id].fl_name)
         elif (action.action_code == ActionCode.DELIVERED):
-            courier = await db.execute(select(Users).where(Users.id == action.courier_id))
-            courier = courier.scalar_one_or_none()
-            if courier:
-                action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[
-                    action.action_code] % courier.fl_name
-            else:
-                action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[
-                    action.action_code] % "Самовывоз"
-        else:
-            action_description = ACTION_CODE_TO_ACTION_DESCRIPTION[action.action_code]
-        return action_description
+            courier = users.get(action.courier_id)
+            return template % (courier.fl_name if courier else "Самовывоз")
+        return template
 
-    async def add_action(self, action: ActionHistoryCreate, db: AsyncSession = Depends(get_db)):
-        if action.order_item_id:
-            action_history_db = (await db.execute(select(ActionHistory).where(ActionHistory.order_item_id == action.order_item_id).where(
-                ActionHistory.action_code == action.action_code.value))).scalars()
-            action_history_db = action_history_db.first()
-        elif action.order_id:
-            action_history_db = (await db.execute(select(ActionHistory).where(ActionHistory.order_id == action.order_id).where(
-                ActionHistory.action_code == action.action_code.value))).scalars()
-            action_history_db = action_history_db.first()
-        action_description = await self.get_action_code_description(action, db)
-        action_history = ActionHistory(
-            **action.dict(exclude={"action_code"}),
-            action_code=action.action_code.value,
-            action_description=action_description
+    async def get_action_descriptions(self, actions: list[ActionHistoryCreate], db: AsyncSession = Depends(get_db)) -> list[str]:
+        user_ids = {user_id for action in actions
+                    for user_id in (action.manager_id, action.courier_id, action.warehouse_manager_id) if user_id}
+        warehouse_ids = {action.warehouse_id for action in actions if action.warehouse_id}
+        users = {}
+        if user_ids:
+            users = await db.execute(select(Users).where(Users.id.in_(user_ids)))
+            users = {user.id: user for user in users.scalars().all()}
+        warehouses = {}
+        if warehouse_ids:
+            warehouses = await db.execute(select(Warehouse).where(Warehouse.id.in_(warehouse_ids)))
+            warehouses = {warehouse.id: warehouse for warehouse in warehouses.scalars().all()}
+        city_ids = {warehouse.city for warehouse in warehouses.values() if warehouse.city}
+        cities = {}
+        if city_ids:
+            cities = await db.execute(select(City).where(City.id.in_(city_ids)))
+            cities = {city.id: city for city in cities.scalars().all()}
+        return [self.format_action_description(action, users, warehouses, cities) for action in actions]
+
+    async def get_action_code_description(self, action: ActionHistoryCreate, db: AsyncSession = Depends(get_db)) -> str:
+        return (await self.get_action_descriptions([action], db))[0]
+
+    async def add_actions_bulk(self, actions: list[ActionHistoryCreate], db: AsyncSession = Depends(get_db)):
+        """Writes many events in one INSERT ... SELECT without committing.
+
+        An event is skipped when its order item (or order, for order level
+        events) already has a row with the same action code, the same rule
+        add_action has always applied.
+        """
+        unique_actions = {}
+        for action in actions:
+            key = (action.order_item_id, None if action.order_item_id else action.order_id, action.action_code)
+            unique_actions.setdefault(key, action)
+        actions = list(unique_actions.values())
+        if not actions:
+            return
+        descriptions = await self.get_action_descriptions(actions, db)
+        rows = values(
+            column("client_id", Integer),
+            column("courier_id", Integer),
+            column("manager_id", Integer),
+            column("warehouse_id", Integer),
+            column("warehouse_manager_id", Integer),
+            column("order_item_id", Integer),
+            column("order_id", Integer),
+            column("action_code", String),
+            column("action_description", String),
+            name="new_actions"
+        ).data([
+            (action.client_id, action.courier_id, action.manager_id, action.warehouse_id,
+             action.warehouse_manager_id, action.order_item_id, action.order_id,
+             action.action_code.value, description)
+            for action, description in zip(actions, descriptions)
+        ])
+        # all-NULL VALUES columns come back as text, so type them explicitly
+        new_actions = select(*(cast(value, value.type).label(value.key) for value in rows.c)).subquery("new_actions")
+        is_duplicate = exists().where(
+            ActionHistory.action_code == new_actions.c.action_code,
+            or_(
+                and_(new_actions.c.order_item_id.is_not(None), ActionHistory.order_item_id == new_actions.c.order_item_id),
+                and_(new_actions.c.order_item_id.is_(None), ActionHistory.order_id == new_actions.c.order_id)
+            )
         )
-        if not action_history_db:
-            db.add(action_history)
-            await db.commit()
-            await db.refresh(action_history)
-        return action_history
+        now = datetime.now()
+        await db.execute(insert(ActionHistory).from_select(
+            [*new_actions.c.keys(), "created_at", "updated_at"],
+            select(*new_actions.c, literal(now, DateTime), literal(now, DateTime)).where(~is_duplicate)
+        ))
+
+    async def add_action(self, action: ActionHistoryCreate, db: AsyncSession = Depends(get_db)):
+        await self.add_actions_bulk([action], db)
+        await db.commit()
 
     async def get_order_action_history(self, id: int, user: UserViewSchemas, db: AsyncSession = Depends(get_db)) -> list[ActionHistoryShortOut]:
         action_history = await db.execute(select(ActionHistory).where(ActionHistory.order_item_id == id).order_by(ActionHistory.created_at))
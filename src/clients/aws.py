@@ -1,42 +1,166 @@
-import json
+import asyncio
 import mimetypes
+import xml.etree.ElementTree as ElementTree
+from contextlib import suppress
+from typing import IO
+from urllib.parse import quote, urlencode
 
+import aiohttp
 import boto3
-from botocore.exceptions import ClientError, NoCredentialsError
+from botocore.auth import S3SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import NoCredentialsError
 from starlette.responses import StreamingResponse
+from yarl import URL
 
 from src.config import settings
 from src.exceptions import BadRequestS3
 
 session = boto3.session.Session()
 
+# bodies go over TLS, so they aren't hashed for the signature
+SIGNING_CONFIG = BotocoreConfig(s3={"payload_signing_enabled": False})
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
 class AWSS3:
+    """S3 client running on aiohttp so transfers don't block the event loop.
+
+    Requests are signed with botocore and share one pooled connection per
+    worker. Files above S3_MULTIPART_THRESHOLD are uploaded in parts,
+    S3_MAX_CONCURRENCY parts at a time. boto3 is only used for presigning,
+    which doesn't touch the network.
+    """
+
     def __init__(self):
         self.s3_bucket = settings.S3_BUCKET
-        self.endpoint_url = f"https://hb.kz-ast.vkcs.cloud"
+        self.endpoint_url = settings.S3_ENDPOINT_URL
+        self.region_name = session.region_name or "us-east-1"
         self.s3_client = session.client(service_name='s3', endpoint_url=self.endpoint_url)
-    
-    async def upload_file_to_s3(self, file_path, file_object) -> None:
-        self.s3_client.upload_fileobj(file_object, self.s3_bucket, file_path)
+        self._http: aiohttp.ClientSession | None = None
 
-    async def download_file(self, file_path):
-        try:
-            response = self.s3_client.get_object(
-                Bucket=self.s3_bucket, Key=file_path)
-            consent_type = mimetypes.guess_type(file_path)[0]
-            return StreamingResponse(response['Body'], media_type=consent_type)
-        except ClientError:
+    def get_http(self) -> aiohttp.ClientSession:
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.S3_MAX_CONNECTIONS),
+                # no total timeout: large downloads are streamed to the client
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=settings.S3_TIMEOUT, sock_read=settings.S3_TIMEOUT)
+            )
+        return self._http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    def get_url(self, key: str, params: dict | None = None) -> str:
+        url = f"{self.endpoint_url}/{self.s3_bucket}/{quote(key, safe='/~')}"
+        if params:
+            url = f"{url}?{urlencode(params, quote_via=quote)}"
+        return url
+
+    def sign(self, method: str, url: str, headers: dict | None = None) -> dict:
+        credentials = session.get_credentials()
+        if credentials is None:
+            raise NoCredentialsError()
+        request = AWSRequest(method=method, url=url, headers=headers or {})
+        request.context["client_config"] = SIGNING_CONFIG
+        S3SigV4Auth(credentials.get_frozen_credentials(), "s3", self.region_name).add_auth(request)
+        return dict(request.headers.items())
+
+    async def request(self, method: str, key: str, params: dict | None = None, data: bytes | None = None,
+                      headers: dict | None = None) -> aiohttp.ClientResponse:
+        url = self.get_url(key, params)
+        response = await self.get_http().request(
+            method, URL(url, encoded=True), data=data, headers=self.sign(method, url, headers))
+        if response.status >= 400:
+            response.release()
             raise BadRequestS3()
-    
-    async def delete_file(self, file_name: str):
+        return response
+
+    async def put_object(self, key: str, body: bytes) -> None:
+        headers = {"Content-Type": mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        response = await self.request("PUT", key, data=body, headers=headers)
+        response.release()
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body: bytes) -> str:
+        response = await self.request("PUT", key, params={"partNumber": part_number, "uploadId": upload_id}, data=body)
+        response.release()
+        return response.headers["ETag"]
+
+    async def upload_multipart(self, key: str, file_object: IO[bytes]) -> None:
+        headers = {"Content-Type": mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        response = await self.request("POST", key, params={"uploads": ""}, headers=headers)
+        upload_id = ElementTree.fromstring(await response.read()).findtext("{*}UploadId")
+
+        semaphore = asyncio.Semaphore(settings.S3_MAX_CONCURRENCY)
+
+        async def upload(part_number: int, body: bytes) -> str:
+            try:
+                return await self.upload_part(key, upload_id, part_number, body)
+            finally:
+                semaphore.release()
+
+        tasks = []
         try:
-            response = self.s3_client.delete_object(
-                Bucket=self.s3_bucket, Key=file_name)
-            return response
-        except ClientError:
-            raise BadRequestS3()
+            part_number = 1
+            while True:
+                # at most S3_MAX_CONCURRENCY parts are held in memory
+                await semaphore.acquire()
+                body = await asyncio.to_thread(file_object.read, settings.S3_MULTIPART_CHUNK_SIZE)
+                if not body:
+                    semaphore.release()
+                    break
+                tasks.append(asyncio.create_task(upload(part_number, body)))
+                part_number += 1
+            etags = await asyncio.gather(*tasks)
+            parts = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>"
+                for number, etag in enumerate(etags, start=1)
+            )
+            response = await self.request(
+                "POST", key, params={"uploadId": upload_id},
+                data=f"<CompleteMultipartUpload>{parts}</CompleteMultipartUpload>".encode())
+            # S3 may report a failed completion with a 200 status
+            if ElementTree.fromstring(await response.read()).tag.endswith("Error"):
+                raise BadRequestS3()
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            with suppress(Exception):
+                response = await self.request("DELETE", key, params={"uploadId": upload_id})
+                response.release()
+            raise
+
+    async def upload_file(self, file_path: str, file_object: IO[bytes]) -> None:
+        position = file_object.tell()
+        size = file_object.seek(0, 2) - position
+        file_object.seek(position)
+        if size > settings.S3_MULTIPART_THRESHOLD:
+            await self.upload_multipart(file_path, file_object)
+        else:
+            await self.put_object(file_path, await asyncio.to_thread(file_object.read))
 
-    async def get_file_url(self, file_name):
+    async def download_file(self, file_path: str) -> StreamingResponse:
+        response = await self.request("GET", file_path)
+
+        async def iter_body():
+            try:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                response.release()
+
+        consent_type = mimetypes.guess_type(file_path)[0]
+        return StreamingResponse(iter_body(), media_type=consent_type)
+
+    async def delete_file(self, file_name: str) -> None:
+        response = await self.request("DELETE", file_name)
+        response.release()
+
+    async def get_file_url(self, file_name: str) -> str | None:
         try:
             url = self.s3_client.generate_presigned_url('get_object',
                                                         Params={'Bucket': self.s3_bucket,
@@ -47,5 +171,3 @@ class AWSS3:
             print("Credentials not available")
             return None
 
-
-awss3 = AWSS3()
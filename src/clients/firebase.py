@@ -19,5 +19,17 @@ class FirebaseClient:
         print('Successfully sent message:', response)
         return response
 
+    def send_multicast(self, device_tokens: list[str], title: str | None, body: str) -> list[str | None]:
+        """Sends one message to up to 500 devices, returns an error per token."""
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(
+                title=title,
+                body=body
+            ),
+            tokens=device_tokens
+        )
+        response = messaging.send_each_for_multicast(message)
+        return [None if result.success else str(result.exception) for result in response.responses]
+
 
 firebase_client = FirebaseClient()
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Iterable
+
+import aiohttp
+
+from src.exceptions import ServiceRejectedRequest, ServiceUnavailable
+
+http_clients: list["HttpClient"] = []
+
+
+class CircuitBreaker:
+    """Stops calling a service after ``failure_threshold`` failures in a row.
+
+    While open, calls fail right away; after ``reset_timeout`` seconds one
+    trial call is let through and closes the breaker again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._trial_running or time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def cancel_trial(self):
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """Async HTTP client for an outbound integration.
+
+    Keeps one keep-alive connection pool per worker, limited to
+    ``limit_per_host`` connections, and guards the service with a circuit
+    breaker. Connection errors, timeouts and 5xx responses count as failures
+    and raise ServiceUnavailable. A 4xx raises ServiceRejectedRequest without
+    tripping the breaker: the service is up, the request itself is wrong.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 10, limit_per_host: int = 10,
+                 failure_threshold: int = 5, reset_timeout: float = 30, headers: dict | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limit_per_host = limit_per_host
+        self.headers = headers or {}
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._session: aiohttp.ClientSession | None = None
+        http_clients.append(self)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+                timeout=self.timeout,
+                headers=self.headers
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method: str, path: str, **kwargs) -> tuple[int, str]:
+        if not self.breaker.allow():
+            raise ServiceUnavailable()
+        try:
+            async with self.get_session().request(method, f"{self.base_url}{path}", **kwargs) as response:
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise ServiceUnavailable()
+        except BaseException:
+            # e.g. a cancelled request says nothing about the service
+            self.breaker.cancel_trial()
+            raise
+        if response.status >= 500:
+            self.breaker.record_failure()
+            raise ServiceUnavailable()
+        self.breaker.record_success()
+        if response.status >= 400:
+            raise ServiceRejectedRequest(response.status, text)
+        return response.status, text
+
+    async def post(self, path: str, **kwargs) -> tuple[int, str]:
+        return await self.request("POST", path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> tuple[int, str]:
+        return await self.request("GET", path, **kwargs)
+
+
+async def fan_out(calls: Iterable[Awaitable[Any]], limit: int = 10) -> list[Any]:
+    """Runs independent calls concurrently, at most ``limit`` at a time.
+
+    Results keep the order of ``calls``; a failed call returns its exception.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(call: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await call
+
+    return await asyncio.gather(*(run(call) for call in calls), return_exceptions=True)
+
+
+async def close_http_clients():
+    for client in http_clients:
+        await client.close()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from contextlib import suppress
+from pathlib import Path
+from xmlrpc.client import ServerProxy
+
+from unoserver.client import UnoClient
+
+from src.config import settings
+from src.exceptions import DocumentConversionFailed
+
+logger = logging.getLogger(__name__)
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LibreOfficeServer:
+    """A headless LibreOffice kept running behind unoserver.
+
+    unoserver imports ``uno``, which only comes with the Python LibreOffice
+    is packaged for, so it runs under LIBREOFFICE_SERVER_PYTHON. Ports are
+    picked on start, every gunicorn worker runs its own servers.
+    """
+
+    def __init__(self, python: str, binary: str, profile: Path, timeout: int):
+        self.python = python
+        self.binary = binary
+        self.profile = profile
+        self.timeout = timeout
+        self.port: int | None = None
+        self._process: asyncio.subprocess.Process | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self, start_timeout: int):
+        self.port = get_free_port()
+        self._process = await asyncio.create_subprocess_exec(
+            self.python, "-m", "unoserver.server", "--executable", self.binary,
+            "--user-installation", str(self.profile), "--port", str(self.port), "--uno-port", str(get_free_port()),
+            "--conversion-timeout", str(self.timeout), stdout=asyncio.subprocess.DEVNULL, start_new_session=True)
+        deadline = time.monotonic() + start_timeout
+        # unoserver answers XML-RPC only once LibreOffice accepts UNO connections
+        while not await asyncio.to_thread(self._ping):
+            if not self.running:
+                raise RuntimeError(f"unoserver exited with {self._process.returncode} on start")
+            if time.monotonic() > deadline:
+                await self.kill()
+                raise RuntimeError("unoserver didn't start in time")
+            await asyncio.sleep(0.5)
+
+    def _ping(self) -> bool:
+        try:
+            with ServerProxy(f"http://127.0.0.1:{self.port}") as proxy:
+                proxy.info()
+        except (OSError, ConnectionError):
+            return False
+        return True
+
+    async def convert(self, data: bytes, target: str) -> bytes:
+        client = UnoClient(port=str(self.port))
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(client.convert, indata=data, convert_to=target), self.timeout)
+        except asyncio.TimeoutError:
+            # LibreOffice is stuck on the document, don't hand it the next one
+            await self.kill()
+            raise
+
+    async def kill(self):
+        if self._process is None:
+            return
+        # soffice.bin runs as a child of unoserver, so kill the whole group
+        with suppress(ProcessLookupError):
+            os.killpg(self._process.pid, signal.SIGKILL)
+        await self._process.wait()
+        self._process = None
+
+
+class LibreOfficeConverter:
+    """Converts documents with warm headless LibreOffice processes through an async job queue.
+
+    Every worker keeps one LibreOffice running with its own user profile (a
+    profile can't be shared by processes running at the same time) and
+    sends its jobs to it, so only the worker start pays the cold start. A
+    job that takes more than LIBREOFFICE_TIMEOUT seconds gets the worker's
+    LibreOffice killed; the next job starts a new one, as after a crash.
+    """
+
+    def __init__(self, python: str, binary: str, workers: int, timeout: int, start_timeout: int):
+        self.python = python
+        self.binary = binary
+        self.workers = workers
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._profiles_dir: str | None = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._profiles_dir = tempfile.mkdtemp(prefix="libreoffice-profiles-")
+        self._tasks = [asyncio.create_task(self._work(Path(self._profiles_dir, str(number))))
+                       for number in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._profiles_dir is not None:
+            await asyncio.to_thread(shutil.rmtree, self._profiles_dir, True)
+            self._profiles_dir = None
+
+    async def convert(self, data: bytes, target: str = "pdf") -> bytes:
+        if not self._tasks:
+            self.start()
+        result = asyncio.get_running_loop().create_future()
+        await self._queue.put((data, target, result))
+        return await result
+
+    async def _ensure_running(self, server: LibreOfficeServer):
+        if not server.running:
+            await server.kill()
+            await server.start(self.start_timeout)
+
+    async def _work(self, profile: Path):
+        server = LibreOfficeServer(self.python, self.binary, profile, self.timeout)
+        try:
+            try:
+                await self._ensure_running(server)
+            except Exception:
+                logger.exception("Failed to start LibreOffice for profile %s", profile)
+            while True:
+                data, target, result = await self._queue.get()
+                if result.cancelled():
+                    continue
+                try:
+                    await self._ensure_running(server)
+                    converted = await server.convert(data, target)
+                except Exception:
+                    logger.exception("Document conversion failed")
+                    if not result.cancelled():
+                        result.set_exception(DocumentConversionFailed())
+                else:
+                    if not result.cancelled():
+                        result.set_result(converted)
+        finally:
+            await server.kill()
+
+
+document_converter = LibreOfficeConverter(
+    python=settings.LIBREOFFICE_SERVER_PYTHON, binary=settings.LIBREOFFICE_BINARY,
+    workers=settings.LIBREOFFICE_WORKERS, timeout=settings.LIBREOFFICE_TIMEOUT,
+    start_timeout=settings.LIBREOFFICE_START_TIMEOUT)
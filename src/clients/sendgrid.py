@@ -20,5 +20,15 @@ class MailClient:
         response = self.sg.send(message)
         return response
 
+    def send_multiple(self, emails: list[str], subject: str, html_content: str):
+        # one personalization per address, so recipients don't see each other
+        message = Mail(
+            from_email=self.sender,
+            to_emails=emails,
+            subject=subject,
+            html_content=html_content,
+            is_multiple=True)
+        return self.sg.send(message)
+
 
 mail_client = MailClient()
@@ -1,19 +1,20 @@
-import requests
-
+from src.clients.http import HttpClient
 from src.config import settings
 
 
 class WhatsappClient:
     def __init__(self) -> None:
-        self.url = settings.WHATSAPP_SERVICE_URL
-        self._headers = {
-            "Content-Type": "application/json"
-        }
+        self.client = HttpClient(
+            settings.WHATSAPP_SERVICE_URL,
+            timeout=settings.WHATSAPP_TIMEOUT,
+            limit_per_host=settings.WHATSAPP_MAX_CONNECTIONS,
+            headers={"Content-Type": "application/json"}
+        )
 
-    def send_sms(self, phone: str, body: str):
+    async def send_sms(self, phone: str, body: str):
         data = {"phone": phone, "text": body}
-        resp = requests.post(f"{self.url}/send", json=data, headers=self._headers)
-        return resp.text
+        _, text = await self.client.post("/send", json=data)
+        return text
 
 
 whatsapp_client = WhatsappClient()
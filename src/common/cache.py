@@ -0,0 +1,85 @@
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from src.common.utils import SingleFlight
+from src.config import settings
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    body: bytes
+    etag: str
+
+    def matches(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses the weak comparison, a W/ prefix doesn't matter
+        return self.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+    def to_response(self, request: Request) -> Response:
+        # clients keep the body but revalidate it on every use
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.matches(request):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+class ReferenceCache:
+    """Process-wide cache of reference lists, kept as rendered JSON.
+
+    Every table has a version that services bump after committing a change
+    to it. An entry remembers the versions of the tables it was read from
+    and is reloaded as soon as one of them moves. Bumps only reach the
+    worker that made the change; other workers pick it up once the entry
+    expires. ETags hash the body, so workers holding the same data agree.
+    At most ``max_entries`` are kept, the least recently used go first.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._versions: dict[str, int] = {}
+        self._entries: OrderedDict[Hashable, tuple[float, tuple[int, ...], ReferenceData]] = OrderedDict()
+        self._flights = SingleFlight()
+
+    def get_versions(self, tables: tuple[str, ...]) -> tuple[int, ...]:
+        return tuple(self._versions.get(table, 0) for table in tables)
+
+    def bump(self, *tables: str):
+        for table in tables:
+            self._versions[table] = self._versions.get(table, 0) + 1
+
+    async def get(self, key: Hashable, tables: tuple[str, ...], load: Callable[[], Awaitable[Any]]) -> ReferenceData:
+        """Returns the cached data for ``key``, calling ``load`` if it's missing or outdated.
+
+        ``load`` must open its own session: concurrent misses share one call.
+        """
+        versions = self.get_versions(tables)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic() and entry[1] == versions:
+            self._entries.move_to_end(key)
+            return entry[2]
+        return await self._flights.run((key, versions), lambda: self.load(key, versions, load))
+
+    async def load(self, key: Hashable, versions: tuple[int, ...], load: Callable[[], Awaitable[Any]]) -> ReferenceData:
+        # a bump during the load leaves the entry outdated, the next call reloads it
+        body = JSONResponse(jsonable_encoder(await load())).body
+        data = ReferenceData(body=body, etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        self._entries[key] = (time.monotonic() + self.ttl, versions, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return data
+
+
+reference_cache = ReferenceCache(ttl=settings.REFERENCE_CACHE_TTL, max_entries=settings.REFERENCE_CACHE_MAX_ENTRIES)
@@ -0,0 +1,103 @@
+import io
+import re
+import zipfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+W_P = f"{{{W_NAMESPACE}}}p"
+W_T = f"{{{W_NAMESPACE}}}t"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+TEMPLATE_PARTS = re.compile(r"word/(document|header\d*|footer\d*)\.xml")
+PLACEHOLDER = re.compile(r"{{\s*(\w+)\s*}}")
+# placeholder slots are marked with private use characters before serializing
+SLOT_START, SLOT_END = "\ue000", "\ue001"
+SLOT = re.compile(f"{SLOT_START}(\\w+){SLOT_END}".encode())
+
+
+def compile_part(xml: bytes) -> list[bytes | str]:
+    """Splits a document part into literal xml chunks and placeholder names.
+
+    Word often splits a placeholder across several runs, so each paragraph's
+    text is matched as a whole. The placeholder is moved into the run where
+    it starts and cut out of the following ones, keeping their formatting.
+    """
+    root = etree.fromstring(xml)
+    compiled = False
+    for paragraph in root.iter(W_P):
+        # text boxes nest paragraphs inside runs; they are handled on their own
+        texts = [text for text in paragraph.iter(W_T) if next(text.iterancestors(W_P)) is paragraph]
+        content = "".join(text.text or "" for text in texts)
+        matches = list(PLACEHOLDER.finditer(content))
+        if not matches:
+            continue
+        compiled = True
+        start = 0
+        for text in texts:
+            end = start + len(text.text or "")
+            chunks = []
+            cursor = start
+            for match in matches:
+                if match.end() <= start or match.start() >= end:
+                    continue
+                chunks.append(content[cursor:max(match.start(), start)])
+                if match.start() >= start:
+                    chunks.append(f"{SLOT_START}{match.group(1)}{SLOT_END}")
+                cursor = min(match.end(), end)
+            if chunks:
+                chunks.append(content[cursor:end])
+                text.text = "".join(chunks)
+                text.set(XML_SPACE, "preserve")
+            start = end
+    if not compiled:
+        return [xml]
+    xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+    return [chunk.decode() if index % 2 else chunk for index, chunk in enumerate(SLOT.split(xml))]
+
+
+class DocxTemplate:
+    """A .docx file with ``{{name}}`` placeholders, parsed once and rendered by splicing.
+
+    Rendering only joins precompiled xml chunks with the escaped values and
+    zips the parts again. Placeholders without a value are left as written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.parts: list[tuple[str, bytes | list[bytes | str]]] = []
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                data = archive.read(info)
+                # no byte pre-check: a placeholder split across runs has no "{{" in the xml
+                if TEMPLATE_PARTS.fullmatch(info.filename):
+                    data = compile_part(data)
+                self.parts.append((info.filename, data))
+
+    @staticmethod
+    def render_part(compiled: list[bytes | str], values: dict[str, str]) -> bytes:
+        return b"".join(
+            chunk if isinstance(chunk, bytes)
+            else escape(values[chunk]).encode() if chunk in values
+            else f"{{{{{chunk}}}}}".encode()
+            for chunk in compiled
+        )
+
+    def render(self, values: dict[str, object]) -> bytes:
+        values = {name: "" if value is None else str(value) for name, value in values.items()}
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            for name, data in self.parts:
+                archive.writestr(name, data if isinstance(data, bytes) else self.render_part(data, values))
+        return buffer.getvalue()
+
+    def render_many(self, values: list[dict[str, object]]) -> list[bytes]:
+        """Renders one document per dict of values."""
+        return [self.render(document_values) for document_values in values]
+
+
+@lru_cache
+def get_template(path: str) -> DocxTemplate:
+    return DocxTemplate(path)
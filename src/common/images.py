@@ -0,0 +1,86 @@
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+from src.common.models import ImageRendition
+
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png")
+THUMBNAIL_SIZE = (200, 200)
+MEDIUM_SIZE = (800, 800)
+
+
+def get_rendition_path(file_path: str, rendition: ImageRendition) -> str:
+    """Returns the storage key of a rendition.
+
+    The 800px rendition keeps the uploaded key, so photos stored before
+    renditions existed are still found under it.
+    """
+    file_name, _, file_extension = file_path.rpartition(".")
+    if rendition == ImageRendition.THUMBNAIL:
+        return f"{file_name}_thumbnail.webp"
+    if rendition == ImageRendition.ORIGINAL:
+        return f"{file_name}_original.{file_extension}"
+    return file_path
+
+
+def to_webp_mode(img: Image.Image) -> Image.Image:
+    """Converts to RGB or RGBA, the only modes WebP takes."""
+    if img.mode in ("RGB", "RGBA"):
+        return img
+    if img.mode.startswith("I"):
+        # 16-bit grayscale PNGs would be clipped to white, keep their high byte instead
+        img = img.point(lambda value: value / 256).convert("L")
+    return img.convert("RGBA" if img.has_transparency_data else "RGB")
+
+
+def render_image(data: bytes, file_extension: str) -> dict[ImageRendition, bytes]:
+    """Builds the thumbnail and 800px renditions. Runs in a worker process."""
+    img = Image.open(io.BytesIO(data))
+    # lets the JPEG decoder downscale while decoding instead of loading all pixels
+    img.draft("RGB", MEDIUM_SIZE)
+    img = ImageOps.exif_transpose(img)
+    if img.mode.startswith("I;16"):
+        # resizing doesn't take the 16-bit modes newer Pillow opens grayscale PNGs in
+        img = img.convert("I")
+    img.thumbnail(MEDIUM_SIZE)
+
+    img_format = "JPEG" if file_extension in ("jpg", "jpeg") else file_extension.upper()
+    medium = io.BytesIO()
+    if img_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    img.save(medium, format=img_format, optimize=True)
+
+    img = to_webp_mode(img)
+    img.thumbnail(THUMBNAIL_SIZE)
+    thumbnail = io.BytesIO()
+    img.save(thumbnail, format="WEBP", quality=80)
+    return {ImageRendition.MEDIUM: medium.getvalue(), ImageRendition.THUMBNAIL: thumbnail.getvalue()}
+
+
+class ImageProcessor:
+    """Runs image decoding and resizing in a process pool, off the event loop."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # forking a process that already runs threads (log listener, to_thread workers) can deadlock
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+        return self._executor
+
+    async def render(self, data: bytes, file_extension: str) -> dict[ImageRendition, bytes]:
+        renditions = await asyncio.get_running_loop().run_in_executor(
+            self.get_executor(), render_image, data, file_extension.lower())
+        renditions[ImageRendition.ORIGINAL] = data
+        return renditions
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
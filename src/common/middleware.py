@@ -0,0 +1,106 @@
+import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REDACTED_HEADERS = {"authorization", "cookie", "set-cookie", "x-api-key", "proxy-authorization"}
+TEXT_CONTENT_TYPES = ("application/json", "text/")
+
+
+def setup_logging(level: str) -> QueueListener:
+    """Routes every log record through a queue to a background thread writing to stdout.
+
+    The returned listener has to be started and stopped by the application.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+    return QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+
+class RequestLoggingMiddleware:
+    """Logs one record per HTTP request without buffering the response.
+
+    Body chunks are passed through as they come; only the first
+    ``body_limit`` bytes of text responses are kept for the record. Errors
+    (status >= 500) are always logged, other requests are sampled with
+    ``sample_rate`` or the rate of the longest matching path prefix in
+    ``route_sample_rates``.
+    """
+
+    def __init__(self, app: ASGIApp, logger: logging.Logger, body_limit: int = 1024, sample_rate: float = 1.0,
+                 route_sample_rates: dict[str, float] | None = None):
+        self.app = app
+        self.logger = logger
+        self.body_limit = body_limit
+        self.sample_rate = sample_rate
+        self.route_sample_rates = sorted((route_sample_rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def get_sample_rate(self, path: str) -> float:
+        for prefix, rate in self.route_sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.sample_rate
+
+    def should_log(self, path: str, status_code: int) -> bool:
+        if status_code >= 500:
+            return True
+        return random.random() < self.get_sample_rate(path)
+
+    @staticmethod
+    def redact_headers(headers: list[tuple[bytes, bytes]]) -> dict[str, str]:
+        redacted = {}
+        for name, value in headers:
+            name = name.decode("latin-1")
+            redacted[name] = "***" if name in REDACTED_HEADERS else value.decode("latin-1")
+        return redacted
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+        capture_body = False
+        body_prefix = bytearray()
+        body_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, capture_body, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"").decode("latin-1")
+                capture_body = content_type.startswith(TEXT_CONTENT_TYPES)
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if capture_body and len(body_prefix) < self.body_limit:
+                    body_prefix.extend(chunk[:self.body_limit - len(body_prefix)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = scope["path"]
+            if self.should_log(path, status_code):
+                headers = self.redact_headers(scope.get("headers", []))
+                self.logger.info({
+                    "host": headers.get("host"),
+                    "endpoint": path,
+                    "method": scope["method"],
+                    "status_code": status_code,
+                    "duration_ms": round((time.perf_counter() - started_at) * 1000, 2),
+                    "query_string": scope.get("query_string", b"").decode("latin-1"),
+                    "headers": headers,
+                    "user_agent": headers.get("user-agent"),
+                    "response_size": body_size,
+                    "response": body_prefix.decode("utf-8", "ignore")
+                })
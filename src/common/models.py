@@ -28,3 +28,9 @@ class SendEmail(BaseModel):
 class SortOrder(Enum):
     ASC = "asc"
     DESC = "desc"
+
+
+class ImageRendition(Enum):
+    THUMBNAIL = "thumbnail"
+    MEDIUM = "medium"
+    ORIGINAL = "original"
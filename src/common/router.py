@@ -2,6 +2,7 @@ from fastapi import APIRouter
 
 from src.clients.firebase import firebase_client
 from src.clients.whatsapp import whatsapp_client
+from src.common.models import ImageRendition
 from src.common.service import file_service
 from src.directions.models import TransportationType
 from src.notification.models import SendPushNotification, SendSMS
@@ -37,8 +38,8 @@ async def get_status_groups():
 
 
 @router.get("/download/{filename}", tags=["root"])
-async def download(filename: str):
-    return await file_service.download_file(filename)
+async def download(filename: str, rendition: ImageRendition = ImageRendition.MEDIUM):
+    return await file_service.download_file(filename, rendition)
 
 
 @router.get("/api/v1/delivery_types", tags=["root"])
@@ -72,8 +73,8 @@ def send_push_notification(payload: SendPushNotification):
 
 
 @router.post("/api/v1/send-sms", tags=["root"])
-def send_sms(payload: SendSMS):
-    return whatsapp_client.send_sms(payload.phone, payload.message)
+async def send_sms(payload: SendSMS):
+    return await whatsapp_client.send_sms(payload.phone, payload.message)
 
 
 @router.get("/", tags=["root"])
@@ -0,0 +1,39 @@
+import re
+
+from sqlalchemy import Select, and_, desc, func
+
+# a term made only of these characters is a phone fragment
+PHONE_TERM = re.compile(r"[\d\s()+\-]+")
+
+
+def get_search_words(search: str | None) -> list[str]:
+    """Splits a search query into words matched against a search document.
+
+    Phone fragments like ``+7 (701) 23`` become a single run of digits,
+    because search documents keep phones with the formatting stripped.
+    """
+    if not search or search.isspace():
+        return []
+    search = search.strip()
+    if PHONE_TERM.fullmatch(search) and any(char.isdigit() for char in search):
+        return [re.sub(r"\D", "", search)]
+    return search.split()
+
+
+def escape_like(word: str) -> str:
+    # backslash is the default LIKE escape character in Postgres
+    return word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_by_document(query: Select, document, search: str | None) -> Select:
+    """Filters ``query`` to rows whose search document contains every word.
+
+    Substring matches are served by the pg_trgm GIN index on the document;
+    results are ordered by word similarity to the query first, so any
+    ordering applied afterwards only breaks ties.
+    """
+    words = get_search_words(search)
+    if not words:
+        return query
+    return query.where(and_(*(document.ilike(f"%{escape_like(word)}%") for word in words))).order_by(
+        desc(func.word_similarity(" ".join(words), document)))
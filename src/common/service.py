@@ -1,50 +1,70 @@
 
+import asyncio
 import io
+from contextlib import suppress
 from typing import AnyStr, Union
 
-from PIL import Image
+from src.clients.aws import AWSS3
+from src.common.images import (IMAGE_EXTENSIONS, ImageProcessor,
+                               get_rendition_path)
+from src.common.models import ImageRendition
+from src.common.storage import LocalStorage
+from src.config import settings
+from src.exceptions import BadRequestS3
 
-from src.clients.aws import awss3
+image_processor = ImageProcessor(max_workers=settings.IMAGE_WORKERS)
 
 
 class FileService:
+    def __init__(self, storage: AWSS3 | LocalStorage):
+        self.storage = storage
 
     async def upload_file(self, file_path, file_object) -> Union[dict, AnyStr, None]:
         file_extension = file_path.split('.')[-1]
         file_name = file_path.split('.')[0]
         file_path = f'{file_name}.{file_extension}'
-        if file_extension.lower() in ['jpg', 'jpeg', 'png']:
-            img = Image.open(file_object)
-
-            # Resize the image, maintaining its aspect ratio
-            max_size = (800, 800)
-            img.thumbnail(max_size)
-
-            # Save the resized image to a BytesIO object
-            buffer = io.BytesIO()
-            if file_extension.lower() in ['jpg', 'jpeg']:
-                img_format = 'JPEG'
-            else:
-                img_format = file_extension.upper()
-            img.save(buffer, format=img_format)
-            buffer.seek(0)
-
-            await awss3.upload_file_to_s3(file_path, buffer)
+        if file_extension.lower() in IMAGE_EXTENSIONS:
+            data = await asyncio.to_thread(file_object.read)
+            renditions = await image_processor.render(data, file_extension)
+            await asyncio.gather(*(
+                self.storage.upload_file(get_rendition_path(file_path, rendition), io.BytesIO(content))
+                for rendition, content in renditions.items()
+            ))
         else:
-            await awss3.upload_file_to_s3(file_path, file_object)
+            await self.storage.upload_file(file_path, file_object)
         return {'success': True, 'file_path': file_path}
 
-    async def download_file(self, file_path) -> Union[dict, AnyStr]:
-        return await awss3.download_file(file_path)
+    async def download_file(self, file_path, rendition: ImageRendition = ImageRendition.MEDIUM) -> Union[dict, AnyStr]:
+        if rendition != ImageRendition.MEDIUM and file_path.split('.')[-1].lower() in IMAGE_EXTENSIONS:
+            try:
+                return await self.storage.download_file(get_rendition_path(file_path, rendition))
+            except BadRequestS3:
+                # uploaded before renditions were stored
+                pass
+        return await self.storage.download_file(file_path)
 
     async def delete_file(self, file_name: str) -> Union[dict, AnyStr]:
-        return await awss3.delete_file(file_name)
+        if file_name.split('.')[-1].lower() in IMAGE_EXTENSIONS:
+            for rendition in (ImageRendition.THUMBNAIL, ImageRendition.ORIGINAL):
+                with suppress(BadRequestS3):
+                    await self.storage.delete_file(get_rendition_path(file_name, rendition))
+        return await self.storage.delete_file(file_name)
 
     async def signed_url(self, file_name: str) -> Union[dict, AnyStr]:
-        return await awss3.signed_url(file_name)
+        return await self.storage.get_file_url(file_name)
 
     async def get_url(self, file_name: str) -> str:
-        return await awss3.get_file_url(file_name)
+        return await self.storage.get_file_url(file_name)
 
+    async def close(self):
+        image_processor.shutdown()
+        await self.storage.close()
 
-file_service = FileService()
+
+def get_storage() -> AWSS3 | LocalStorage:
+    if settings.FILE_STORAGE == "local":
+        return LocalStorage(settings.FILE_STORAGE_LOCAL_DIR)
+    return AWSS3()
+
+
+file_service = FileService(get_storage())
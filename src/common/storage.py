@@ -0,0 +1,52 @@
+import asyncio
+import mimetypes
+import shutil
+from pathlib import Path
+from typing import IO
+
+from starlette.responses import FileResponse
+
+from src.exceptions import BadRequestS3
+
+
+class LocalStorage:
+    """Keeps files on the local filesystem, for local runs and tests.
+
+    Has the same interface as the S3 client so FileService can use either.
+    """
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def get_path(self, file_path: str) -> Path:
+        path = (self.root / file_path).resolve()
+        if not path.is_relative_to(self.root):
+            raise BadRequestS3()
+        return path
+
+    def _write(self, path: Path, file_object: IO[bytes]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as destination:
+            shutil.copyfileobj(file_object, destination)
+
+    async def upload_file(self, file_path: str, file_object: IO[bytes]) -> None:
+        await asyncio.to_thread(self._write, self.get_path(file_path), file_object)
+
+    async def download_file(self, file_path: str) -> FileResponse:
+        path = self.get_path(file_path)
+        if not path.is_file():
+            raise BadRequestS3()
+        return FileResponse(path, media_type=mimetypes.guess_type(file_path)[0])
+
+    async def delete_file(self, file_name: str) -> None:
+        path = self.get_path(file_name)
+        if not path.is_file():
+            raise BadRequestS3()
+        await asyncio.to_thread(path.unlink)
+
+    async def get_file_url(self, file_name: str) -> str | None:
+        path = self.get_path(file_name)
+        return path.as_uri() if path.exists() else None
+
+    async def close(self):
+        pass
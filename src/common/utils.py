@@ -0,0 +1,124 @@
+import asyncio
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import IO, Any, Awaitable, Callable, Hashable, Iterator
+
+from sqlalchemy import Select, asc, desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Bundle
+
+from src.common.models import SortOrder
+from src.exceptions import InvalidCursor
+
+
+class DictBundle(Bundle):
+    """Bundle that returns its columns as a dict keyed by column name.
+
+    Plain bundles label clashing columns (``id_1``, ``name_1``) when the same
+    table is joined several times, so rows can't be fed to schemas directly.
+    """
+
+    def create_row_processor(self, query, procs, labels):
+        keys = [expr.key for expr in self.exprs]
+
+        def proc(row):
+            return dict(zip(keys, (proc(row) for proc in procs)))
+        return proc
+
+
+@dataclass
+class Page:
+    items: list[Any]
+    total: int
+    limit: int
+    next_cursor: str | None = None
+
+    @property
+    def pages_number(self) -> int:
+        pages_number = self.total // self.limit
+        if self.total % self.limit != 0:
+            pages_number += 1
+        return pages_number
+
+
+class Paginator:
+    """Paginates select() statements without loading the whole result.
+
+    ``paginate`` reads the page and the total in one round trip via
+    ``COUNT(*) OVER ()``; ``paginate_by_cursor`` walks ``(created_at, id)``
+    so deep pages cost the same as the first one. An empty cursor starts the
+    walk from the first page.
+    """
+
+    async def count(self, db: AsyncSession, query: Select) -> int:
+        return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+    async def paginate(self, db: AsyncSession, query: Select, page: int, limit: int) -> Page:
+        result = await db.execute(
+            query.add_columns(func.count().over().label("total")).offset((page - 1) * limit).limit(limit))
+        rows = result.all()
+        if rows:
+            return Page(items=[row[0] for row in rows], total=rows[0].total, limit=limit)
+        total = await self.count(db, query) if page > 1 else 0
+        return Page(items=[], total=total, limit=limit)
+
+    async def paginate_by_cursor(self, db: AsyncSession, query: Select, model, cursor: str, limit: int,
+                                 sort_order: SortOrder = SortOrder.DESC) -> Page:
+        total = await self.count(db, query)
+        order = asc if sort_order == SortOrder.ASC else desc
+        query = query.order_by(None).order_by(order(model.created_at), order(model.id))
+        if cursor:
+            created_at, id = self.decode_cursor(cursor)
+            key = tuple_(model.created_at, model.id)
+            query = query.where(key > (created_at, id) if sort_order == SortOrder.ASC else key < (created_at, id))
+        result = await db.execute(query.limit(limit + 1))
+        items = result.scalars().all()
+        next_cursor = self.encode_cursor(items[limit - 1]) if len(items) > limit else None
+        return Page(items=items[:limit], total=total, limit=limit, next_cursor=next_cursor)
+
+    @staticmethod
+    def encode_cursor(item) -> str | None:
+        created_at = getattr(item, "created_at", None)
+        if created_at is None:
+            return None
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{item.id}".encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), int(id)
+        except (ValueError, UnicodeDecodeError):
+            raise InvalidCursor()
+
+
+paginator = Paginator()
+
+
+def iter_file(file: IO[bytes], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yields the file in chunks for a StreamingResponse and closes it at the end."""
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one computation.
+
+    Callers arriving while a call is in flight await its result instead of
+    starting their own. The computation runs as its own task, so a caller
+    that goes away doesn't cancel it for the others; ``func`` should
+    therefore open its own session rather than borrow a request's one.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
@@ -21,19 +21,73 @@ class Config(BaseSettings):
     SITE_DOMAIN: str = "127.0.0.1"
     FRONTEND_URL: str = "https://b-express-platform.kz"
     WHATSAPP_SERVICE_URL: str = "http://localhost:8092"
+    WHATSAPP_TIMEOUT: int = 10
+    WHATSAPP_MAX_CONNECTIONS: int = 10
     CORS_ORIGINS: list[str] = []
     CORS_ORIGINS_REGEX: str | None = None
     CORS_HEADERS: list[str] = ["*"]
 
     APP_VERSION: str = "1"
 
+    LOG_LEVEL: str = "INFO"
+    LOG_BODY_LIMIT: int = 1024
+    LOG_SAMPLE_RATE: float = 1.0
+    # path prefix -> sample rate, e.g. {"/orders/excel": 0.1}
+    LOG_ROUTE_SAMPLE_RATES: dict[str, float] = {}
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_DAYS: int = 7
+    PERMISSIONS_CACHE_TTL: int = 60
+    STATELESS_AUTH: bool = False
+    TARIF_INDEX_TTL: int = 300
+    REFERENCE_CACHE_TTL: int = 300
+    # keys come from request params, e.g. any city id, so the cache is bounded
+    REFERENCE_CACHE_MAX_ENTRIES: int = 1000
     SENDGRID_API_KEY: str
     EMAIL_CONFIRMATION_URL: str = f"{SITE_DOMAIN}/users/confirm-email/%s/%s/"
 
     S3_BUCKET: str
+    S3_ENDPOINT_URL: str = "https://hb.kz-ast.vkcs.cloud"
+    S3_MAX_CONNECTIONS: int = 20
+    S3_TIMEOUT: int = 60
+    S3_MULTIPART_THRESHOLD: int = 16 * 1024 * 1024
+    S3_MULTIPART_CHUNK_SIZE: int = 8 * 1024 * 1024
+    S3_MAX_CONCURRENCY: int = 4
+
+    # "s3" or "local"; the local backend writes to FILE_STORAGE_LOCAL_DIR
+    FILE_STORAGE: str = "s3"
+    FILE_STORAGE_LOCAL_DIR: str = "media"
+    IMAGE_WORKERS: int = 2
+
+    NOTIFICATIONS_BATCH_SIZE: int = 100
+    NOTIFICATIONS_POLL_INTERVAL: int = 5
+    # seconds a claimed batch stays hidden from other dispatchers
+    NOTIFICATIONS_LEASE: int = 120
+    # first retry delay in seconds, doubled on every attempt
+    NOTIFICATIONS_BACKOFF: int = 10
+    NOTIFICATIONS_MAX_ATTEMPTS: int = 8
+    # sent and failed messages are deleted after this many days
+    NOTIFICATIONS_RETENTION_DAYS: int = 30
+    NOTIFICATIONS_PURGE_INTERVAL: int = 3600
+
+    # keys the order id permutation; changing it breaks uniqueness of new ids
+    ORDER_ID_KEY: str = "b-express-orders"
+
+    # how often rollups of days with changed orders, payments or shippings are rebuilt
+    STATISTICS_ROLLUP_INTERVAL: int = 60
+    COURIER_COUNTERS_RECONCILE_INTERVAL: int = 86400
+
+    LIBREOFFICE_BINARY: str = "libreoffice"
+    LIBREOFFICE_SERVER_PYTHON: str = "/usr/bin/python3"
+    LIBREOFFICE_WORKERS: int = 2
+    LIBREOFFICE_TIMEOUT: int = 60
+    LIBREOFFICE_START_TIMEOUT: int = 60
+
+    EXPORTS_RESULT_TTL: int = 3600
+    EXPORTS_WORKERS: int = 2
+    EXPORTS_POLL_INTERVAL: int = 5
+    EXPORTS_JOB_TIMEOUT: int = 1800
 
     class Config:
         env_file = ".env"
@@ -1,9 +1,9 @@
 from enum import Enum
 
-from sqlalchemy import (Boolean, Column, ForeignKey, Integer, String,
-                        UniqueConstraint)
+from sqlalchemy import (Boolean, Column, ForeignKey, Index, Integer, String,
+                        Text, UniqueConstraint)
 from sqlalchemy.dialects.postgresql import ENUM as PgEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from src.common.models import TimestampMixin
 from src.database import Base
@@ -36,6 +36,8 @@ class Directions(Base, TimestampMixin):
     email = Column(String, nullable=True)
     password = Column(String, nullable=True)
     order = relationship("Orders", backref="Orders.direction_id", primaryjoin='Directions.id==Orders.direction_id')
+    # text matched by the search query param, filled in by database triggers
+    search_document = deferred(Column(Text, nullable=True))
 
     __table_args__ = (
         UniqueConstraint(
@@ -43,4 +45,6 @@ class Directions(Base, TimestampMixin):
             'departure_city_id',
             'transportation_type',
             name='uq_transportation_type_arrival_departure_city'),
+        Index("ix_directions_search_document", "search_document", postgresql_using="gin",
+              postgresql_ops={"search_document": "gin_trgm_ops"}),
     )
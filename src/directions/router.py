@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
@@ -25,8 +25,11 @@ async def create_direction(payload: DirectionCreateSchemas, user: str = Depends(
 @router.get("/directions",
             response_model=list[DirectionViewSchemas],
             status_code=status.HTTP_200_OK)
-async def get_directions(transportation_type: list[TransportationType] = Query(None), search: str = None, db: AsyncSession = Depends(get_db)):
-    return await direction_service.get_directions(db=db, transportation_type=transportation_type, search=search)
+async def get_directions(request: Request, transportation_type: list[TransportationType] = Query(None), search: str = None,
+                         db: AsyncSession = Depends(get_db)):
+    if search and not search.isspace():
+        return await direction_service.get_directions(db=db, transportation_type=transportation_type, search=search)
+    return (await direction_service.get_directions_reference(transportation_type)).to_response(request)
 
 
 @router.get("/directions/{id}",
@@ -1,23 +1,25 @@
 from typing import List
 
 from fastapi import Depends, HTTPException, Query, status
-from sqlalchemy import delete, exc, or_, select, update
+from sqlalchemy import delete, exc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased
 
+from src.common.cache import ReferenceData, reference_cache
+from src.common.search import search_by_document
 from src.dao.base import BaseDao
-from src.database import get_db
+from src.database import async_session, get_db
 from src.directions.models import Directions, TransportationType
 from src.directions.schemas import (DirectionCreateSchemas,
                                     DirectionUpdateSchemas,
                                     DirectionViewSchemas)
 from src.directions.utils import nested_serializer
-from src.geography.models import City
 from src.orders.models import Orders
 from src.tarifs.models import CalculationType, Tarifs
+from src.tarifs.utils import tarif_index
 from src.users.auth import get_password_hash
 from src.users.models import Users
 from src.users.perms import user_has_permissions
+from src.users.principal import user_auth_cache
 from src.users.schemas import Permission, UserViewSchemas
 from src.users.service import GroupService, group_service
 
@@ -48,13 +50,16 @@ class DirectionService(BaseDao):
         tarif = Tarifs(
             direction_id=direction.id,
             calculation_type=CalculationType.VOLUME,
-            amount=1,
+            start_amount=1,
+            end_amount=1,
             price=price_for_air if payload.transportation_type != TransportationType.AIR else 15000.0
         )
         try:
             db.add(user_set_model)
             db.add(tarif)
             await db.commit()
+            tarif_index.invalidate(direction.id)
+            reference_cache.bump("directions")
         except exc.IntegrityError as e:
             await db.rollback()
             raise HTTPException(
@@ -68,21 +73,18 @@ class DirectionService(BaseDao):
         if transportation_type:
             query = query.where(model.transportation_type.in_(
                 [transportation_type.value for transportation_type in transportation_type]))
-        if search:
-            city_alias = aliased(City)
-            query = query.join(City, model.arrival_city_id == City.id).join(city_alias,
-                                                                            model.departure_city_id == city_alias.id).where(
-                or_(
-                    City.name.ilike(f"%{search}%"),
-                    city_alias.name.ilike(f"%{search}%")
-                )
-            )
+        query = search_by_document(query, model.search_document, search)
         execute_db = await db.execute(query)
         data = execute_db.scalars().all()
-        resp = []
-        for direction in data:
-            resp.append(await nested_serializer.serialize_by_id(direction.id, db))
-        return resp
+        return await nested_serializer.serialize_many(data, db)
+
+    async def get_directions_reference(self, transportation_type: list[TransportationType] = Query(None)) -> ReferenceData:
+        # searches aren't cached, there is no bound on the number of queries
+        async def load():
+            async with async_session() as session:
+                return await self.get_directions(transportation_type, db=session)
+        key = ("directions", frozenset(transportation_type or ()))
+        return await reference_cache.get(key, ("cities", "directions"), load)
 
     async def get_direction(self, id: int, db: AsyncSession = Depends(get_db)) -> DirectionViewSchemas:
         return await nested_serializer.serialize_by_id(id, db)
@@ -99,6 +101,8 @@ class DirectionService(BaseDao):
             await db.execute(delete(Tarifs).where(Tarifs.direction_id == id))
             await db.delete(direction)
             await db.commit()
+            tarif_index.invalidate(id)
+            reference_cache.bump("directions")
             return {"detail": "Direction deleted"}
         raise HTTPException(status_code=404, detail="Direction not found")
 
@@ -109,7 +113,7 @@ class DirectionService(BaseDao):
         if not direction:
             raise HTTPException(status_code=404, detail="Direction not found")
         if direction.is_active is not payload.is_active:
-            await user_has_permissions(user.id, [Permission.UPDATE_DIRECTION_STATUS])
+            await user_has_permissions(db, user.id, [Permission.UPDATE_DIRECTION_STATUS])
         try:
             hashed_password = await get_password_hash(password=payload.password)
             direction_user = await db.execute(select(Users).where(Users.direction_id == id))
@@ -124,6 +128,9 @@ class DirectionService(BaseDao):
             )
             await db.execute(stmt)
             await db.commit()
+            reference_cache.bump("directions")
+            if direction_user:
+                user_auth_cache.invalidate(direction_user.id)
             await db.refresh(direction)
             return await nested_serializer.serialize_by_id(id, db)
         except exc.IntegrityError as e:
@@ -15,25 +15,26 @@ class DirectionViewSerialized:
 
         direction_query = await db.execute(select(Directions).where(Directions.id == id))
         direction = direction_query.scalar_one_or_none()
-
-        arrival_city_query = await db.execute(select(City).where(City.id == direction.arrival_city_id))
-        arrival_city = arrival_city_query.scalar_one_or_none()
-        arrival_city_model = GeographyViewSchemas(**arrival_city.__dict__)
-
-        departure_city_query = await db.execute(select(City).where(City.id == direction.departure_city_id))
-        departure_city = departure_city_query.scalar_one_or_none()
-        departure_city_model = GeographyViewSchemas(**departure_city.__dict__)
-
-        direction_model = DirectionViewSchemas(
+        return (await self.serialize_many([direction], db))[0]
+
+    async def serialize_many(self, directions: list[Directions], db: AsyncSession = Depends(get_db)) -> list[DirectionViewSchemas]:
+        """Serializes directions with a single query for their cities."""
+        if not directions:
+            return []
+        city_ids = {direction.arrival_city_id for direction in directions} | {
+            direction.departure_city_id for direction in directions}
+        cities = (await db.execute(select(City).where(City.id.in_(city_ids)))).scalars().all()
+        cities = {city.id: GeographyViewSchemas(**city.__dict__) for city in cities}
+
+        return [DirectionViewSchemas(
             id=direction.id,
             transportation_type=direction.transportation_type,
             is_active=direction.is_active,
-            arrival_city=arrival_city_model,
-            departure_city=departure_city_model,
+            arrival_city=cities[direction.arrival_city_id],
+            departure_city=cities[direction.departure_city_id],
             email=direction.email,
             password=direction.password
-        )
-        return direction_model
+        ) for direction in directions]
 
 
 nested_serializer = DirectionViewSerialized()
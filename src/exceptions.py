@@ -42,4 +42,23 @@ class NotAuthenticated(DetailedHTTPException):
 
 class BadRequestS3(DetailedHTTPException):
     STATUS_CODE = status.HTTP_400_BAD_REQUEST
-    DETAIL = "Не удалось обработать запрос S3."
\ No newline at end of file
+    DETAIL = "Не удалось обработать запрос S3."
+
+class ServiceUnavailable(DetailedHTTPException):
+    STATUS_CODE = status.HTTP_503_SERVICE_UNAVAILABLE
+    DETAIL = "Внешний сервис недоступен"
+
+class ServiceRejectedRequest(DetailedHTTPException):
+    STATUS_CODE = status.HTTP_502_BAD_GATEWAY
+    DETAIL = "Внешний сервис отклонил запрос"
+
+    def __init__(self, response_status: int, response_text: str) -> None:
+        super().__init__()
+        self.response_status = response_status
+        self.response_text = response_text
+
+class DocumentConversionFailed(DetailedHTTPException):
+    DETAIL = "Не удалось сформировать документ"
+
+class InvalidCursor(BadRequest):
+    DETAIL = "Некорректный курсор пагинации"
@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
@@ -24,8 +24,8 @@ async def create(payload: ExpenseCreateSchemas, user: Users = Depends(JWTBearer(
 
 @router.get("/expense", dependencies=[PermsRequired([Permission.VIEW_EXPENSE])],
             response_model=List[ExpenseViewSchemas])
-async def get(db: AsyncSession = Depends(get_db)):
-    return await expense_service.get(db)
+async def get(request: Request):
+    return (await expense_service.get_reference()).to_response(request)
 
 
 @router.get("/expense/{id}", dependencies=[PermsRequired([Permission.VIEW_EXPENSE])], response_model=ExpenseViewSchemas)
@@ -4,7 +4,8 @@ from fastapi import Depends
 from sqlalchemy import exc, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
+from src.common.cache import ReferenceData, reference_cache
+from src.database import async_session, get_db
 from src.exceptions import IdNotFound
 from src.expenses.exceptions import ExpenseNotFound, ExpenseNotUnique
 from src.expenses.models import Expense
@@ -22,6 +23,7 @@ class ExpenseService:
             set_model = model(creator=user.id, **payload.model_dump())
             db.add(set_model)
             await db.commit()
+            reference_cache.bump("expenses")
             await db.refresh(set_model)
             return set_model
         except exc.IntegrityError:
@@ -33,7 +35,13 @@ class ExpenseService:
         query = await db.execute(select(model))
         data = query.scalars().all()
         return data
-        
+
+    async def get_reference(self) -> ReferenceData:
+        async def load():
+            async with async_session() as session:
+                return [ExpenseViewSchemas.model_validate(expense) for expense in await self.get(session)]
+        return await reference_cache.get("expenses", ("expenses",), load)
+
     async def get_by_id(self, id: int = None, db: AsyncSession = Depends(get_db)) -> ExpenseViewSchemas:
         if not id:
             raise IdNotFound()
@@ -59,6 +67,7 @@ class ExpenseService:
         )
         await db.execute(stmt)
         await db.commit()
+        reference_cache.bump("expenses")
         await db.refresh(data)
         return data
 
@@ -72,5 +81,6 @@ class ExpenseService:
             raise ExpenseNotFound()
         await db.delete(data)
         await db.commit()
+        reference_cache.bump("expenses")
 
 expense_service = ExpenseService()
\ No newline at end of file
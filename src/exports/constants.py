@@ -0,0 +1,3 @@
+class ErrorCode:
+    EXPORT_JOB_NOT_FOUND = "Задача выгрузки не найдена."
+    EXPORT_ID_REQUIRED = "Для этой выгрузки необходимо указать id."
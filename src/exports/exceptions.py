@@ -0,0 +1,10 @@
+from src.exceptions import BadRequest, NotFound
+from src.exports.constants import ErrorCode
+
+
+class ExportJobNotFound(NotFound):
+    DETAIL = ErrorCode.EXPORT_JOB_NOT_FOUND
+
+
+class ExportIdRequired(BadRequest):
+    DETAIL = ErrorCode.EXPORT_ID_REQUIRED
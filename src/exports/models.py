@@ -0,0 +1,41 @@
+from enum import Enum
+
+from sqlalchemy import JSON, Column, DateTime, ForeignKey, Index, Integer, String
+
+from src.common.models import TimestampMixin
+from src.database import Base
+
+
+class ExportType(str, Enum):
+    ORDERS = "ORDERS"
+    SHIPPING_ORDERS = "SHIPPING_ORDERS"
+    COURIER_ORDERS = "COURIER_ORDERS"
+
+
+class ExportStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+class ExportJob(Base, TimestampMixin):
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    export_type = Column(String, nullable=False)
+    filters = Column(JSON, nullable=False)
+    filters_hash = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default=ExportStatus.PENDING.value)
+    file_path = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # at most one in-flight job per filter set
+        Index("ix_export_jobs_in_flight", "filters_hash", unique=True,
+              postgresql_where=status.in_([ExportStatus.PENDING.value, ExportStatus.RUNNING.value])),
+    )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database import get_db
+from src.exports.schemas import ExportJobCreateSchema, ExportJobOut
+from src.exports.service import export_service
+from src.users.auth import JWTBearer
+from src.users.models import Users
+
+router = APIRouter(
+    tags=["Exports"]
+)
+
+
+@router.post("/exports", response_model=ExportJobOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_export(payload: ExportJobCreateSchema, user: Users = Depends(JWTBearer()), db: AsyncSession = Depends(get_db)):
+    return await export_service.create(payload=payload, user=user, db=db)
+
+
+@router.get("/exports/{id}", response_model=ExportJobOut, status_code=status.HTTP_200_OK)
+async def get_export(id: int, user: Users = Depends(JWTBearer()), db: AsyncSession = Depends(get_db)):
+    return await export_service.get_by_id(id=id, user=user, db=db)
@@ -0,0 +1,57 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel
+
+from src.common.models import SortOrder
+from src.directions.models import TransportationType
+from src.exports.models import ExportStatus, ExportType
+from src.orders.models import OrderStatus
+
+
+class ExportFilters(BaseModel):
+    # shipping id for SHIPPING_ORDERS, courier id for COURIER_ORDERS
+    id: int | None = None
+    status: list[OrderStatus] | None = None
+    warehouse_id: list[int] | None = None
+    direction_id: list[int] | None = None
+    transportation_type: list[TransportationType] | None = None
+    start_date: date | None = None
+    end_date: date | None = None
+    sort_by: str | None = None
+    sort_order: SortOrder | None = None
+    today: bool | None = None
+    all_time: bool | None = None
+    search: str | None = None
+
+
+class ExportJobCreateSchema(BaseModel):
+    export_type: ExportType
+    filters: ExportFilters = ExportFilters()
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "export_type": "ORDERS",
+                "filters": {
+                    "status": ["CREATED"],
+                    "start_date": "2024-01-01",
+                    "end_date": "2024-12-31"
+                }
+            }
+        }
+    }
+
+
+class ExportJobOut(BaseModel):
+    id: int
+    export_type: ExportType
+    status: ExportStatus
+    created_at: datetime
+    finished_at: datetime | None = None
+    expires_at: datetime | None = None
+    error: str | None = None
+    url: str | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import IO
+
+from fastapi import Depends
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.service import file_service
+from src.config import settings
+from src.database import async_session, get_db
+from src.exports.exceptions import ExportIdRequired, ExportJobNotFound
+from src.exports.models import ExportJob, ExportStatus, ExportType
+from src.exports.schemas import ExportFilters, ExportJobCreateSchema, ExportJobOut
+from src.users.models import Users
+from src.users.schemas import UserViewSchemas
+
+logger = logging.getLogger(__name__)
+
+
+class ExportService:
+    def get_filters_hash(self, payload: ExportJobCreateSchema, user_id: int) -> str:
+        # the user is part of the key: the orders export depends on the user's permissions
+        data = {
+            "export_type": payload.export_type.value,
+            "user_id": user_id,
+            "filters": payload.filters.model_dump(mode="json", exclude_none=True)
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+    async def find_reusable(self, filters_hash: str, db: AsyncSession = Depends(get_db)) -> ExportJob | None:
+        """Returns an in-flight job or a finished one whose result hasn't expired."""
+        query = await db.execute(select(ExportJob).where(
+            ExportJob.filters_hash == filters_hash,
+            or_(
+                ExportJob.status.in_([ExportStatus.PENDING.value, ExportStatus.RUNNING.value]),
+                and_(ExportJob.status == ExportStatus.DONE.value, ExportJob.expires_at > datetime.now())
+            )
+        ).order_by(ExportJob.id.desc()).limit(1))
+        return query.scalar_one_or_none()
+
+    async def create(self, payload: ExportJobCreateSchema, user: UserViewSchemas, db: AsyncSession = Depends(get_db)) -> ExportJobOut:
+        if payload.export_type != ExportType.ORDERS and payload.filters.id is None:
+            raise ExportIdRequired()
+        filters_hash = self.get_filters_hash(payload, user.id)
+        job = await self.find_reusable(filters_hash, db)
+        if job is None:
+            job = ExportJob(
+                user_id=user.id,
+                export_type=payload.export_type.value,
+                filters=payload.filters.model_dump(mode="json"),
+                filters_hash=filters_hash,
+                status=ExportStatus.PENDING.value
+            )
+            db.add(job)
+            try:
+                await db.commit()
+            except IntegrityError:
+                # the same export was enqueued concurrently
+                await db.rollback()
+                job = await self.find_reusable(filters_hash, db)
+                if job is None:
+                    raise
+            else:
+                export_worker.notify()
+        return await self.serialize(job)
+
+    async def get_by_id(self, id: int, user: UserViewSchemas, db: AsyncSession = Depends(get_db)) -> ExportJobOut:
+        query = await db.execute(select(ExportJob).where(ExportJob.id == id, ExportJob.user_id == user.id))
+        job = query.scalar_one_or_none()
+        if job is None:
+            raise ExportJobNotFound()
+        return await self.serialize(job)
+
+    async def serialize(self, job: ExportJob) -> ExportJobOut:
+        url = None
+        if job.status == ExportStatus.DONE.value and job.expires_at > datetime.now():
+            url = await file_service.get_url(job.file_path)
+        return ExportJobOut(**job.__dict__, url=url)
+
+    async def generate(self, job: ExportJob) -> IO[bytes]:
+        from src.orders.utils import generate_excel_file
+        from src.shipping.service import shipping_service
+        filters = ExportFilters(**job.filters)
+        async with async_session() as db:
+            if job.export_type == ExportType.SHIPPING_ORDERS.value:
+                return await shipping_service.generate_excel_file(filters.id, db, None)
+            if job.export_type == ExportType.COURIER_ORDERS.value:
+                return await shipping_service.generate_courier_excel(filters.id, db, None)
+            user = await db.get(Users, job.user_id)
+            await db.commit()
+            return await generate_excel_file(
+                db, user, filters.status, filters.warehouse_id, filters.direction_id, filters.transportation_type,
+                filters.start_date, filters.end_date, filters.sort_by, filters.sort_order, filters.today,
+                filters.all_time, filters.search)
+
+    async def run(self, job: ExportJob) -> None:
+        file_path = f"exports/{job.id}/{job.export_type.lower()}.xlsx"
+        try:
+            excel_file = await self.generate(job)
+            with excel_file:
+                await file_service.upload_file(file_path, excel_file)
+        except Exception as e:
+            logger.exception("Export job %s failed", job.id)
+            values = dict(status=ExportStatus.FAILED.value, error=str(e), finished_at=datetime.now())
+        else:
+            finished_at = datetime.now()
+            values = dict(
+                status=ExportStatus.DONE.value,
+                file_path=file_path,
+                finished_at=finished_at,
+                expires_at=finished_at + timedelta(seconds=settings.EXPORTS_RESULT_TTL)
+            )
+        async with async_session() as db:
+            await db.execute(update(ExportJob).where(ExportJob.id == job.id).values(**values))
+            await db.commit()
+
+
+class ExportWorker:
+    """Pool of asyncio tasks that generate pending exports in the app process.
+
+    Jobs are claimed with ``FOR UPDATE SKIP LOCKED`` so several app workers
+    can run pools side by side. A job left RUNNING for longer than
+    EXPORTS_JOB_TIMEOUT (e.g. its worker died) is claimed again.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: int):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        self._wakeup.set()
+
+    async def claim(self) -> ExportJob | None:
+        now = datetime.now()
+        candidate = select(ExportJob.id).where(or_(
+            ExportJob.status == ExportStatus.PENDING.value,
+            and_(ExportJob.status == ExportStatus.RUNNING.value,
+                 ExportJob.started_at < now - timedelta(seconds=settings.EXPORTS_JOB_TIMEOUT))
+        )).order_by(ExportJob.id).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+        async with async_session() as db:
+            job = await db.execute(
+                update(ExportJob).where(ExportJob.id == candidate).values(
+                    status=ExportStatus.RUNNING.value, started_at=now
+                ).returning(ExportJob))
+            job = job.scalar_one_or_none()
+            await db.commit()
+        return job
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Failed to claim an export job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await export_service.run(job)
+
+
+export_service = ExportService()
+export_worker = ExportWorker(concurrency=settings.EXPORTS_WORKERS, poll_interval=settings.EXPORTS_POLL_INTERVAL)
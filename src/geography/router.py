@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
@@ -21,8 +21,8 @@ router = APIRouter(
             status_code=status.HTTP_200_OK,
             response_model=List[GeographyViewSchemas],
             dependencies=[PermsRequired([Permission.VIEW_CITY])])
-async def get_cities():
-    return await geography_service.list_cities()
+async def get_cities(request: Request):
+    return (await geography_service.get_cities_reference()).to_response(request)
 
 
 @router.post("/cities",
@@ -52,8 +52,8 @@ async def delete_city(id: int, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/districts/{city_id}", status_code=status.HTTP_200_OK, response_model=List[DistrictViewSchemas])
-async def get_district(db: AsyncSession = Depends(get_db), city_id: int = None):
-    return await district_service.get(city_id, db)
+async def get_district(request: Request, city_id: int = None):
+    return (await district_service.get_reference(city_id)).to_response(request)
 
 
 @router.get("/districts", status_code=status.HTTP_200_OK, response_model=DistrictViewSchemas)
@@ -90,5 +90,5 @@ async def delete_district(id: int, db: AsyncSession = Depends(get_db)):
             status_code=status.HTTP_200_OK,
             response_model=List[CityDistrictsOut],
             dependencies=[PermsRequired([Permission.VIEW_CITY])])
-async def get_cities_districts(db: AsyncSession = Depends(get_db)):
-    return await district_service.get_cities_districts(db)
+async def get_cities_districts(request: Request):
+    return (await district_service.get_cities_districts_reference()).to_response(request)
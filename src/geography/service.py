@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.common.cache import ReferenceData, reference_cache
 from src.dao.base import BaseDao
 from src.database import get_db
 from src.geography.models import City, District
@@ -18,14 +19,23 @@ class GeographyService(BaseDao):
     class_name = City
 
     async def create(self, payload: GeographyCreateSchemas) -> dict:
-        return await GeographyService.add({"name": payload.name})
+        city = await GeographyService.add({"name": payload.name})
+        reference_cache.bump("cities")
+        return city
 
     async def create_with_list(self, payload: list):
-        return await GeographyService.add_all(payload)
+        cities = await GeographyService.add_all(payload)
+        reference_cache.bump("cities")
+        return cities
 
     async def list_cities(self):
         return await GeographyService.all()
 
+    async def get_cities_reference(self) -> ReferenceData:
+        async def load():
+            return [GeographyViewSchemas(**city.__dict__) for city in await GeographyService.all()]
+        return await reference_cache.get("cities", ("cities",), load)
+
     async def get_city(self, id: int, db: AsyncSession = Depends(get_db)) -> GeographyViewSchemas:
         city = select(City).where(City.id == id)
         city = await db.execute(city)
@@ -41,6 +51,7 @@ class GeographyService(BaseDao):
         if city:
             await db.delete(city)
             await db.commit()
+            reference_cache.bump("cities", "districts")
             return {"detail": "City deleted"}
         raise HTTPException(status_code=404, detail="City not found")
 
@@ -51,6 +62,7 @@ class GeographyService(BaseDao):
         if city:
             city.name = payload.name
             await db.commit()
+            reference_cache.bump("cities")
             return GeographyViewSchemas(**city.__dict__)
         raise HTTPException(status_code=404, detail="City not found")
 
@@ -60,6 +72,7 @@ class GeographyDistrictService(BaseDao):
 
     async def create(self, payload: DistrictCreateSchemas, db: AsyncSession = Depends(get_db)) -> DistrictViewSchemas:
         district_data = await GeographyDistrictService.add({"name": payload.name, "city_id": payload.city})
+        reference_cache.bump("districts")
 
         city_query = await db.execute(select(City).where(City.id == district_data.city_id))
         city = city_query.scalar_one_or_none()
@@ -74,15 +87,14 @@ class GeographyDistrictService(BaseDao):
 
     async def get(self, city_id: int, db: AsyncSession = Depends(get_db)) -> List[DistrictViewSchemas]:
         disctricts = await GeographyDistrictService.find_all({"city_id": city_id})
-        resp = []
-        for district in disctricts:
-            city_query = await db.execute(select(City).where(City.id == district.city_id))
-            city = city_query.scalar_one_or_none()
-            city_model = GeographyViewSchemas(**city.__dict__)
-            disctrict_data = DistrictViewSchemas(
-                **district.__dict__, city=city_model)
-            resp.append(disctrict_data)
-        return resp
+        if not disctricts:
+            return []
+        city = await GeographyService.find_by_id(city_id)
+        city_model = GeographyViewSchemas(**city.__dict__)
+        return [DistrictViewSchemas(**district.__dict__, city=city_model) for district in disctricts]
+
+    async def get_reference(self, city_id: int) -> ReferenceData:
+        return await reference_cache.get(("districts", city_id), ("cities", "districts"), lambda: self.get(city_id))
 
     async def get_by_id(self, id: int, db: AsyncSession = Depends(get_db)) -> DistrictViewSchemas:
         district = await GeographyDistrictService.find_by_id(id)
@@ -95,17 +107,15 @@ class GeographyDistrictService(BaseDao):
 
     async def get_cities_districts(self, db: AsyncSession = Depends(get_db)) -> List[CityDistrictsOut]:
         cities = await GeographyService.all()
-        resp = []
-        for city in cities:
-            disctricts = await GeographyDistrictService.find_all({"city_id": city.id})
-            disctricts_data = []
-            for district in disctricts:
-                disctricts_data.append(DistrictShortViewSchemas(
-                    **district.__dict__, city=city.id))
-            city_data = CityDistrictsOut(
-                id=city.id, name=city.name, districts=disctricts_data)
-            resp.append(city_data)
-        return resp
+        city_districts = {city.id: [] for city in cities}
+        for district in await GeographyDistrictService.all():
+            if district.city_id in city_districts:
+                city_districts[district.city_id].append(DistrictShortViewSchemas(
+                    **district.__dict__, city=district.city_id))
+        return [CityDistrictsOut(id=city.id, name=city.name, districts=city_districts[city.id]) for city in cities]
+
+    async def get_cities_districts_reference(self) -> ReferenceData:
+        return await reference_cache.get("cities_districts", ("cities", "districts"), self.get_cities_districts)
 
     async def update_distict(self, id: int, payload: DistrictUpdateSchemas, db: AsyncSession = Depends(get_db)):
         district = select(District).where(District.id == id)
@@ -115,6 +125,7 @@ class GeographyDistrictService(BaseDao):
             district.name = payload.name
             district.city_id = payload.city
             await db.commit()
+            reference_cache.bump("districts")
             return district
         raise HTTPException(status_code=404, detail="District not found")
 
@@ -124,6 +135,7 @@ class GeographyDistrictService(BaseDao):
         if district:
             await db.delete(district)
             await db.commit()
+            reference_cache.bump("districts")
             return {"detail": "District deleted"}
         raise HTTPException(status_code=404, detail="District not found")
 
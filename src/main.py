@@ -1,23 +1,31 @@
 import logging
-import sys
 
 import sentry_sdk
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from src.action_history.router import router as action_history_router
+from src.clients.http import close_http_clients
+from src.clients.libreoffice import document_converter
 from src.clients.sendgrid import mail_client
+from src.common.middleware import RequestLoggingMiddleware, setup_logging
 from src.common.models import SendEmail
 from src.common.router import router as common_router
+from src.common.service import file_service
 from src.config import app_configs, settings
 from src.constants import Environment
 from src.directions.router import router as directions_router
 from src.expenses.router import router as expense_router
+from src.exports.router import router as exports_router
+from src.exports.service import export_worker
 from src.geography.router import router as router_geography
 from src.geography.utils import init_data
+from src.notification.service import notification_dispatcher
 from src.orders.router import router as router_orders
 from src.shipping.router import router as shipping_router
 from src.statistics.router import router as router_statistics
+from src.statistics.service import (courier_counters_reconciler,
+                                    statistics_rollup_worker)
 from src.tarifs.router import router as router_tarifs
 from src.transportation_types.router import \
     router as transportation_types_router
@@ -32,11 +40,7 @@ if settings.ENVIRONMENT != Environment.LOCAL:
         environment=settings.ENVIRONMENT.value
     )
 
-if settings.ENVIRONMENT != Environment.LOCAL:
-    logging.basicConfig(
-        stream=sys.stdout,
-        level=logging.DEBUG
-    )
+log_listener = setup_logging(settings.LOG_LEVEL)
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +48,13 @@ app = FastAPI(debug=settings.ENVIRONMENT.is_debug, **app_configs)
 
 origins = ["*"]
 
+app.add_middleware(
+    RequestLoggingMiddleware,
+    logger=logging.getLogger("src.requests"),
+    body_limit=settings.LOG_BODY_LIMIT,
+    sample_rate=settings.LOG_SAMPLE_RATE,
+    route_sample_rates=settings.LOG_ROUTE_SAMPLE_RATES
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -64,35 +75,33 @@ app.include_router(action_history_router)
 app.include_router(router_statistics)
 app.include_router(transportation_types_router)
 app.include_router(router_tarifs)
+app.include_router(exports_router)
 
 
 @app.on_event('startup')
 async def startup_event_setup():
+    log_listener.start()
     await init_data()
+    export_worker.start()
+    notification_dispatcher.start()
+    document_converter.start()
+    statistics_rollup_worker.start()
+    courier_counters_reconciler.start()
+
+
+@app.on_event('shutdown')
+async def shutdown_event():
+    await export_worker.stop()
+    await notification_dispatcher.stop()
+    await document_converter.stop()
+    await statistics_rollup_worker.stop()
+    await courier_counters_reconciler.stop()
+    await file_service.close()
+    await close_http_clients()
+    log_listener.stop()
 
 
 @app.post("/api/v1/send-email", tags=["email"])
 async def send_email(send_email: SendEmail):
     return mail_client.send(send_email)
 
-
-@app.middleware("http")
-async def api_logging(request: Request, call_next):
-    response = await call_next(request)
-
-    response_body = b""
-    async for chunk in response.body_iterator:
-        response_body += chunk
-    log_message = {
-        "host": request.url.hostname,
-        "endpoint": request.url.path,
-        "response": response_body.decode("utf-8", "ignore"),
-        "status_code": response.status_code,
-        "method": request.method,
-        "headers": dict(request.headers),
-        "query_params": dict(request.query_params),
-        "user_agent": request.headers.get("user-agent")
-    }
-    logger.debug(log_message)
-    return Response(content=response_body, status_code=response.status_code,
-                    headers=dict(response.headers), media_type=response.media_type)
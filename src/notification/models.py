@@ -1,6 +1,11 @@
+from datetime import datetime
 from enum import Enum
 
 from pydantic import BaseModel
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+
+from src.common.models import TimestampMixin
+from src.database import Base
 
 
 class NotificationCode(str, Enum):
@@ -14,6 +19,45 @@ class SmsCode(str, Enum):
     TRACKING_TEMPLATE = "TRACKING_TEMPLATE"
 
 
+class NotificationChannel(str, Enum):
+    PUSH = "PUSH"
+    WHATSAPP = "WHATSAPP"
+    EMAIL = "EMAIL"
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+
+class NotificationOutbox(Base, TimestampMixin):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel = Column(String, nullable=False)
+    # device token, phone number or email address
+    recipient = Column(String, nullable=False)
+    title = Column(String, nullable=True)
+    # may hold passwords and confirmation codes, so it's cleared once the message is sent or failed
+    body = Column(Text, nullable=True)
+    dedup_key = Column(String, nullable=False)
+    status = Column(String, nullable=False, default=OutboxStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # a claimed message is pushed into the future, so it's retried if its worker dies
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # the same message can't be queued twice until it's sent
+        Index("ix_notification_outbox_pending_dedup_key", "dedup_key", unique=True,
+              postgresql_where=status == OutboxStatus.PENDING.value),
+        Index("ix_notification_outbox_pending_next_attempt_at", "next_attempt_at",
+              postgresql_where=status == OutboxStatus.PENDING.value),
+    )
+
+
 class NotificationTemplate(BaseModel):
     title: str
     message: str
@@ -1,25 +1,192 @@
-from src.clients.firebase import firebase_client
-from src.clients.whatsapp import whatsapp_client
-from src.notification.models import (NOTIFICATION_TEMPLATES, NotificationCode,
-                                     SmsCode)
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.models import SendEmail
+from src.config import settings
+from src.constants import Environment
+from src.database import async_session
+from src.notification.models import (NOTIFICATION_TEMPLATES, NotificationChannel,
+                                     NotificationCode, NotificationOutbox,
+                                     OutboxStatus, SmsCode)
+from src.notification.transports import NotRetryable, get_transports
 from src.users.models import Users
-from src.users.service import user_service
+
+logger = logging.getLogger(__name__)
 
 
 class NotificationService:
-    async def send_notification(self, user_id: int, notification_code: NotificationCode, **kwargs):
-        user: Users = await user_service.find_one_or_none({"id": user_id})
+    """Queues notifications in the outbox table.
+
+    Messages are written with the caller's session and are sent by the
+    dispatcher once the caller's transaction commits; nothing is sent if it
+    rolls back.
+    """
+
+    async def enqueue(self, channel: NotificationChannel, recipient: str, body: str, db: AsyncSession,
+                      title: str | None = None) -> None:
+        # keyed, so the key kept after sending doesn't give away a short code in the body
+        dedup_key = hmac.new(settings.SECRET_KEY.encode(), "\n".join((channel.value, recipient, title or "", body)).encode(),
+                             hashlib.sha256).hexdigest()
+        await db.execute(insert(NotificationOutbox).values(
+            channel=channel.value,
+            recipient=recipient,
+            title=title,
+            body=body,
+            dedup_key=dedup_key,
+            status=OutboxStatus.PENDING.value,
+            next_attempt_at=datetime.now()
+        ).on_conflict_do_nothing(
+            index_elements=[NotificationOutbox.dedup_key],
+            index_where=NotificationOutbox.status == OutboxStatus.PENDING.value
+        ))
+        # wake the dispatcher once the message is visible to it
+        event.listen(db.sync_session, "after_commit", lambda session: notification_dispatcher.notify(), once=True)
+
+    async def send_notification(self, user_id: int, notification_code: NotificationCode, db: AsyncSession, **kwargs):
+        user = await db.get(Users, user_id)
         if not user:
             return {"detail": "User not found"}
-        message = NOTIFICATION_TEMPLATES[notification_code]
-        firebase_client.send_notification(
-            user.device_registration_id, message.title, message.message.format(**kwargs))
+        if user.device_registration_id:
+            message = NOTIFICATION_TEMPLATES[notification_code]
+            await self.enqueue(NotificationChannel.PUSH, user.device_registration_id,
+                               message.message.format(**kwargs), db, title=message.title)
         return {"detail": "Notification sent"}
 
-    def send_sms(self, phone: str, sms_code: SmsCode, **kwargs):
+    async def send_sms(self, phone: str, sms_code: SmsCode, db: AsyncSession, **kwargs):
         message = NOTIFICATION_TEMPLATES[sms_code]
-        whatsapp_client.send_sms(phone, message.message.format(**kwargs))
+        await self.send_message(phone, message.message.format(**kwargs), db)
         return {"detail": "SMS sent"}
 
+    async def send_message(self, phone: str, message: str, db: AsyncSession):
+        await self.enqueue(NotificationChannel.WHATSAPP, phone, message, db)
+
+    async def send_email(self, send_email: SendEmail, db: AsyncSession):
+        await self.enqueue(NotificationChannel.EMAIL, send_email.email, send_email.message, db,
+                           title=send_email.subject)
+
+
+class NotificationDispatcher:
+    """Background task that sends queued notifications in batches.
+
+    A batch is claimed with ``FOR UPDATE SKIP LOCKED`` by pushing its
+    next_attempt_at forward, so a batch whose worker died is sent again
+    after NOTIFICATIONS_LEASE seconds. Failed messages are retried with
+    exponential backoff until NOTIFICATIONS_MAX_ATTEMPTS; errors a retry
+    can't fix fail the message at once.
+
+    Bodies are cleared as soon as a message is sent or has failed, and
+    those rows are deleted after NOTIFICATIONS_RETENTION_DAYS.
+    """
+
+    def __init__(self, batch_size: int, poll_interval: int, fake: bool):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.transports = get_transports(fake)
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._next_purge = 0.0
+
+    def start(self):
+        self._task = asyncio.create_task(self._work())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def notify(self):
+        self._wakeup.set()
+
+    def get_backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(settings.NOTIFICATIONS_BACKOFF * 2 ** (attempts - 1), 3600))
+
+    async def claim(self) -> list[NotificationOutbox]:
+        now = datetime.now()
+        candidates = select(NotificationOutbox.id).where(
+            NotificationOutbox.status == OutboxStatus.PENDING.value,
+            NotificationOutbox.next_attempt_at <= now
+        ).order_by(NotificationOutbox.next_attempt_at).limit(self.batch_size).with_for_update(skip_locked=True)
+        async with async_session() as db:
+            messages = await db.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(candidates.scalar_subquery())).values(
+                    attempts=NotificationOutbox.attempts + 1,
+                    next_attempt_at=now + timedelta(seconds=settings.NOTIFICATIONS_LEASE)
+                ).returning(NotificationOutbox))
+            messages = messages.scalars().all()
+            await db.commit()
+        return messages
+
+    async def dispatch(self, messages: list[NotificationOutbox]) -> None:
+        by_channel = {}
+        for message in messages:
+            by_channel.setdefault(NotificationChannel(message.channel), []).append(message)
+        results = await asyncio.gather(*(
+            self.transports[channel].send(channel_messages) for channel, channel_messages in by_channel.items()
+        ), return_exceptions=True)
+        errors = {}
+        for channel_messages, result in zip(by_channel.values(), results):
+            if isinstance(result, Exception):
+                logger.exception("Failed to send notifications", exc_info=result)
+                result = {message.id: str(result) for message in channel_messages}
+            errors.update(result)
+
+        now = datetime.now()
+        sent = [message.id for message in messages if errors.get(message.id) is None]
+        async with async_session() as db:
+            if sent:
+                await db.execute(update(NotificationOutbox).where(NotificationOutbox.id.in_(sent)).values(
+                    status=OutboxStatus.SENT.value, sent_at=now, last_error=None, body=None))
+            for message in messages:
+                error = errors.get(message.id)
+                if error is None:
+                    continue
+                if isinstance(error, NotRetryable) or message.attempts >= settings.NOTIFICATIONS_MAX_ATTEMPTS:
+                    values = dict(status=OutboxStatus.FAILED.value, last_error=error, body=None)
+                else:
+                    values = dict(next_attempt_at=now + self.get_backoff(message.attempts), last_error=error)
+                await db.execute(update(NotificationOutbox).where(NotificationOutbox.id == message.id).values(**values))
+            await db.commit()
+
+    async def purge(self) -> None:
+        async with async_session() as db:
+            await db.execute(delete(NotificationOutbox).where(
+                NotificationOutbox.status != OutboxStatus.PENDING.value,
+                NotificationOutbox.updated_at < datetime.now() - timedelta(days=settings.NOTIFICATIONS_RETENTION_DAYS)
+            ))
+            await db.commit()
+
+    async def _work(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                messages = await self.claim()
+                if messages:
+                    await self.dispatch(messages)
+                if time.monotonic() >= self._next_purge:
+                    self._next_purge = time.monotonic() + settings.NOTIFICATIONS_PURGE_INTERVAL
+                    await self.purge()
+            except Exception:
+                logger.exception("Failed to dispatch notifications")
+                messages = []
+            if len(messages) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
 
 notification_service = NotificationService()
+notification_dispatcher = NotificationDispatcher(
+    batch_size=settings.NOTIFICATIONS_BATCH_SIZE,
+    poll_interval=settings.NOTIFICATIONS_POLL_INTERVAL,
+    fake=settings.ENVIRONMENT in (Environment.LOCAL, Environment.TESTING)
+)
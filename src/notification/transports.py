@@ -0,0 +1,104 @@
+import asyncio
+from collections import defaultdict
+
+from src.clients.firebase import firebase_client
+from src.clients.http import fan_out
+from src.clients.sendgrid import mail_client
+from src.clients.whatsapp import whatsapp_client
+from src.config import settings
+from src.exceptions import ServiceRejectedRequest
+from src.notification.models import NotificationChannel, NotificationOutbox
+
+# FCM accepts at most 500 tokens per multicast
+PUSH_BATCH_SIZE = 500
+EMAIL_BATCH_SIZE = 1000
+
+
+class NotRetryable(str):
+    """Error of a message that would fail the same way again; the dispatcher marks it FAILED right away."""
+
+
+class PushTransport:
+    async def send(self, messages: list[NotificationOutbox]) -> dict[int, str | None]:
+        """Sends one multicast per distinct title and body."""
+        groups = defaultdict(list)
+        for message in messages:
+            groups[(message.title, message.body)].append(message)
+        errors = {}
+        for (title, body), group in groups.items():
+            for start in range(0, len(group), PUSH_BATCH_SIZE):
+                batch = group[start:start + PUSH_BATCH_SIZE]
+                try:
+                    results = await asyncio.to_thread(
+                        firebase_client.send_multicast, [message.recipient for message in batch], title, body)
+                except Exception as e:
+                    results = [str(e)] * len(batch)
+                errors.update(zip((message.id for message in batch), results))
+        return errors
+
+
+class WhatsappTransport:
+    async def send(self, messages: list[NotificationOutbox]) -> dict[int, str | None]:
+        """Sends concurrently, one recipient's messages in order."""
+        by_recipient = defaultdict(list)
+        for message in messages:
+            by_recipient[message.recipient].append(message)
+
+        async def send_to_recipient(recipient_messages: list[NotificationOutbox]) -> dict[int, str | None]:
+            errors = {}
+            for message in recipient_messages:
+                try:
+                    await whatsapp_client.send_sms(message.recipient, message.body)
+                    errors[message.id] = None
+                except ServiceRejectedRequest as e:
+                    # a bad number or credentials, the gateway answers the same on every attempt
+                    errors[message.id] = NotRetryable(f"{e.response_status}: {e.response_text}")
+                except Exception as e:
+                    errors[message.id] = str(e) or type(e).__name__
+            return errors
+
+        errors = {}
+        for result in await fan_out((send_to_recipient(group) for group in by_recipient.values()),
+                                    limit=settings.WHATSAPP_MAX_CONNECTIONS):
+            errors.update(result)
+        return errors
+
+
+class EmailTransport:
+    async def send(self, messages: list[NotificationOutbox]) -> dict[int, str | None]:
+        """Sends one request per distinct subject and body."""
+        groups = defaultdict(list)
+        for message in messages:
+            groups[(message.title, message.body)].append(message)
+        errors = {}
+        for (subject, body), group in groups.items():
+            for start in range(0, len(group), EMAIL_BATCH_SIZE):
+                batch = group[start:start + EMAIL_BATCH_SIZE]
+                try:
+                    await asyncio.to_thread(mail_client.send_multiple, [message.recipient for message in batch], subject, body)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                errors.update((message.id, error) for message in batch)
+        return errors
+
+
+class FakeTransport:
+    """Records messages instead of sending them, for local runs and tests."""
+
+    def __init__(self):
+        self.sent: list[NotificationOutbox] = []
+
+    async def send(self, messages: list[NotificationOutbox]) -> dict[int, str | None]:
+        self.sent.extend(messages)
+        return {message.id: None for message in messages}
+
+
+def get_transports(fake: bool) -> dict[NotificationChannel, PushTransport | WhatsappTransport | EmailTransport | FakeTransport]:
+    if fake:
+        return {channel: FakeTransport() for channel in NotificationChannel}
+    return {
+        NotificationChannel.PUSH: PushTransport(),
+        NotificationChannel.WHATSAPP: WhatsappTransport(),
+        NotificationChannel.EMAIL: EmailTransport()
+    }
@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+
+from sqlalchemy import Sequence, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+
+# must match INCREMENT BY of the sequence: one nextval reserves a whole block
+ORDER_ID_BLOCK_SIZE = 50
+orders_number_seq = Sequence("orders_number_seq", start=0, minvalue=0, increment=ORDER_ID_BLOCK_SIZE)
+
+# random ids of older orders are below 10**6, new ids start at 7 digits
+FIRST_DIGITS = 7
+FEISTEL_ROUNDS = 4
+
+
+class FeistelPermutation:
+    """Keyed bijection of [0, size) so consecutive numbers don't look consecutive.
+
+    A balanced Feistel network permutes the smallest even-width bit space
+    covering ``size``; values falling outside are walked through it again
+    until they land inside, which keeps the mapping a bijection.
+    """
+
+    def __init__(self, size: int, key: bytes):
+        self.size = size
+        self.key = key
+        self.half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+        self.mask = (1 << self.half_bits) - 1
+
+    def round(self, number: int, value: int) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8, "big"), key=self.key, digest_size=8,
+                                 person=number.to_bytes(2, "big")).digest()
+        return int.from_bytes(digest, "big") & self.mask
+
+    def encrypt_block(self, value: int) -> int:
+        left, right = value >> self.half_bits, value & self.mask
+        for number in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ self.round(number, right)
+        return (left << self.half_bits) | right
+
+    def __call__(self, value: int) -> int:
+        value = self.encrypt_block(value)
+        while value >= self.size:
+            value = self.encrypt_block(value)
+        return value
+
+
+class OrderIdAllocator:
+    """Hands out unique, non-sequential order ids without probing the table.
+
+    Sequence values are mapped through a keyed permutation of the 7-digit
+    numbers, then of the 8-digit ones once those run out, and so on. Each
+    worker reserves ORDER_ID_BLOCK_SIZE sequence values per round trip.
+    ORDER_ID_KEY must never change: other keys map to other ids and would
+    collide with the ones already issued.
+    """
+
+    def __init__(self, key: str):
+        self.key = hashlib.blake2b(key.encode(), digest_size=32).digest()
+        self._permutations: dict[int, FeistelPermutation] = {}
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    def get_permutation(self, digits: int) -> FeistelPermutation:
+        if digits not in self._permutations:
+            self._permutations[digits] = FeistelPermutation(9 * 10 ** (digits - 1), self.key)
+        return self._permutations[digits]
+
+    def to_id(self, number: int) -> int:
+        digits = FIRST_DIGITS
+        while number >= 9 * 10 ** (digits - 1):
+            number -= 9 * 10 ** (digits - 1)
+            digits += 1
+        return 10 ** (digits - 1) + self.get_permutation(digits)(number)
+
+    async def allocate(self, db: AsyncSession) -> int:
+        async with self._lock:
+            if self._next >= self._end:
+                # nextval isn't rolled back with the caller's transaction, so a block is never reused
+                self._next = await db.scalar(select(orders_number_seq.next_value()))
+                self._end = self._next + ORDER_ID_BLOCK_SIZE
+            number = self._next
+            self._next += 1
+        return self.to_id(number)
+
+
+order_id_allocator = OrderIdAllocator(settings.ORDER_ID_KEY)
@@ -1,15 +1,15 @@
-import random
 from datetime import datetime
 from enum import Enum
 
 from sqlalchemy import (DECIMAL, Boolean, Column, DateTime, Float, ForeignKey,
-                        Integer, String, text, select)
+                        Index, Integer, String, Text, text)
 from sqlalchemy.dialects.postgresql import ENUM as PgEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from src.common.models import TimestampMixin
 from src.database import Base
 from src.expenses.models import order_expenses
+from src.orders.ids import order_id_allocator
 from src.shipping.models import (shipping_order_association,
                                  shipping_order_items_association)
 from src.users.perms import if_user_has_permissions
@@ -104,7 +104,7 @@ class Orders(Base, TimestampMixin):
     cancellation_reason = Column(String, nullable=True)
     start_warehouse_id = Column(
         Integer, ForeignKey("warehouses.id"), nullable=True)
-    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True, index=True)
     destination_warehouse_id = Column(
         Integer, ForeignKey("warehouses.id"), nullable=True)
     direction_id = Column(Integer, ForeignKey("directions.id"))
@@ -129,18 +129,21 @@ class Orders(Base, TimestampMixin):
     order_photo = relationship(
         "OrderPhoto", back_populates="order", lazy="selectin")
     users = relationship("UsersOrders", back_populates="order")
+    # text matched by the search query param, filled in by database triggers
+    search_document = deferred(Column(Text, nullable=True))
+
+    __table_args__ = (
+        Index("ix_orders_search_document", "search_document", postgresql_using="gin",
+              postgresql_ops={"search_document": "gin_trgm_ops"}),
+        Index("ix_orders_created_at", "created_at"),
+    )
 
     def is_payment_editable(self, user, db):
         return if_user_has_permissions(db, user.id, [Permission.UPDATE_PAYMENT_STATUS_UL])
 
     @staticmethod
     async def generate_unique_id(db):
-        while True:
-            potential_id = random.randint(100000, 999999)
-            stmt = select(Orders).where(Orders.id == potential_id)
-            result = await db.execute(stmt)
-            if result.scalar() is None:
-                return potential_id
+        return await order_id_allocator.allocate(db)
 
 
 class OrderItems(Base):
@@ -154,7 +157,7 @@ class OrderItems(Base):
     qr_code_hash = Column(String, nullable=True, unique=True)
     shippings = relationship("Shipping", secondary=shipping_order_items_association,
                              back_populates="order_items", lazy="selectin")
-    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True, index=True)
     is_loaded = Column(Boolean, server_default=text('false'))
 
 
@@ -1,11 +1,13 @@
 from datetime import date
 
 from fastapi import APIRouter, Body, Depends, File, Query, UploadFile, status
+from pydantic import conlist
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import Response, StreamingResponse
+from starlette.responses import StreamingResponse
 
 from src.action_history.schemas import SetOrderItemWarehouseStatus
 from src.common.models import SortOrder
+from src.common.utils import iter_file
 from src.database import get_db
 from src.directions.models import TransportationType
 from src.orders.schemas import (CancelledOrder, CourierDeliverySchema,
@@ -35,8 +37,8 @@ async def create_order(payload: OrdersCreateSchemas, db: AsyncSession = Depends(
             dependencies=[PermsRequired([Permission.VIEW_ORDER])],
             response_model=OrderPaginated,
             status_code=status.HTTP_200_OK)
-async def get_orders_paginated(user: str = Depends(JWTBearer()), db: AsyncSession = Depends(get_db), status: list[OrderStatus] = Query(None), warehouse_id: list[int] = Query(None), direction_id: list[int] = Query(None), transportation_type: list[TransportationType] = Query(None), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, sort_by: str = Query(None), sort_order: SortOrder = Query(None), today: bool = Query(None), all_time: bool = Query(None), search: str = Query(None), shipping_id: int = Query(None)) -> OrderPaginated:
-    return await order_service.get_orders_paginated(user, db, status, warehouse_id, direction_id, transportation_type, start_date, end_date, page, limit, sort_by, sort_order, today, all_time, search, shipping_id)
+async def get_orders_paginated(user: str = Depends(JWTBearer()), db: AsyncSession = Depends(get_db), status: list[OrderStatus] = Query(None), warehouse_id: list[int] = Query(None), direction_id: list[int] = Query(None), transportation_type: list[TransportationType] = Query(None), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, sort_by: str = Query(None), sort_order: SortOrder = Query(None), today: bool = Query(None), all_time: bool = Query(None), search: str = Query(None), shipping_id: int = Query(None), cursor: str = Query(None)) -> OrderPaginated:
+    return await order_service.get_orders_paginated(user, db, status, warehouse_id, direction_id, transportation_type, start_date, end_date, page, limit, sort_by, sort_order, today, all_time, search, shipping_id, cursor)
 
 
 @router.get("/orders/excel",
@@ -54,9 +56,9 @@ async def download_orders_excel(user: str = Depends(JWTBearer()), db: AsyncSessi
     excel_file = await generate_excel_file(db, user, status, warehouse_id, direction_id, transportation_type,
                                            start_date, end_date, sort_by, sort_order, today,
                                            all_time, search)
-    return Response(content=excel_file.read(),
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": "attachment; filename=orders.xlsx"})
+    return StreamingResponse(iter_file(excel_file),
+                             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                             headers={"Content-Disposition": "attachment; filename=orders.xlsx"})
 
 
 @router.get("/orders/{id}",
@@ -276,6 +278,12 @@ async def get_total_sum(payload: TotalAmountOrder, db: AsyncSession = Depends(ge
     return await order_service.total_amount(payload, db)
 
 
+@router.post("/orders/calculate_total_sum/batch",
+             status_code=status.HTTP_200_OK)
+async def get_total_sum_batch(payload: conlist(TotalAmountOrder, min_length=1, max_length=500)) -> list[TotalAmount]:
+    return await order_service.total_amount_batch(payload)
+
+
 @router.post("/orders_items/take_for_delivery",
              dependencies=[Depends(JWTBearer())],
              status_code=status.HTTP_200_OK)
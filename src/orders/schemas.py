@@ -381,6 +381,7 @@ class OrderPaginated(BaseModel):
     limit: int
     total: int
     pages_number: int
+    next_cursor: str | None = None
     data: list[OrderViewSchemasShort]
 
 
@@ -1,39 +1,36 @@
 import asyncio
 import io
-import math
 import os
 import random
-import subprocess
 from collections import defaultdict
 from datetime import date, datetime
 from decimal import Decimal
 
-from docx import Document
 from fastapi import Depends, File, HTTPException, UploadFile, status
-from sqlalchemy import (String, and_, asc, cast, delete, desc, func, not_, or_,
-                        select, update)
+from sqlalchemy import (and_, asc, delete, desc, func, not_, or_, select,
+                        update)
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased, joinedload, selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from starlette.responses import StreamingResponse
 
 from src.action_history.models import ActionCode
 from src.action_history.schemas import (ActionHistoryCreate,
                                         SetOrderItemWarehouseStatus)
 from src.action_history.service import action_history_service
-from src.clients.whatsapp import whatsapp_client
+from src.clients.libreoffice import document_converter
+from src.common.documents import get_template
 from src.common.models import SortOrder
+from src.common.search import search_by_document
 from src.common.service import file_service
+from src.common.utils import paginator
 from src.config import settings
-from src.constants import Environment
 from src.dao.base import BaseDao
 from src.database import get_db
 from src.directions.models import Directions, TransportationType
 from src.exceptions import PermissionDenied
 from src.expenses.models import Expense, order_expenses
-from src.geography.models import City
-from src.notification.models import (NOTIFICATION_TEMPLATES, NotificationCode,
-                                     SmsCode)
+from src.notification.models import NotificationCode, SmsCode
 from src.notification.service import notification_service
 from src.orders.models import (DeliveryType, OrderItems, OrderPhoto, Orders,
                                OrderStatus, Payment, PaymentStatus)
@@ -50,8 +47,9 @@ from src.orders.utils import nested_serializer
 from src.shipping.models import (Shipping, ShippingRespond,
                                  ShippingRespondStatus, ShippingStatus,
                                  ShippingWarehouse)
-from src.tarifs.models import CalculationType, Tarifs
-from src.users.models import Group, OTPSigningCode, OTPType, Users, UsersOrders
+from src.statistics.service import courier_counter_service
+from src.tarifs.utils import tarif_index
+from src.users.models import Group, OTPSigningCode, OTPType
 from src.users.perms import if_user_has_permissions
 from src.users.schemas import GroupEnum, Permission, UserViewSchemas
 from src.warehouse.models import Warehouse
@@ -140,12 +138,7 @@ class OrderItemService:
         order = await db.execute(select(Orders).where(Orders.id == order_item.order_id))
         order = order.scalar_one_or_none()
         if order and order.order_status == OrderStatus.COURIER_DELIVERING_TO_WAREHOUSE.value and order.courier:
-            new_association = UsersOrders(
-                user_id=order.courier,
-                order_id=order.id,
-                status=OrderStatus.ACCEPTED_TO_WAREHOUSE.value
-            )
-            db.add(new_association)
+            await courier_counter_service.add_courier_order(order, OrderStatus.ACCEPTED_TO_WAREHOUSE, db)
         order_status = order.order_status if order else None
         is_all_items_accepted = True
         for item in order.order_items:
@@ -160,8 +153,6 @@ class OrderItemService:
                                         action_code=ActionCode.ARRIVED_MIDDLE_WAREHOUSE), db)
             else:
                 await action_history_service.add_action(ActionHistoryCreate(order_id=order.id, warehouse_manager_id=user.id, warehouse_id=warehouse.id, action_code=ActionCode.ACCEPTED_TO_WAREHOUSE), db)
-            if order.courier:
-                await db.execute(update(Users).where(Users.id == order.courier).values(selected_orders=Users.selected_orders + 1))
         await db.commit()
         return order_item
 
@@ -237,27 +228,16 @@ class OrderItemService:
         await action_history_service.add_action(ActionHistoryCreate(order_item_id=id, action_code=ActionCode.PARTIALLY_IN_TRANSIT, manager_id=user.id), db)
         return order_item
 
-    def paginate(self, order_items, page: int, limit: int):
-        return order_items.offset((page - 1) * limit).limit(limit)
-
     async def get_paginated_order_items_by_order_id(self, order_id: int, db: AsyncSession = Depends(get_db), page: int = 1, limit: int = 10) -> OrderItemsPaginated:
         filtered_order_items = select(OrderItems).where(
-            OrderItems.order_id == order_id)
-        paginated_order_items = self.paginate(
-            filtered_order_items, page, limit)
-        query = await db.execute(paginated_order_items)
-        order_items = query.scalars().all()
-        total = await db.execute(filtered_order_items)
-        total = len(total.scalars().all())
-        pages_number = total // limit
-        if total % limit != 0:
-            pages_number += 1
+            OrderItems.order_id == order_id).order_by(OrderItems.id)
+        order_items = await paginator.paginate(db, filtered_order_items, page, limit)
         return OrderItemsPaginated(
             page=page,
-            pages_number=pages_number,
-            total=total,
+            pages_number=order_items.pages_number,
+            total=order_items.total,
             limit=limit,
-            data=order_items
+            data=order_items.items
         )
 
 
@@ -316,9 +296,6 @@ class OrderService(BaseDao):
         await action_history_service.add_action(ActionHistoryCreate(order_id=order.id, action_code=ActionCode.CREATED), db)
         return await nested_serializer.serialize_by_id(order.id, db)
 
-    def paginate_orders(self, orders, page: int, limit: int):
-        return orders.offset((page - 1) * limit).limit(limit)
-
     def generate_otp_code(self):
         return ''.join((random.choice('0123456789') for i in range(6)))
 
@@ -368,36 +345,22 @@ class OrderService(BaseDao):
         return orders
 
     def search_orders(self, orders, search: str = None):
-        if search and not search.isspace():
-            arrival_city = aliased(City)
-            departure_city = aliased(City)
-            orders = orders.join(Directions).join(
-                arrival_city,
-                arrival_city.id == Directions.arrival_city_id).join(
-                departure_city,
-                departure_city.id == Directions.departure_city_id).where(
-                or_(
-                    arrival_city.name.ilike(f"%{search}%"),
-                    departure_city.name.ilike(f"%{search}%"),
-                    Orders.sender_fio.ilike(f"%{search}%"),
-                    Orders.receiver_fio.ilike(f"%{search}%"),
-                    Orders.sender_phone.ilike(f"%{search}%"),
-                    Orders.receiver_phone.ilike(f"%{search}%"),
-                    cast(Orders.id, String).ilike(f"%{search}%")
-                ))
-        return orders
+        return search_by_document(orders, Orders.search_document, search)
 
     async def get_orders_paginated(self, user: UserViewSchemas, db: AsyncSession = Depends(get_db),
                                    status: list[OrderStatus] = None, warehouse_id: list[int] = None,
                                    direction_id: list[int] = None, transportation_type: list[TransportationType] = None,
                                    start_date: date = None, end_date: date = None, page: int = 1, limit: int = 10,
                                    sort_by: str = None, sort_order: SortOrder = None, today: bool = None,
-                                   all_time: bool = None, search: str = None, shipping_id: int = None) -> OrderPaginated:
+                                   all_time: bool = None, search: str = None, shipping_id: int = None,
+                                   cursor: str = None) -> OrderPaginated:
         main_query = select(Orders).options(
             selectinload(
                 Orders.direction), selectinload(
                 Orders.warehouse), selectinload(
                 Orders.payment))
+        # before filter_orders, so that relevance ranks ahead of the requested sort
+        main_query = self.search_orders(main_query, search)
         if status is not None:
             orders_filtered_by_status = main_query.where(Orders.order_status.in_(
                 [status_group.value for status_group in status]))
@@ -449,21 +412,19 @@ class OrderService(BaseDao):
         elif (await if_user_has_permissions(db, user.id, [Permission.UPDATE_PAYMENT_STATUS_UL])):
             filtered_orders = filtered_orders.join(Payment).where(
                 Payment.payer_type == PayerType.UL.value)
-        initial_orders = self.search_orders(filtered_orders, search)
-        orders = await db.execute(self.paginate_orders(initial_orders, page, limit))
-        orders = orders.scalars().all()
+        if cursor is not None:
+            orders = await paginator.paginate_by_cursor(db, filtered_orders, Orders, cursor, limit, sort_order)
+        else:
+            orders = await paginator.paginate(db, filtered_orders, page, limit)
         tasks = [nested_serializer.serialize_by_id_short(
-            order) for order in orders]
+            order) for order in orders.items]
         response = await asyncio.gather(*tasks)
-        total_orders = (await db.execute(filtered_orders)).scalars().all()
-        pages_number = len(total_orders) // limit
-        if len(total_orders) % limit != 0:
-            pages_number += 1
         return OrderPaginated(
             page=page,
             limit=limit,
-            total=len(total_orders),
-            pages_number=pages_number,
+            total=orders.total,
+            pages_number=orders.pages_number,
+            next_cursor=orders.next_cursor,
             data=response)
 
     async def get_order(self, id: int, user: UserViewSchemas, db: AsyncSession = Depends(get_db)) -> OrderViewSchemas:
@@ -557,68 +518,9 @@ class OrderService(BaseDao):
         await db.commit()
         return await nested_serializer.serialize_by_id(id, db)
 
-    async def calculate_extra_costs(self, cargo_pickup_type: str, delivery_type: str, total_weight: int,
-                                    total_volume: int, db: AsyncSession = Depends(get_db)) -> (int, int):
-        extra_cargo_cost = 0
-        extra_delivery_cost = 0
-        tarif_weight = (await db.execute(select(Tarifs).filter_by(
-            calculation_type=CalculationType.DELIVERY_WEIGHT.value,
-            amount=math.ceil(total_weight)))).scalar_one_or_none()
-        tarif_volume = (await db.execute(select(Tarifs).filter_by(
-            calculation_type=CalculationType.DELIVERY_VOLUME.value,
-            amount=math.ceil(total_volume)))).scalar_one_or_none()
-        max_price_for_delivery = max(tarif_weight.price if tarif_weight else 0,
-                                     tarif_volume.price if tarif_volume else 0)
-        if cargo_pickup_type == DeliveryType.DELIVERY.value:
-            extra_cargo_cost += max_price_for_delivery
-        if delivery_type == DeliveryType.DELIVERY.value:
-            extra_delivery_cost += max_price_for_delivery
-        return extra_cargo_cost, extra_delivery_cost
-
     async def calculate_tarif(self, db: AsyncSession = Depends(get_db), direction_id=0, total_weight: int = 0,
                               total_volume: int = 0, cargo_pickup_type: str = None, delivery_type: str = None):
-
-        extra_cargo_cost, extra_delivery_cost = await self.calculate_extra_costs(cargo_pickup_type, delivery_type, total_weight, total_volume, db)
-
-        extra_costs = {'weight': 0, 'handling': 0}
-        limit_prices = {'weight': 0, 'handling': 0}
-
-        calculation_types = ["WEIGHT", "HANDLING"]
-
-        # Fetch and set limit prices
-        for calc_type in calculation_types:
-            try:
-                limit_tarif = await db.execute(select(Tarifs).filter_by(
-                    calculation_type=calc_type, direction_id=direction_id, is_limit=True))
-                limit_tarif = limit_tarif.scalar_one().price
-                limit_prices[calc_type.lower()] = limit_tarif
-            except NoResultFound:
-                pass  # Defaults are already set to 0
-        if total_weight > 100:
-            extra_costs['weight'] = (
-                total_weight - 100) * limit_prices['weight']
-            extra_costs['handling'] = (
-                total_weight - 100) * limit_prices['handling']
-            total_weight = 100
-        try:
-            # Fetch tariffs based on updated totals
-            tariffs = {calc_type: (await db.execute(select(Tarifs).filter_by(
-                calculation_type=calc_type,
-                amount=math.ceil(total_weight),
-                direction_id=direction_id))).scalar_one() for calc_type in calculation_types}
-        except NoResultFound:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Укажите ценовой диапазон для текущего направления {direction_id} и weight_amount {total_weight}")
-        volume_tarifs = await db.execute(select(Tarifs).filter_by(
-            calculation_type="VOLUME",
-            direction_id=direction_id))
-        volume_tarifs = volume_tarifs.scalars().first()
-        # Calculate the tariff price
-        tarif_price = max(volume_tarifs.price * total_volume if volume_tarifs else 0,
-                          tariffs[CalculationType.WEIGHT].price) + tariffs[CalculationType.HANDLING].price
-
-        return tarif_price + sum(extra_costs.values()) + extra_cargo_cost + extra_delivery_cost
+        return await tarif_index.quote(direction_id, total_weight, total_volume, cargo_pickup_type, delivery_type)
 
     async def accept_order(self, payload: OrderUpdateSchemas, user: UserViewSchemas, order_id: int, db: AsyncSession = Depends(get_db)):
         if (await if_user_has_permissions(db, user.id, [Permission.DELIVER_ORDER])):
@@ -629,7 +531,7 @@ class OrderService(BaseDao):
             status = OrderStatus.CLIENT_DELIVERING_TO_WAREHOUSE.value
         elif payload.cargo_pickup_type.value == DeliveryType.DELIVERY.value:
             status = OrderStatus.ASSIGNED_TO_COURIER.value
-            await notification_service.send_notification(user_id=payload.courier, notification_code=NotificationCode.COURIER_NEW_ORDER)
+            await notification_service.send_notification(user_id=payload.courier, notification_code=NotificationCode.COURIER_NEW_ORDER, db=db)
         return status
 
     async def update_payment_order(self, id: int, payment_payload: PaymentUpdateSchemas, user: UserViewSchemas, db: AsyncSession = Depends(get_db)) -> PaymentUpdateSchemas:
@@ -715,11 +617,13 @@ class OrderService(BaseDao):
     async def set_as_not_delivered(self, id: int, payload: NotDeliveredOrder, user: UserViewSchemas, db: AsyncSession = Depends(get_db)):
         await db.execute(update(Orders).where(Orders.id == id).values(order_status=OrderStatus.NOT_DELIVERED.value, not_delivered_reason=payload.reason))
         await db.commit()
-        order_items = await db.execute(select(OrderItems).where(OrderItems.order_id == id))
-        order_items = order_items.scalars().all()
-        for order_item in order_items:
-            await db.execute(update(OrderItems).where(OrderItems.id == order_item.id).values(status=OrderStatus.NOT_DELIVERED.value))
-            await action_history_service.add_action(ActionHistoryCreate(order_item_id=order_item.id, action_code=ActionCode.NOT_DELIVERED, courier_id=user.id), db)
+        order_item_ids = await db.execute(
+            update(OrderItems).where(OrderItems.order_id == id).values(status=OrderStatus.NOT_DELIVERED.value).returning(OrderItems.id))
+        await action_history_service.add_actions_bulk([
+            ActionHistoryCreate(order_item_id=order_item_id, action_code=ActionCode.NOT_DELIVERED, courier_id=user.id)
+            for order_item_id in order_item_ids.scalars().all()
+        ], db)
+        await db.commit()
         return await nested_serializer.serialize_by_id(id, db)
 
     async def set_as_delivering_to_recipient(self, id: int, user: UserViewSchemas, db: AsyncSession = Depends(get_db)):
@@ -733,19 +637,13 @@ class OrderService(BaseDao):
         if order is None:
             raise HTTPException(status_code=404, detail="Order not found")
         otp_code = self.generate_otp_code()
-        # TODO: needs to handle as a database transaction and send sms code
-        # If sms code is sent successfully then save otp code to database
-        # If sms code is not sent then rollback the transaction
-        if settings.ENVIRONMENT != Environment.LOCAL:
-            notification_service.send_sms(
-                phone=order.sender_phone, sms_code=SmsCode.PUBLIC_OFFER, code=otp_code)
-            template = NOTIFICATION_TEMPLATES[SmsCode.TRACKING_TEMPLATE]
-            whatsapp_client.send_sms(
-                order.sender_phone, template.message.format(
-                    url=f'{settings.FRONTEND_URL}/orders/public/{order.id}'))
-            whatsapp_client.send_sms(
-                order.receiver_phone, template.message.format(
-                    url=f'{settings.FRONTEND_URL}/orders/public/{order.id}'))
+        # the messages are sent only if the otp code is saved
+        await notification_service.send_sms(
+            phone=order.sender_phone, sms_code=SmsCode.PUBLIC_OFFER, db=db, code=otp_code)
+        for phone in (order.sender_phone, order.receiver_phone):
+            await notification_service.send_sms(
+                phone=phone, sms_code=SmsCode.TRACKING_TEMPLATE, db=db,
+                url=f'{settings.FRONTEND_URL}/orders/public/{order.id}')
         otp_signing_code = OTPSigningCode(
             user_id=user.id,
             code=otp_code,
@@ -782,42 +680,23 @@ class OrderService(BaseDao):
         file_path = os.path.join(os.getcwd(), "src/waiver_agreement.pdf")
         return StreamingResponse(open(file_path, "rb"), media_type="application/pdf")
 
-    async def convert_docx_to_pdf(self, new_doc_path: str, new_pdf_path: str):
-        cmd = ["libreoffice", "--headless", "--convert-to", "pdf", "--outdir", os.path.dirname(new_pdf_path),
-               new_doc_path]
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        with open(new_pdf_path, 'rb') as pdf_file:
-            file_stream = io.BytesIO(pdf_file.read())
-        return file_stream
-
     async def generate_waiver_agreement(self, order: Orders, otp_code: str, is_public_offer: bool, db: AsyncSession = Depends(get_db)):
         doc_type = 'public_offer' if is_public_offer else 'waiver_agreement'
         if order.direction.transportation_type.value == TransportationType.AIR:
             doc_path = "public_offer_avia.docx" if is_public_offer else "waiver_agreement_avia.docx"
         else:
             doc_path = "public_offer_not_avia.docx" if is_public_offer else "waiver_agreement_not_avia.docx"
-        doc = Document(doc_path)
-        sended_date = date.today().strftime('%m/%d/%Y')
-        replacements = {
-            '{{sender_fio}}': order.sender_fio,
-            '{{order_id}}': str(order.id),
-            '{{sended_date}}': sended_date,
-            '{{receiver_fio}}': order.receiver_fio,
-            '{{otp_code}}': otp_code,
-            '{{sender_phone}}': order.sender_phone,
-            '{{receiver_phone}}': order.receiver_phone
-        }
-        for paragraph in doc.paragraphs:
-            for key, value in replacements.items():
-                if key in paragraph.text:
-                    paragraph.text = paragraph.text.replace(key, value)
-
-        new_doc_path = f'{doc_type}_agreement_{order.id}_{otp_code}.docx'
-        doc.save(new_doc_path)
-        new_pdf_path = f'{doc_type}_agreement_{order.id}_{otp_code}.pdf'
-        file_stream = await self.convert_docx_to_pdf(new_doc_path, new_pdf_path)
-        file_s3 = await file_service.upload_file(new_pdf_path, file_stream)
-        os.remove(new_doc_path)
+        docx = get_template(doc_path).render({
+            'sender_fio': order.sender_fio,
+            'order_id': order.id,
+            'sended_date': date.today().strftime('%m/%d/%Y'),
+            'receiver_fio': order.receiver_fio,
+            'otp_code': otp_code,
+            'sender_phone': order.sender_phone,
+            'receiver_phone': order.receiver_phone
+        })
+        pdf = await document_converter.convert(docx)
+        file_s3 = await file_service.upload_file(f'{doc_type}_agreement_{order.id}_{otp_code}.pdf', io.BytesIO(pdf))
         setattr(order, 'public_offer_url' if is_public_offer else 'waiver_agreement_url',
                 file_s3['file_path'])
         await db.commit()
@@ -828,9 +707,8 @@ class OrderService(BaseDao):
         if order is None:
             raise HTTPException(status_code=404, detail="Order not found")
         otp_code = self.generate_otp_code()
-        if settings.ENVIRONMENT != Environment.LOCAL:
-            notification_service.send_sms(
-                phone=order.receiver_phone, sms_code=SmsCode.WAIVER_AGREEMENT, code=otp_code)
+        await notification_service.send_sms(
+            phone=order.receiver_phone, sms_code=SmsCode.WAIVER_AGREEMENT, db=db, code=otp_code)
         otp_signing_code = OTPSigningCode(
             user_id=user.id,
             code=otp_code,
@@ -855,31 +733,20 @@ class OrderService(BaseDao):
             raise HTTPException(status_code=404, detail="OTP code not found")
         if otp_signing_code.order_id != id:
             raise PermissionDenied()
-        if order and order.order_status == OrderStatus.DELIVERING_TO_RECIPIENT and order.courier:
-            new_association = UsersOrders(
-                user_id=order.courier,
-                order_id=order.id,
-                status=OrderStatus.DELIVERED.value
-            )
-            db.add(new_association)
+        if order and order.order_status == OrderStatus.DELIVERING_TO_RECIPIENT.value and order.courier:
+            await courier_counter_service.add_courier_order(order, OrderStatus.DELIVERED, db)
         await db.execute(update(Orders).where(Orders.id == id).values(is_waiver_agreement_accepted=True))
         await db.execute(update(OTPSigningCode).where(OTPSigningCode.id == otp_signing_code.id).values(is_used=True))
         order.order_status = OrderStatus.DELIVERED.value
         order.warehouse_id = None
-        await action_history_service.add_action(ActionHistoryCreate(order_id=id, action_code=ActionCode.DELIVERED, courier_id=user.id), db)
-        order_items = await db.execute(select(OrderItems).where(OrderItems.order_id == id))
-        order_items = order_items.scalars().all()
-        for order_item in order_items:
-            order_item.status = OrderStatus.DELIVERED.value
-            await action_history_service.add_action(ActionHistoryCreate(order_item_id=order_item.id, action_code=ActionCode.DELIVERED, courier_id=user.id), db)
-        if order.courier:
-            await db.execute(
-                update(Users).where(Users.id == order.courier).values(
-                    total_profit=Users.total_profit + order.payment.amount))
-            courier = await db.execute(select(Users).where(Users.id == order.courier))
-            courier = courier.scalar_one_or_none()
-            if courier:
-                courier.delivered_orders += 1
+        order_item_ids = await db.execute(
+            update(OrderItems).where(OrderItems.order_id == id).values(status=OrderStatus.DELIVERED.value).returning(OrderItems.id))
+        await action_history_service.add_actions_bulk([
+            ActionHistoryCreate(order_id=id, action_code=ActionCode.DELIVERED, courier_id=user.id)
+        ] + [
+            ActionHistoryCreate(order_item_id=order_item_id, action_code=ActionCode.DELIVERED, courier_id=user.id)
+            for order_item_id in order_item_ids.scalars().all()
+        ], db)
         await db.commit()
         return await nested_serializer.serialize_by_id(id, db)
 
@@ -912,6 +779,14 @@ class OrderService(BaseDao):
         total_amount = payload.expenses_price + total_price
         return TotalAmount(total_amount=total_amount)
 
+    async def total_amount_batch(self, payload: list[TotalAmountOrder]) -> list[TotalAmount]:
+        total_prices = await tarif_index.quote_many([
+            (order.direction_id, order.total_weight, order.total_volume, order.cargo_pickup_type, order.delivery_type)
+            for order in payload
+        ])
+        return [TotalAmount(total_amount=order.expenses_price + total_price)
+                for order, total_price in zip(payload, total_prices)]
+
     def if_all_orders_are_taken(self, order_items_ids, payload_orders_items_id) -> bool:
         return all(item_id in payload_orders_items_id for item_id in order_items_ids)
 
@@ -923,6 +798,7 @@ class OrderService(BaseDao):
         orders_to_items = defaultdict(list)
         for item in order_items_in_payload:
             orders_to_items[item.order_id].append(item)
+        actions = []
 
         for order_id, items in orders_to_items.items():
             current_order_query = await db.execute(select(Orders).where(Orders.id == order_id))
@@ -951,14 +827,14 @@ class OrderService(BaseDao):
             current_order.order_status = new_status
             current_order.courier = user.id
 
-            for item in items:
-                await db.execute(
-                    update(OrderItems)
-                    .where(OrderItems.id == item.id)
-                    .values(status=new_status)
-                )
-                await action_history_service.add_action(
-                    ActionHistoryCreate(order_item_id=item.id, action_code=new_status, courier_id=user.id), db)
+            await db.execute(
+                update(OrderItems)
+                .where(OrderItems.id.in_([item.id for item in items]))
+                .values(status=new_status)
+            )
+            actions.extend(
+                ActionHistoryCreate(order_item_id=item.id, action_code=new_status, courier_id=user.id) for item in items)
+        await action_history_service.add_actions_bulk(actions, db)
         await db.commit()
         return {"detail": "Order items status updated"}
 
@@ -1,24 +1,28 @@
+import asyncio
 from datetime import date, datetime
-from io import BytesIO
-from typing import List
+from tempfile import TemporaryFile
+from typing import IO, List
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from openpyxl.workbook import Workbook
-from sqlalchemy import func, select
+from sqlalchemy import JSON, Select, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import aliased
 
 from src.action_history.models import ActionCode, ActionHistory
 from src.action_history.schemas import ActionHistoryShortOut
 from src.common.models import SortOrder
+from src.common.utils import DictBundle
 from src.database import get_db
 from src.directions.models import Directions, TransportationType
 from src.directions.schemas import DirectionOut
+from src.expenses.models import Expense, order_expenses
 from src.expenses.schemas import ExpenseViewSchemas
 from src.geography.models import City, District
 from src.geography.schemas import CityOut, DistrictShortViewSchemas
-from src.orders.models import (OrderItems, Orders, OrderStatus, Payment,
-                               PaymentStatus)
+from src.orders.models import (OrderItems, OrderPhoto, Orders, OrderStatus,
+                               Payment, PaymentStatus)
 from src.orders.schemas import (OrderItemsOut, OrderViewSchemas, PayerType,
                                 PaymentOut, OrderPhotosOutSchemas, PaymentType, OrderViewSchemasShort)
 from src.users.models import Users
@@ -30,123 +34,135 @@ from src.warehouse.schemas import WarehouseOutShort
 
 class OrderViewSerialized:
 
-    async def get_order_items(self, order: Orders, db: AsyncSession = Depends(get_db)) -> List[OrderItemsOut]:
-        order_items = await db.execute(select(OrderItems).where(OrderItems.order_id == order.id))
-        order_items = order_items.scalars().all()
+    @staticmethod
+    def get_fine(arrived_at: datetime | None) -> int:
+        if arrived_at is None:
+            return 0
+        days_since_arrived = (datetime.now() - arrived_at).days
+        if days_since_arrived > 3:
+            return 500 * (days_since_arrived - 3)
+        return 0
 
-        order_item_ids = [item.id for item in order_items]
-        action_histories = await db.execute(
-            select(ActionHistory).where(
-                ActionHistory.order_item_id.in_(order_item_ids),
-                ActionHistory.action_code == ActionCode.ARRIVED_TO_DESTINATION.value
-            )
+    async def get_order_items(self, order_id: int, db: AsyncSession = Depends(get_db)) -> List[OrderItemsOut]:
+        arrived_at = select(func.max(ActionHistory.created_at)).where(
+            ActionHistory.order_item_id == OrderItems.id,
+            ActionHistory.action_code == ActionCode.ARRIVED_TO_DESTINATION.value
+        ).scalar_subquery()
+        order_items = await db.execute(
+            select(
+                OrderItems.id,
+                OrderItems.photo,
+                OrderItems.status,
+                OrderItems.warehouse_id,
+                OrderItems.qr_code_hash,
+                OrderItems.is_loaded,
+                arrived_at.label("arrived_at")
+            ).where(OrderItems.order_id == order_id).order_by(OrderItems.id)
         )
-        action_histories = action_histories.scalars().all()
-        action_history_map = {history.order_item_id: history for history in action_histories}
-
-        order_items_out = []
-        for order_item in order_items:
-            fine = 0
-            action_history_order_item = action_history_map.get(order_item.id)
-            if action_history_order_item:
-                days_since_arrived = (datetime.now() - action_history_order_item.created_at).days
-                if days_since_arrived > 3:
-                    fine_days = days_since_arrived - 3
-                    fine = 500 * fine_days
-            order_items_out.append(OrderItemsOut(**{**dict(order_item.__dict__), "fine": fine}))
-        return order_items_out
-
-    async def serialize_by_id(self, id: int, db: AsyncSession = Depends(get_db), user: Users = None) -> OrderViewSchemas:
-        order = await db.execute(select(Orders).where(Orders.id == id))
-        order = order.scalar_one_or_none()
-
-        warehouse = await db.execute(select(Warehouse).where(Warehouse.id == order.warehouse_id))
-        warehouse = warehouse.scalars().first()
-        warehouse_model = None
-        if warehouse:
-            warehouse_model = WarehouseOutShort(**warehouse.__dict__)
-
-        start_warehouse = await db.execute(select(Warehouse).where(Warehouse.id == order.start_warehouse_id))
-        start_warehouse = start_warehouse.scalars().first()
-
-        destination_warehouse = await db.execute(select(Warehouse).where(Warehouse.id == order.destination_warehouse_id))
-        destination_warehouse = destination_warehouse.scalars().first()
-
-        direction = await db.execute(select(Directions).where(Directions.id == order.direction_id))
-        direction = direction.scalars().first()
-
-        arival_city = await db.execute(select(City).where(City.id == direction.arrival_city_id))
-        arival_city = arival_city.scalars().first()
+        return [
+            OrderItemsOut(
+                id=order_item.id,
+                photo=order_item.photo,
+                status=order_item.status,
+                warehouse_id=order_item.warehouse_id,
+                qr_code_hash=order_item.qr_code_hash,
+                is_loaded=bool(order_item.is_loaded),
+                fine=self.get_fine(order_item.arrived_at)
+            )
+            for order_item in order_items.all()
+        ]
 
-        departure_city = await db.execute(select(City).where(City.id == direction.departure_city_id))
-        departure_city = departure_city.scalars().first()
+    def get_order_query(self, id: int):
+        warehouse = aliased(Warehouse)
+        start_warehouse = aliased(Warehouse)
+        destination_warehouse = aliased(Warehouse)
+        arrival_city = aliased(City)
+        departure_city = aliased(City)
 
-        arrival_city_out = CityOut(**arival_city.__dict__)
-        departure_city_out = CityOut(**departure_city.__dict__)
+        photos = select(func.array_agg(aggregate_order_by(OrderPhoto.photo, OrderPhoto.id))).where(
+            OrderPhoto.order_id == Orders.id
+        ).scalar_subquery()
+        expenses = select(func.json_agg(aggregate_order_by(func.json_build_object(
+            "id", Expense.id,
+            "name", Expense.name,
+            "price", Expense.price
+        ), Expense.id), type_=JSON)).join(
+            order_expenses, order_expenses.c.expense_id == Expense.id
+        ).where(order_expenses.c.order_id == Orders.id).scalar_subquery()
+        action_histories = select(func.json_agg(aggregate_order_by(func.json_build_object(
+            "created_at", ActionHistory.created_at,
+            "action_description", ActionHistory.action_description,
+            "action_code", ActionHistory.action_code
+        ), ActionHistory.id), type_=JSON)).where(ActionHistory.order_id == Orders.id).scalar_subquery()
 
-        direction_out = DirectionOut(id=direction.id,
-                                     arrival_city=arrival_city_out,
-                                     departure_city=departure_city_out,
-                                     transportation_type=direction.transportation_type
-                                     )
+        return select(
+            DictBundle("order", *Orders.__table__.c),
+            DictBundle("warehouse", warehouse.id, warehouse.name, warehouse.address),
+            DictBundle("start_warehouse", start_warehouse.id, start_warehouse.name, start_warehouse.address),
+            DictBundle("destination_warehouse", destination_warehouse.id,
+                       destination_warehouse.name, destination_warehouse.address),
+            DictBundle("direction", Directions.id, Directions.transportation_type),
+            DictBundle("arrival_city", arrival_city.id, arrival_city.name),
+            DictBundle("departure_city", departure_city.id, departure_city.name),
+            DictBundle("payment", Payment.id, Payment.amount, Payment.currency, Payment.payment_type,
+                       Payment.comment, Payment.payer_type, Payment.bin, Payment.payment_status),
+            DictBundle("district", District.id, District.name),
+            photos.label("photos"),
+            expenses.label("expenses"),
+            action_histories.label("action_histories")
+        ).select_from(Orders).outerjoin(
+            warehouse, warehouse.id == Orders.warehouse_id
+        ).outerjoin(
+            start_warehouse, start_warehouse.id == Orders.start_warehouse_id
+        ).outerjoin(
+            destination_warehouse, destination_warehouse.id == Orders.destination_warehouse_id
+        ).outerjoin(
+            Directions, Directions.id == Orders.direction_id
+        ).outerjoin(
+            arrival_city, arrival_city.id == Directions.arrival_city_id
+        ).outerjoin(
+            departure_city, departure_city.id == Directions.departure_city_id
+        ).outerjoin(
+            Payment, Payment.order_id == Orders.id
+        ).outerjoin(
+            District, District.id == Orders.district_id
+        ).where(Orders.id == id).limit(1)
 
-        payment = await db.execute(select(Payment).where(Payment.order_id == order.id))
-        payment = payment.scalars().first()
-        payment_model = PaymentOut(**payment.__dict__) if payment else None
-        order_items_out = await self.get_order_items(order=order, db=db)
-        order_photos_out = [OrderPhotosOutSchemas(**order_photo.__dict__) for order_photo in order.order_photo]
+    async def serialize_by_id(self, id: int, db: AsyncSession = Depends(get_db), user: Users = None) -> OrderViewSchemas:
+        row = await db.execute(self.get_order_query(id))
+        row = row.first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Order not found")
+        order = row.order
 
-        expenses_out = []
-        for expense in order.expenses:
-            expenses_out.append(ExpenseViewSchemas(**expense.__dict__))
+        def warehouse_out(warehouse):
+            return WarehouseOutShort(**warehouse) if warehouse["id"] else None
 
-        action_history_out = []
-        action_history = await db.execute(select(ActionHistory).where(ActionHistory.order_id == order.id))
+        direction_out = None
+        if row.direction["id"]:
+            direction_out = DirectionOut(**row.direction,
+                                         arrival_city=CityOut(**row.arrival_city),
+                                         departure_city=CityOut(**row.departure_city))
+        payment_model = PaymentOut(**row.payment) if row.payment["id"] else None
+        district = DistrictShortViewSchemas(**row.district) if row.district["id"] else None
 
-        for action in action_history.scalars().all():
-            action_history_out.append(ActionHistoryShortOut(**action.__dict__))
-        district = await db.execute(select(District).where(District.id == order.district_id))
-        district = district.scalar_one_or_none()
-        district = None if not district else DistrictShortViewSchemas(
-            id=district.id, name=district.name)
-        is_payment_editable = await order.is_payment_editable(user, db) if user else False
+        order_items_out = await self.get_order_items(order_id=order["id"], db=db)
+        is_payment_editable = await if_user_has_permissions(
+            db, user.id, [Permission.UPDATE_PAYMENT_STATUS_UL]) if user else False
         data = OrderViewSchemas(
-            id=order.id,
-            sender_address=order.sender_address,
+            **order,
             district=district,
-            receiver_address=order.receiver_address,
-            courier=order.courier,
-            sender_fio=order.sender_fio,
-            description=order.description,
-            sender_phone=order.sender_phone,
-            receiver_fio=order.receiver_fio,
-            receiver_phone=order.receiver_phone,
-            total_weight=order.total_weight,
-            total_volume=order.total_volume,
-            insurance=order.insurance,
-            created_at=order.created_at,
-            order_status=order.order_status,
-            is_public_offer_accepted=order.is_public_offer_accepted,
-            delivery_type=order.delivery_type,
-            cargo_pickup_type=order.cargo_pickup_type,
-            public_offer_url=order.public_offer_url,
-            warehouse=warehouse_model,
-            destination_warehouse=WarehouseOutShort(
-                **destination_warehouse.__dict__) if destination_warehouse else None,
-            start_warehouse=WarehouseOutShort(
-                **start_warehouse.__dict__) if start_warehouse else None,
+            warehouse=warehouse_out(row.warehouse),
+            destination_warehouse=warehouse_out(row.destination_warehouse),
+            start_warehouse=warehouse_out(row.start_warehouse),
             payment=payment_model,
             direction=direction_out,
             order_items=order_items_out,
             order_items_number=len(order_items_out),
-            expenses=expenses_out,
-            action_histories=action_history_out,
-            not_delivered_reason=order.not_delivered_reason,
-            cancellation_reason=order.cancellation_reason,
-            waiver_agreement_url=order.waiver_agreement_url,
-            expenses_price=order.expenses_price,
+            expenses=[ExpenseViewSchemas(**expense) for expense in row.expenses or []],
+            action_histories=[ActionHistoryShortOut(**action) for action in row.action_histories or []],
             is_payment_editable=is_payment_editable,
-            order_photos=order_photos_out
+            order_photos=[OrderPhotosOutSchemas(photo=photo) for photo in row.photos or []]
         )
         return data
 
@@ -168,18 +184,136 @@ class OrderViewSerialized:
         )
 
 
+EXCEL_CHUNK_SIZE = 1000
+
+ORDERS_EXCEL_COLUMNS = [
+    "ID",
+    "Дата",
+    "Откуда",
+    "Отправитель",
+    "Контакт отправителя",
+    "Количество",
+    "Вес",
+    "Объем",
+    "Сумма",
+    "Упаковка",
+    "Доставка",
+    "Забор",
+    "Куда",
+    "Получатель",
+    "Контакты получателя",
+    "Тип отправки",
+    "Тип оплаты",
+    "Местонахождение",
+    "Оплачено",
+    "Сотрудник",
+    "Характер груза"]
+
+PAYMENT_TYPE_NAMES = {
+    PaymentType.CASH.value: "Наличные",
+    PaymentType.ONLINE.value: "Онлайн"
+}
+
+TRANSPORTATION_TYPE_NAMES = {
+    TransportationType.AIR.value: "Самолет",
+    TransportationType.RAIL.value: "ЖД",
+    TransportationType.ROAD.value: "Фура"
+}
+
+
+def get_orders_excel_query(orders: Select) -> Select:
+    """Narrows a filtered ``select(Orders)`` down to the columns of the excel export.
+
+    Related tables are joined through aliases so the filters may keep their own
+    joins to directions or payments.
+    """
+    warehouse = aliased(Warehouse)
+    payment = aliased(Payment)
+    direction = aliased(Directions)
+    arrival_city = aliased(City)
+    departure_city = aliased(City)
+    items_count = select(func.count(OrderItems.id)).where(OrderItems.order_id == Orders.id).scalar_subquery()
+    return orders.with_only_columns(
+        Orders.id,
+        Orders.created_at,
+        departure_city.name.label("departure_city"),
+        Orders.sender_fio,
+        Orders.sender_phone,
+        items_count.label("items_count"),
+        Orders.total_weight,
+        Orders.total_volume,
+        payment.amount.label("payment_amount"),
+        arrival_city.name.label("arrival_city"),
+        Orders.receiver_fio,
+        Orders.receiver_phone,
+        direction.transportation_type,
+        payment.payment_type,
+        warehouse.name.label("warehouse_name"),
+        warehouse.address.label("warehouse_address"),
+        payment.payment_status,
+        Orders.description
+    ).outerjoin(
+        warehouse, warehouse.id == Orders.warehouse_id
+    ).outerjoin(
+        payment, payment.order_id == Orders.id
+    ).outerjoin(
+        direction, direction.id == Orders.direction_id
+    ).outerjoin(
+        arrival_city, arrival_city.id == direction.arrival_city_id
+    ).outerjoin(
+        departure_city, departure_city.id == direction.departure_city_id
+    )
+
+
+async def write_orders_excel(orders: Select, db: AsyncSession = Depends(get_db)) -> IO[bytes]:
+    """Streams the orders into a write-only workbook backed by a temporary file.
+
+    Rows are fetched through a server-side cursor in chunks of
+    EXCEL_CHUNK_SIZE, so memory does not grow with the size of the export.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Заказы")
+    ws.append(ORDERS_EXCEL_COLUMNS)
+    rows = await db.stream(get_orders_excel_query(orders).execution_options(yield_per=EXCEL_CHUNK_SIZE))
+    async for order in rows:
+        ws.append([
+            order.id,
+            order.created_at,
+            order.departure_city,
+            order.sender_fio,
+            order.sender_phone,
+            order.items_count,
+            order.total_weight,
+            order.total_volume,
+            order.payment_amount or 0,
+            None,  # Упаковка
+            None,  # Доставка
+            None,  # Забор
+            order.arrival_city,
+            order.receiver_fio,
+            order.receiver_phone,
+            TRANSPORTATION_TYPE_NAMES.get(order.transportation_type),
+            PAYMENT_TYPE_NAMES.get(order.payment_type),
+            f'{order.warehouse_name}, {order.warehouse_address}' if order.warehouse_name else None,
+            'ДА' if order.payment_status == PaymentStatus.PAID.value else 'НЕТ',
+            None,  # Сотрудник,
+            order.description
+        ])
+    excel_file = TemporaryFile()
+    # saving zips the whole sheet, keep it off the event loop
+    await asyncio.to_thread(wb.save, excel_file)
+    excel_file.seek(0)
+    return excel_file
+
+
 async def generate_excel_file(db: AsyncSession = Depends(get_db), user: str = None, status: list[OrderStatus] = None, warehouse_id: list[int] = None,
                               direction_id: list[int] = None, transportation_type: list[TransportationType] = None,
                               start_date: date = None, end_date: date = None,
                               sort_by: str = None, sort_order: SortOrder = None, today: bool = None,
-                              all_time: bool = None, search: str = None):
+                              all_time: bool = None, search: str = None) -> IO[bytes]:
     async with db.begin():
         from src.orders.service import order_service
-        query = select(Orders).options(
-            selectinload(Orders.warehouse),
-            selectinload(Orders.payment),
-            selectinload(Orders.direction)
-        ).order_by(Orders.created_at.asc())
+        query = select(Orders).order_by(Orders.created_at.asc())
         if status is not None:
             query = query.where(Orders.order_status.in_(
                 [status_group.value for status_group in status]))
@@ -197,86 +331,6 @@ async def generate_excel_file(db: AsyncSession = Depends(get_db), user: str = No
             sort_by,
             sort_order)
         filtered_query = order_service.search_orders(filtered_query, search)
-        filtered_result = await db.execute(filtered_query)
-        filtered_orders = filtered_result.scalars().all()
-        order_items_count_query = select(
-            OrderItems.order_id,
-            func.count().label('items_count')
-        ).group_by(OrderItems.order_id)
-
-        result = await db.execute(order_items_count_query)
-        order_items_count = result.all()
-    order_items_count_dict = {order_id: count for order_id, count in order_items_count}
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Заказы"
-
-    columns = [
-        "ID",
-        "Дата",
-        "Откуда",
-        "Отправитель",
-        "Контакт отправителя",
-        "Количество",
-        "Вес",
-        "Объем",
-        "Сумма",
-        "Упаковка",
-        "Доставка",
-        "Забор",
-        "Куда",
-        "Получатель",
-        "Контакты получателя",
-        "Тип отправки",
-        "Тип оплаты",
-        "Местонахождение",
-        "Оплачено",
-        "Сотрудник",
-        "Характер груза"]
-    ws.append(columns)
-    for order in filtered_orders:
-        payment_status = 'ДА' if order.payment and order.payment.payment_status == PaymentStatus.PAID.value else 'НЕТ'
-        payment_type = None
-        transportation_type = None
-        if order.payment:
-            if order.payment.payment_type == PaymentType.CASH.value:
-                payment_type = 'Наличные'
-            if order.payment.payment_type == PaymentType.ONLINE.value:
-                payment_type = 'Онлайн'
-        if order.direction:
-            if order.direction.transportation_type == TransportationType.AIR.value:
-                transportation_type = 'Самолет'
-            if order.direction.transportation_type == TransportationType.RAIL.value:
-                transportation_type = 'ЖД'
-            if order.direction.transportation_type == TransportationType.ROAD.value:
-                transportation_type = 'Фура'
-        ws.append([
-            order.id,
-            order.created_at,
-            order.direction.departure_city.name if order.direction else None,
-            order.sender_fio,
-            order.sender_phone,
-            order_items_count_dict.get(order.id, 0),
-            order.total_weight,
-            order.total_volume,
-            order.payment.amount if order.payment else 0,
-            None,  # Упаковка
-            None,  # Доставка
-            None,  # Забор
-            order.direction.arrival_city.name if order.direction else None,
-            order.receiver_fio,
-            order.receiver_phone,
-            transportation_type,
-            payment_type,
-            f'{order.warehouse.name}, {order.warehouse.address}' if order.warehouse else None,
-            payment_status,
-            None,  # Сотрудник,
-            order.description
-
-        ])
-    excel_file = BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
-    return excel_file
+        return await write_orders_excel(filtered_query, db)
 
 nested_serializer = OrderViewSerialized()
@@ -1,9 +1,9 @@
 from enum import Enum
 
 from sqlalchemy import (DECIMAL, Boolean, Column, Date, DateTime, Float,
-                        ForeignKey, Integer, String, Table, text)
+                        ForeignKey, Index, Integer, String, Table, Text, text)
 from sqlalchemy.dialects.postgresql import ENUM as PgEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from src.common.models import TimestampMixin
 from src.database import Base
@@ -125,3 +125,11 @@ class Shipping(Base, TimestampMixin):
     invoice_number = Column(String, nullable=True)
     driver_contract_url = Column(String, nullable=True)
     is_loaded = Column(Boolean, server_default=text('false'))
+    # text matched by the search query param, filled in by database triggers
+    search_document = deferred(Column(Text, nullable=True))
+
+    __table_args__ = (
+        Index("ix_shipping_search_document", "search_document", postgresql_using="gin",
+              postgresql_ops={"search_document": "gin_trgm_ops"}),
+        Index("ix_shipping_created_at", "created_at"),
+    )
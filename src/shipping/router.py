@@ -4,8 +4,9 @@ from typing import List
 
 from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import StreamingResponse, Response
+from starlette.responses import StreamingResponse
 
+from src.common.utils import iter_file
 from src.database import get_db
 from src.directions.models import TransportationType
 from src.orders.schemas import SignOrderOTP
@@ -46,11 +47,12 @@ async def list_shippings(is_driver_contract_accepted: bool = Query(None), is_loa
                          direction_id: int = Query(None), transportation_type: TransportationType = Query(None),
                          statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db),
                          user: Users = Depends(JWTBearer()), start_date: date = Query(None),
-                         end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None)):
+                         end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None),
+                         cursor: str = Query(None)):
     return await shipping_service.list_shippings(is_driver_contract_accepted, direction_id=direction_id,
                                                  transportation_type=transportation_type, statuses=statuses, db=db,
                                                  user=user, page=page, limit=limit, start_date=start_date,
-                                                 end_date=end_date, search=search, is_loaded=is_loaded)
+                                                 end_date=end_date, search=search, is_loaded=is_loaded, cursor=cursor)
 
 
 @router.get("/shippings/couriers",
@@ -76,9 +78,9 @@ async def get_courier_shippings(id: int, db: AsyncSession = Depends(get_db)) ->
             status_code=status.HTTP_200_OK)
 async def download_shippings_excel(id: int, user: str = Depends(JWTBearer()), db: AsyncSession = Depends(get_db)):
     excel_file = await shipping_service.generate_excel_file(id, db, user)
-    return Response(content=excel_file.read(),
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": "attachment; filename=shipping_orders.xlsx"})
+    return StreamingResponse(iter_file(excel_file),
+                             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                             headers={"Content-Disposition": "attachment; filename=shipping_orders.xlsx"})
 
 
 @router.get("/shippings/courier_excel/{id}",
@@ -86,17 +88,17 @@ async def download_shippings_excel(id: int, user: str = Depends(JWTBearer()), db
             status_code=status.HTTP_200_OK)
 async def download_courier_excel(id: int, user: str = Depends(JWTBearer()), db: AsyncSession = Depends(get_db)):
     excel_file = await shipping_service.generate_courier_excel(id, db, user)
-    return Response(content=excel_file.read(),
-                    media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    headers={"Content-Disposition": "attachment; filename=courier_orders.xlsx"})
+    return StreamingResponse(iter_file(excel_file),
+                             media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                             headers={"Content-Disposition": "attachment; filename=courier_orders.xlsx"})
 
 
 @router.get("/shippings/my",
             dependencies=[PermsRequired([Permission.VIEW_SHIPPING])],
             response_model=PaginationShipping,
             status_code=status.HTTP_200_OK)
-async def my_shippings(respond_status: list[ShippingRespondStatus] = Query(None), is_driver_contract_accepted: bool = Query(None), direction_id: int = Query(None), transportation_type: TransportationType = Query(None), statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer()), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None)):
-    return await shipping_service.my_shippings(is_driver_contract_accepted, direction_id=direction_id, transportation_type=transportation_type, statuses=statuses, db=db, user=user, page=page, limit=limit, start_date=start_date, end_date=end_date, search=search, respond_status=respond_status)
+async def my_shippings(respond_status: list[ShippingRespondStatus] = Query(None), is_driver_contract_accepted: bool = Query(None), direction_id: int = Query(None), transportation_type: TransportationType = Query(None), statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer()), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None), cursor: str = Query(None)):
+    return await shipping_service.my_shippings(is_driver_contract_accepted, direction_id=direction_id, transportation_type=transportation_type, statuses=statuses, db=db, user=user, page=page, limit=limit, start_date=start_date, end_date=end_date, search=search, respond_status=respond_status, cursor=cursor)
 
 
 @router.get("/shippings/{id}",
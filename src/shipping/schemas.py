@@ -58,6 +58,7 @@ class PaginationShipping(BaseModel):
     limit: int
     total: int
     pages_number: int
+    next_cursor: str | None = None
     data: list[ShippingViewSchema]
 
 
@@ -128,11 +129,17 @@ class CourierShippingsSchema(BaseModel):
     id: int
     name: str | None = None
     order_count: int = 0
+    selected_orders: int = 0
+    delivered_orders: int = 0
+    total_profit: float = 0
 
 
 class CourierShippingsDetailSchema(BaseModel):
     id: int
     name: str | None = None
+    selected_orders: int = 0
+    delivered_orders: int = 0
+    total_profit: float = 0
     orders: List[OrderViewShortSchemas] | None = []
 
 
@@ -1,35 +1,39 @@
-import os
+import io
 from datetime import date, timezone
-from io import BytesIO
-from typing import List
+from typing import IO, List
 
 from aiohttp import ClientSession
-from docx import Document
 from fastapi import Depends, HTTPException, Query, status
-from openpyxl.workbook import Workbook
-from sqlalchemy import and_, desc, exc, func, or_, select, update
+from sqlalchemy import (and_, case, desc, exc, exists, func, insert, literal,
+                        or_, select, update)
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import aliased, joinedload, selectinload
+from sqlalchemy.orm import joinedload, selectinload
 from starlette.responses import StreamingResponse
 
 from src.action_history.models import ActionCode
 from src.action_history.schemas import ActionHistoryCreate
 from src.action_history.service import action_history_service
+from src.clients.libreoffice import document_converter
+from src.common.documents import get_template
+from src.common.search import search_by_document
 from src.common.service import file_service
+from src.common.utils import Page, paginator
 from src.database import get_db
-from src.directions.models import Directions, TransportationType
+from src.directions.models import TransportationType
 from src.exceptions import IdNotFound
-from src.geography.models import City
 from src.notification.models import SmsCode
 from src.notification.service import notification_service
-from src.orders.models import OrderItems, Orders, OrderStatus, PaymentStatus
-from src.orders.schemas import (OrderViewShortSchemas, PaymentType,
-                                SendOTPSigning, SignOrderOTP)
-from src.orders.service import order_item_service, order_service
+from src.orders.exceptions import OrderItemNotFound
+from src.orders.models import OrderItems, Orders, OrderStatus
+from src.orders.schemas import (OrderViewShortSchemas, SendOTPSigning,
+                                SignOrderOTP)
+from src.orders.utils import write_orders_excel
 from src.shipping.exceptions import ShippingNotFound, ShippingRespondNotFound
 from src.shipping.models import (Shipping, ShippingRespond,
                                  ShippingRespondStatus, ShippingStatus,
-                                 ShippingWarehouse)
+                                 ShippingWarehouse,
+                                 shipping_order_association,
+                                 shipping_order_items_association)
 from src.shipping.schemas import (CourierShippingsDetailSchema,
                                   CourierShippingsSchema,
                                   PaginationCourierShippings,
@@ -40,6 +44,7 @@ from src.shipping.schemas import (CourierShippingsDetailSchema,
                                   ShippingRespondViewSchema,
                                   ShippingViewSchema)
 from src.shipping.utils import QueryFilter, enrich_shipping
+from src.statistics.models import CourierDailyCounters
 from src.users.auth import JWTBearer
 from src.users.models import Group, OTPSigningCode, OTPType
 from src.users.models import Permission
@@ -81,29 +86,20 @@ class ShippingService:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=str(e._message))
 
-    def paginate(self, shippings, page: int, limit: int):
-        return shippings.offset((page - 1) * limit).limit(limit)
+    async def paginate(self, db: AsyncSession, shippings, page: int, limit: int, cursor: str = None) -> Page:
+        if cursor is not None:
+            return await paginator.paginate_by_cursor(db, shippings, Shipping, cursor, limit)
+        return await paginator.paginate(db, shippings, page, limit)
 
     def search_shippings(self, shippings, search: str = None):
-        if search and not search.isspace():
-            arrival_city = aliased(City)
-            departure_city = aliased(City)
-            shippings = shippings.join(Directions).join(
-                arrival_city,
-                arrival_city.id == Directions.arrival_city_id).join(
-                departure_city,
-                departure_city.id == Directions.departure_city_id).where(
-                or_(
-                    arrival_city.name.ilike(f"%{search}%"),
-                    departure_city.name.ilike(f"%{search}%")))
-        return shippings
+        return search_by_document(shippings, Shipping.search_document, search)
 
     async def list_shippings(self, is_driver_contract_accepted: bool = Query(None), direction_id: int = Query(None),
                              transportation_type: TransportationType = Query(None),
                              statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db),
                              user: UserViewSchemas = Depends(JWTBearer()), start_date: date = Query(None),
                              end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None),
-                             is_loaded: bool = Query(None)) -> PaginationShipping:
+                             is_loaded: bool = Query(None), cursor: str = Query(None)) -> PaginationShipping:
         model = Shipping
         shippings = select(model)
         filtered_shippings = QueryFilter.filter_shippings(
@@ -126,23 +122,17 @@ class ShippingService:
                 or_(and_(*condition1), and_(*condition2)))
         filtered_shippings = self.search_shippings(
             filtered_shippings, search).order_by(desc(model.created_at))
-        paginated_shippings = self.paginate(filtered_shippings, page, limit)
-        query = await db.execute(paginated_shippings)
-        shippings = query.scalars().all()
-        shippings = [await enrich_shipping(shipping, db=db, user=user) for shipping in shippings]
-        shippings = [
-            shipping for shipping in shippings if shipping.is_canceled == False]
-        total = await db.execute(filtered_shippings)
-        total = len(total.scalars().all())
-        pages_number = total // limit
-        if total % limit != 0:
-            pages_number += 1
+        shippings = await self.paginate(db, filtered_shippings, page, limit, cursor)
+        data = [await enrich_shipping(shipping, db=db, user=user) for shipping in shippings.items]
+        data = [
+            shipping for shipping in data if shipping.is_canceled == False]
         return PaginationShipping(
             page=page,
-            pages_number=pages_number,
-            total=total,
+            pages_number=shippings.pages_number,
+            total=shippings.total,
             limit=limit,
-            data=shippings
+            next_cursor=shippings.next_cursor,
+            data=data
         )
 
     async def filter_my_shippings(self, shippings, responds, db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer())) -> PaginationShipping:
@@ -153,7 +143,7 @@ class ShippingService:
         shippings = shippings.where(Shipping.id.in_(shipping_ids))
         return shippings
 
-    async def my_shippings(self, is_driver_contract_accepted: bool = Query(None), respond_status: list[ShippingRespondStatus] = Query(None), direction_id: int = Query(None), transportation_type: TransportationType = Query(None), statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer()), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None)) -> PaginationShipping:
+    async def my_shippings(self, is_driver_contract_accepted: bool = Query(None), respond_status: list[ShippingRespondStatus] = Query(None), direction_id: int = Query(None), transportation_type: TransportationType = Query(None), statuses: List[ShippingStatus] = Query(None), db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer()), start_date: date = Query(None), end_date: date = Query(None), page: int = 1, limit: int = 10, search: str = Query(None), cursor: str = Query(None)) -> PaginationShipping:
         shippings = select(Shipping)
         responds = select(ShippingRespond)
         if respond_status:
@@ -175,22 +165,16 @@ class ShippingService:
             transportation_type=transportation_type,
             direction_id=direction_id
         )
-        filtered_shippings = self.search_shippings(filtered_shippings, search)
-        paginated_shippings = self.paginate(filtered_shippings, page, limit)
-        query = await db.execute(paginated_shippings)
-        shippings = query.scalars().all()
-        shippings = [await enrich_shipping(shipping, db=db, user=user) for shipping in shippings]
-        total = await db.execute(filtered_shippings)
-        total = len(total.scalars().all())
-        pages_number = total // limit
-        if total % limit != 0:
-            pages_number += 1
+        filtered_shippings = self.search_shippings(
+            filtered_shippings, search).order_by(desc(Shipping.created_at))
+        shippings = await self.paginate(db, filtered_shippings, page, limit, cursor)
         return PaginationShipping(
             page=page,
-            pages_number=pages_number,
-            total=total,
+            pages_number=shippings.pages_number,
+            total=shippings.total,
             limit=limit,
-            data=shippings
+            next_cursor=shippings.next_cursor,
+            data=[await enrich_shipping(shipping, db=db, user=user) for shipping in shippings.items]
         )
 
     async def get_by_id(self, id: int = None, db: AsyncSession = Depends(get_db), user: Users = Depends(JWTBearer())) -> ShippingViewSchema:
@@ -273,26 +257,14 @@ class ShippingService:
         return str(random.randint(100000, 999999))
 
     async def generate_driver_contract(self, driver: Users, otp_code: str, order: Shipping, db: AsyncSession = Depends(get_db)):
-        doc_path = f'ip_agreement_for_driver.docx'
-        doc = Document(doc_path)
-        sended_date = date.today().strftime('%m/%d/%Y')
-        replacements = {
-            '{{driver_fio}}': driver.fl_name if driver else '',
-            '{{sended_date}}': sended_date,
-            '{{driver_phone}}': driver.phone if driver else '',
-            '{{otp_code}}': otp_code
-        }
-        for paragraph in doc.paragraphs:
-            for key, value in replacements.items():
-                if key in paragraph.text:
-                    paragraph.text = paragraph.text.replace(key, value)
-
-        new_doc_path = f'ip_agreement_for_driver_{otp_code}.docx'
-        doc.save(new_doc_path)
-        new_pdf_path = f'ip_agreement_for_driver_{otp_code}.pdf'
-        file_stream = await order_service.convert_docx_to_pdf(new_doc_path, new_pdf_path)
-        file_s3 = await file_service.upload_file(new_pdf_path, file_stream)
-        os.remove(new_doc_path)
+        docx = get_template('ip_agreement_for_driver.docx').render({
+            'driver_fio': driver.fl_name if driver else '',
+            'sended_date': date.today().strftime('%m/%d/%Y'),
+            'driver_phone': driver.phone if driver else '',
+            'otp_code': otp_code
+        })
+        pdf = await document_converter.convert(docx)
+        file_s3 = await file_service.upload_file(f'ip_agreement_for_driver_{otp_code}.pdf', io.BytesIO(pdf))
         order.driver_contract_url = file_s3['file_path']
         await db.commit()
 
@@ -311,14 +283,15 @@ class ShippingService:
         otp_code = self.generate_otp_code()
         driver = await db.execute(select(Users).where(Users.id == order.driver_id))
         driver = driver.scalar_one_or_none()
-        notification_service.send_sms(
+        await notification_service.send_sms(
             phone=driver.phone,
             sms_code=SmsCode.DRIVER_CONTRACT,
+            db=db,
             code=otp_code)
         otp_signing_code = OTPSigningCode(
             user_id=user.id,
             code=otp_code,
-            phone=user.phone,
+            phone=driver.phone,
             shipping_id=id,
             otp_type=OTPType.DRIVER_CONTRACT.value)
         db.add(otp_signing_code)
@@ -467,16 +440,21 @@ class ShippingService:
         shipping = query.scalar_one_or_none()
         if shipping is None:
             raise ShippingNotFound()
+        item_ids = set(payload.orders_items_id)
+        order_items = await db.execute(select(OrderItems.id, OrderItems.order_id).where(OrderItems.id.in_(item_ids)))
+        order_items = order_items.all()
+        if len(order_items) != len(item_ids):
+            raise OrderItemNotFound()
+        order_ids = {order_item.order_id for order_item in order_items}
         associated_warehouse_ids = [warehouse.warehouse_id for warehouse in shipping.warehouses]
         all_orders_query = await db.execute(
-            select(Orders).options(
-                selectinload(Orders.direction)).join(OrderItems).filter(OrderItems.id.in_(payload.orders_items_id)))
+            select(Orders).options(selectinload(Orders.direction)).where(Orders.id.in_(order_ids)))
         all_orders = all_orders_query.scalars().all()
         total_weight = 0
         total_volume = 0
         for order in all_orders:
-            total_weight += order.total_weight
-            total_volume += order.total_volume
+            total_weight += order.total_weight or 0
+            total_volume += order.total_volume or 0
             if shipping.shipping_type == TransportationType.ROAD.value:
                 if order.destination_warehouse_id != shipping.end_warehouse_id and order.destination_warehouse_id not in associated_warehouse_ids:
                     raise HTTPException(
@@ -491,45 +469,47 @@ class ShippingService:
             shipping.cargo_weight = total_weight
             shipping.cargo_volume = total_volume
         shipping.is_loaded = True
-        for item_id in payload.orders_items_id:
-            order_item_model = OrderItems
-            order_item_query = await db.execute(select(order_item_model).where(order_item_model.id == item_id))
-            order_item_data = order_item_query.scalar_one_or_none()
-            order_items = await db.execute(select(OrderItems).where(OrderItems.order_id == order_item_data.order_id))
-            order_items = order_items.scalars().all()
-            if order_item_data:
-                order_item_data.is_loaded = True
-                await order_item_service.set_as_in_transit(item_id, user, db)
-                shipping.order_items.append(order_item_data)
-                order_items = await db.execute(
-                    select(OrderItems).where(OrderItems.order_id == order_item_data.order_id))
-                order_items = order_items.scalars().all()
-                in_transit_check = all(
-                    item.status == OrderStatus.IN_TRANSIT.value for item in order_items)
-                order_query = await db.execute(select(Orders).where(Orders.id == order_item_data.order_id))
-                order = order_query.scalar_one_or_none()
-                if order:
-                    shipping.orders.append(order)
-                    if in_transit_check:
-                        await order_service.set_as_in_transit(order.id, user, db)
-                        if (shipping.shipping_type in [TransportationType.RAIL.value, TransportationType.AIR.value]):
-                            await db.execute(update(Shipping).where(Shipping.id == shipping_id).values(status=ShippingStatus.IN_TRANSIT.value))
-                    else:
-                        await order_service.set_as_partial_in_transit(order.id, user, db)
-                    await db.commit()
-                    await db.refresh(order)
-                else:
-                    await order_item_service.set_as_in_transit(item_id, user, db)
-                    shipping.order_items.append(order_item_data)
-                    order = await db.execute(select(Orders).where(Orders.id == order_item_data.order_id))
-                    order = order.scalar_one_or_none()
-                    if order:
-                        shipping.orders.append(order)
-                        await order_service.set_as_in_transit(order.id, user, db)
-                        if (shipping.shipping_type in [TransportationType.RAIL.value, TransportationType.AIR.value]):
-                            await db.execute(update(Shipping).where(Shipping.id == shipping_id).values(status=ShippingStatus.IN_TRANSIT.value))
+        if not item_ids:
+            await db.commit()
+            return {"detail": "Погрузка прошла успешно"}
+
+        await db.execute(update(OrderItems).where(OrderItems.id.in_(item_ids)).values(
+            status=OrderStatus.IN_TRANSIT.value, warehouse_id=None, is_loaded=True))
+        # an order is in transit once none of its items is left behind, loaded now or earlier
+        in_transit = await db.execute(
+            select(OrderItems.order_id).where(OrderItems.order_id.in_(order_ids)).group_by(OrderItems.order_id).having(
+                func.bool_and(OrderItems.status == OrderStatus.IN_TRANSIT.value)))
+        in_transit_order_ids = set(in_transit.scalars().all())
+        is_in_transit = Orders.id.in_(in_transit_order_ids)
+        await db.execute(update(Orders).where(Orders.id.in_(order_ids)).values(
+            order_status=case((is_in_transit, OrderStatus.IN_TRANSIT.value), else_=OrderStatus.PARTIALLY_IN_TRANSIT.value),
+            warehouse_id=case((is_in_transit, None), else_=Orders.warehouse_id)
+        ).execution_options(synchronize_session=False))
+        if in_transit_order_ids and shipping.shipping_type in [TransportationType.RAIL.value, TransportationType.AIR.value]:
+            shipping.status = ShippingStatus.IN_TRANSIT.value
+
+        await db.execute(insert(shipping_order_items_association).from_select(
+            ["shipping_id", "order_item_id"],
+            select(literal(shipping_id), OrderItems.id).where(OrderItems.id.in_(item_ids), ~exists().where(
+                shipping_order_items_association.c.shipping_id == shipping_id,
+                shipping_order_items_association.c.order_item_id == OrderItems.id))))
+        await db.execute(insert(shipping_order_association).from_select(
+            ["shipping_id", "order_id"],
+            select(literal(shipping_id), Orders.id).where(Orders.id.in_(order_ids), ~exists().where(
+                shipping_order_association.c.shipping_id == shipping_id,
+                shipping_order_association.c.order_id == Orders.id))))
+
+        await action_history_service.add_actions_bulk([
+            ActionHistoryCreate(order_item_id=item_id, action_code=ActionCode.IN_TRANSIT, manager_id=user.id)
+            for item_id in sorted(item_ids)
+        ] + [
+            ActionHistoryCreate(
+                order_id=order_id,
+                action_code=ActionCode.IN_TRANSIT if order_id in in_transit_order_ids else ActionCode.PARTIALLY_IN_TRANSIT,
+                manager_id=user.id)
+            for order_id in sorted(order_ids)
+        ], db)
         await db.commit()
-        await db.refresh(shipping)
         return {"detail": "Погрузка прошла успешно"}
 
     async def status_in_transit(self, shipping_id: int, db: AsyncSession = Depends(get_db)) -> ShippingViewSchema:
@@ -617,97 +597,13 @@ class ShippingService:
         return ShippingViewSchema(**data.__dict__, warehouses=warehouse_shipping_out)
 
     async def generate_excel_file(self, id: int, db: AsyncSession = Depends(get_db),
-                                  user: UserViewSchemas = Depends(JWTBearer())):
+                                  user: UserViewSchemas = Depends(JWTBearer())) -> IO[bytes]:
         async with db.begin():
             query = select(Orders).join(
                 Orders.shippings
-            ).options(
-                selectinload(Orders.warehouse),
-                selectinload(Orders.payment),
-                selectinload(Orders.direction)
             ).where(
                 Shipping.id == id).order_by(Orders.created_at.asc())
-            filtered_result = await db.execute(query)
-            filtered_orders = filtered_result.scalars().all()
-            order_items_count_query = select(
-                OrderItems.order_id,
-                func.count().label('items_count')
-            ).group_by(OrderItems.order_id)
-
-            result = await db.execute(order_items_count_query)
-            order_items_count = result.all()
-        order_items_count_dict = {order_id: count for order_id, count in order_items_count}
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Заказы"
-
-        columns = [
-            "ID",
-            "Дата",
-            "Откуда",
-            "Отправитель",
-            "Контакт отправителя",
-            "Количество",
-            "Вес",
-            "Объем",
-            "Сумма",
-            "Упаковка",
-            "Доставка",
-            "Забор",
-            "Куда",
-            "Получатель",
-            "Контакты получателя",
-            "Тип отправки",
-            "Тип оплаты",
-            "Местонахождение",
-            "Оплачено",
-            "Сотрудник",
-            "Характер груза"]
-        ws.append(columns)
-        for order in filtered_orders:
-            payment_status = 'ДА' if order.payment and order.payment.payment_status == PaymentStatus.PAID.value else 'НЕТ'
-            payment_type = None
-            transportation_type = None
-            if order.payment:
-                if order.payment.payment_type == PaymentType.CASH.value:
-                    payment_type = 'Наличные'
-                if order.payment.payment_type == PaymentType.ONLINE.value:
-                    payment_type = 'Онлайн'
-            if order.direction:
-                if order.direction.transportation_type == TransportationType.AIR.value:
-                    transportation_type = 'Самолет'
-                if order.direction.transportation_type == TransportationType.RAIL.value:
-                    transportation_type = 'ЖД'
-                if order.direction.transportation_type == TransportationType.ROAD.value:
-                    transportation_type = 'Фура'
-            ws.append([
-                order.id,
-                order.created_at,
-                order.direction.departure_city.name if order.direction else None,
-                order.sender_fio,
-                order.sender_phone,
-                order_items_count_dict.get(order.id, 0),
-                order.total_weight,
-                order.total_volume,
-                order.payment.amount if order.payment else 0,
-                None,  # Упаковка
-                None,  # Доставка
-                None,  # Забор
-                order.direction.arrival_city.name if order.direction else None,
-                order.receiver_fio,
-                order.receiver_phone,
-                transportation_type,
-                payment_type,
-                f'{order.warehouse.name}, {order.warehouse.address}' if order.warehouse else None,
-                payment_status,
-                None,  # Сотрудник,
-                order.description
-
-            ])
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-        return excel_file
+            return await write_orders_excel(query, db)
 
     async def get_courier(self, db: AsyncSession = Depends(get_db), page: int = 1, limit: int = 10, search: str = Query(None)) -> PaginationCourierShippings:
         query = select(Users).join(
@@ -723,21 +619,22 @@ class ShippingService:
                 Users.first_name.ilike(f"%{search}%"),
                 Users.last_name.ilike(f"%{search}%")
             ))
-        total_query = await db.execute(query)  # This is to calculate total entries matching the filter
-        total = total_query.scalars().all()
-        total_count = len(total)
+        total_count = await db.scalar(select(func.count()).select_from(query.subquery()))
 
-        query = query.offset((page - 1) * limit).limit(limit)
+        query = query.order_by(Users.id).offset((page - 1) * limit).limit(limit)
         result = await db.execute(query)
         users = result.scalars().all()
 
+        user_ids = [user.id for user in users]
+        order_counts = dict((await db.execute(
+            select(Orders.courier, func.count(Orders.id)).where(Orders.courier.in_(user_ids)).group_by(Orders.courier)
+        )).all())
+        counters = await self.get_courier_counters(user_ids, db)
         courier_data = [CourierShippingsSchema(
             id=user.id,
             name=user.fl_name,
-            order_count=len((await db.execute(
-                select(Orders)
-                .where(Orders.courier == user.id)
-            )).scalars().all())
+            order_count=order_counts.get(user.id, 0),
+            **counters.get(user.id, {})
         ) for user in users]
 
         pages_number = total_count // limit
@@ -775,103 +672,34 @@ class ShippingService:
             ) for order in orders
         ]
 
+        counters = await self.get_courier_counters([user.id], db)
         return CourierShippingsDetailSchema(
             id=user.id,
             name=user.fl_name,
             order_count=len(orders_data),
-            orders=orders_data
+            orders=orders_data,
+            **counters.get(user.id, {})
         )
 
+    async def get_courier_counters(self, courier_ids: list[int], db: AsyncSession) -> dict[int, dict]:
+        result = await db.execute(select(
+            CourierDailyCounters.courier_id,
+            func.sum(CourierDailyCounters.selected_orders).label("selected_orders"),
+            func.sum(CourierDailyCounters.delivered_orders).label("delivered_orders"),
+            func.sum(CourierDailyCounters.total_profit).label("total_profit")
+        ).where(CourierDailyCounters.courier_id.in_(courier_ids)).group_by(CourierDailyCounters.courier_id))
+        return {
+            row.courier_id: dict(selected_orders=row.selected_orders, delivered_orders=row.delivered_orders,
+                                 total_profit=float(row.total_profit))
+            for row in result.all()
+        }
+
     async def generate_courier_excel(self, id: int, db: AsyncSession = Depends(get_db),
-                                     user: UserViewSchemas = Depends(JWTBearer())):
+                                     user: UserViewSchemas = Depends(JWTBearer())) -> IO[bytes]:
         async with db.begin():
-            query = select(Orders).options(
-                selectinload(Orders.warehouse),
-                selectinload(Orders.payment),
-                selectinload(Orders.direction)
-            ).where(
+            query = select(Orders).where(
                 Orders.courier == id).order_by(Orders.created_at.asc())
-            filtered_result = await db.execute(query)
-            filtered_orders = filtered_result.scalars().all()
-            order_items_count_query = select(
-                OrderItems.order_id,
-                func.count().label('items_count')
-            ).group_by(OrderItems.order_id)
-
-            result = await db.execute(order_items_count_query)
-            order_items_count = result.all()
-        order_items_count_dict = {order_id: count for order_id, count in order_items_count}
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Заказы"
-
-        columns = [
-            "ID",
-            "Дата",
-            "Откуда",
-            "Отправитель",
-            "Контакт отправителя",
-            "Количество",
-            "Вес",
-            "Объем",
-            "Сумма",
-            "Упаковка",
-            "Доставка",
-            "Забор",
-            "Куда",
-            "Получатель",
-            "Контакты получателя",
-            "Тип отправки",
-            "Тип оплаты",
-            "Местонахождение",
-            "Оплачено",
-            "Сотрудник",
-            "Характер груза"]
-        ws.append(columns)
-        for order in filtered_orders:
-            payment_status = 'ДА' if order.payment and order.payment.payment_status == PaymentStatus.PAID.value else 'НЕТ'
-            payment_type = None
-            transportation_type = None
-            if order.payment:
-                if order.payment.payment_type == PaymentType.CASH.value:
-                    payment_type = 'Наличные'
-                if order.payment.payment_type == PaymentType.ONLINE.value:
-                    payment_type = 'Онлайн'
-            if order.direction:
-                if order.direction.transportation_type == TransportationType.AIR.value:
-                    transportation_type = 'Самолет'
-                if order.direction.transportation_type == TransportationType.RAIL.value:
-                    transportation_type = 'ЖД'
-                if order.direction.transportation_type == TransportationType.ROAD.value:
-                    transportation_type = 'Фура'
-            ws.append([
-                order.id,
-                order.created_at,
-                order.direction.departure_city.name if order.direction else None,
-                order.sender_fio,
-                order.sender_phone,
-                order_items_count_dict.get(order.id, 0),
-                order.total_weight,
-                order.total_volume,
-                order.payment.amount if order.payment else 0,
-                None,  # Упаковка
-                None,  # Доставка
-                None,  # Забор
-                order.direction.arrival_city.name if order.direction else None,
-                order.receiver_fio,
-                order.receiver_phone,
-                transportation_type,
-                payment_type,
-                f'{order.warehouse.name}, {order.warehouse.address}' if order.warehouse else None,
-                payment_status,
-                None,  # Сотрудник,
-                order.description
-
-            ])
-        excel_file = BytesIO()
-        wb.save(excel_file)
-        excel_file.seek(0)
-        return excel_file
+            return await write_orders_excel(query, db)
 
 
 shipping_service = ShippingService()
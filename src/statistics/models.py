@@ -0,0 +1,68 @@
+from sqlalchemy import (BigInteger, Column, Date, Float, ForeignKey, Index,
+                        Integer, String, func)
+
+from src.database import Base
+
+
+class OrderDailyStatistics(Base):
+    """Orders created on ``day`` aggregated by direction, status and payment type.
+
+    Transportation type isn't stored: it's taken from the direction when
+    reading, so it stays right if a direction changes.
+    """
+    __tablename__ = "order_daily_statistics"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    direction_id = Column(Integer, nullable=True)
+    order_status = Column(String, nullable=False)
+    payment_type = Column(String, nullable=True)
+    orders_count = Column(Integer, nullable=False)
+    total_weight = Column(Float, nullable=False)
+    total_volume = Column(Float, nullable=False)
+    payments_count = Column(Integer, nullable=False)
+    payments_amount = Column(BigInteger, nullable=False)
+
+
+class ShippingDailyStatistics(Base):
+    __tablename__ = "shipping_daily_statistics"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    direction_id = Column(Integer, nullable=True)
+    shipping_type = Column(String, nullable=False)
+    shippings_count = Column(Integer, nullable=False)
+
+
+class StatisticsDirtyDay(Base):
+    """Days whose rollups are out of date, logged by triggers on orders, payments and shipping.
+
+    A day may be logged many times. Marks of transactions that haven't
+    committed yet are invisible to the rollup job, so it can't clear them
+    before it has seen their changes.
+    """
+    __tablename__ = "statistics_dirty_days"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+
+
+class CourierDailyCounters(Base):
+    """What a courier picked up and delivered, by the day the orders were created and their direction.
+
+    Updated together with every users_orders row and rebuilt from
+    users_orders by the reconciliation job.
+    """
+    __tablename__ = "courier_daily_counters"
+
+    id = Column(Integer, primary_key=True)
+    courier_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    day = Column(Date, nullable=False)
+    direction_id = Column(Integer, nullable=True)
+    selected_orders = Column(Integer, nullable=False, default=0)
+    delivered_orders = Column(Integer, nullable=False, default=0)
+    total_profit = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_courier_daily_counters_key", "courier_id", "day", func.coalesce(direction_id, 0), unique=True),
+    )
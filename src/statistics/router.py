@@ -6,9 +6,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
 from src.directions.models import TransportationType
-from src.statistics.schemas import (OrdersStatistics, PaymentStatistics,
-                                    TotalOrdersCount, TotalVolume,
-                                    TotalWeightSchema, CourierStatisticsSchema)
+from src.statistics.schemas import (DashboardStatistics, OrdersStatistics,
+                                    PaymentStatistics, SeriesPoint,
+                                    StatisticsGranularity, TotalOrdersCount,
+                                    TotalVolume, TotalWeightSchema,
+                                    CourierStatisticsSchema)
 from src.statistics.service import statistic_service
 from src.users.auth import JWTBearer
 
@@ -17,6 +19,16 @@ router = APIRouter(
 )
 
 
+@router.get("/statistics/dashboard",
+            dependencies=[Depends(JWTBearer())],
+            response_model=DashboardStatistics,
+            status_code=status.HTTP_200_OK)
+async def dashboard(start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None),
+                    transportation_type: TransportationType = Query(None)):
+    return await statistic_service.dashboard(start_date=start_date, end_date=end_date, direction_ids=direction_ids,
+                                             transportation_type=transportation_type)
+
+
 @router.get("/statistics/total_weight",
             dependencies=[Depends(JWTBearer()),
                           Depends(get_db)],
@@ -61,8 +73,22 @@ async def orders(start_date: date = Query(None), end_date: date = Query(None), d
             dependencies=[Depends(JWTBearer()),
                           Depends(get_db)],
             status_code=status.HTTP_200_OK)
-async def shippings(start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db)):
-    return await statistic_service.shippings(start_date=start_date, end_date=end_date, direction_ids=direction_ids, db=db)
+async def shippings(start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db),
+                    granularity: StatisticsGranularity = StatisticsGranularity.DAY):
+    return await statistic_service.shippings(start_date=start_date, end_date=end_date, direction_ids=direction_ids, db=db,
+                                             granularity=granularity)
+
+
+@router.get("/statistics/series",
+            dependencies=[Depends(JWTBearer()),
+                          Depends(get_db)],
+            response_model=List[SeriesPoint],
+            status_code=status.HTTP_200_OK)
+async def series(start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None),
+                 transportation_type: TransportationType = Query(None),
+                 granularity: StatisticsGranularity = StatisticsGranularity.DAY, db: AsyncSession = Depends(get_db)):
+    return await statistic_service.series(start_date=start_date, end_date=end_date, direction_ids=direction_ids,
+                                          transportation_type=transportation_type, granularity=granularity, db=db)
 
 
 @router.get("/statistics/payments",
@@ -1,4 +1,5 @@
 from datetime import date
+from enum import Enum
 
 from pydantic import BaseModel
 
@@ -29,6 +30,12 @@ class ShippingTypeCount(BaseModel):
     count: int
 
 
+class StatisticsGranularity(Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
 class ShippingStatistics(BaseModel):
     shipping_types: list[ShippingTypeCount]
     created_at: date
@@ -39,6 +46,25 @@ class PaymentStatistics(BaseModel):
     count: int
 
 
+class SeriesPoint(BaseModel):
+    bucket: date
+    orders_count: int
+    total_weight: float
+    total_volume: float
+    payments_count: int
+    payments_amount: float
+    shippings_count: int
+
+
+class DashboardStatistics(BaseModel):
+    total_weight: float
+    total_volume: float
+    total_orders_count: int
+    orders: list[OrdersStatistics]
+    payments: list[PaymentStatistics]
+    shippings: list[ShippingStatistics]
+
+
 ORDER_GROUPS = {
     "NOT_DELIVERED": [
         OrderStatus.NOT_DELIVERED.value,
@@ -1,87 +1,186 @@
+import asyncio
+import logging
 from collections import defaultdict
 from datetime import date, datetime
 from typing import List
 
 from fastapi import Depends, Query
-from sqlalchemy import func, or_, select, and_, case
+from sqlalchemy import (Date, DateTime, Float, Integer, String, cast, delete,
+                        func, insert, literal, literal_column, null, or_,
+                        select, text, tuple_, union_all)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database import get_db
-from src.directions.models import TransportationType, Directions
-from src.orders.models import Orders, Payment, OrderStatus
+from src.common.utils import SingleFlight
+from src.config import settings
+from src.database import async_session, get_db
+from src.directions.models import Directions, TransportationType
+from src.orders.models import OrderStatus, Orders, Payment
 from src.orders.schemas import PaymentType
 from src.shipping.models import Shipping
-from src.statistics.schemas import (ORDER_GROUPS, OrdersStatistics,
-                                    PaymentStatistics, ShippingStatistics,
-                                    ShippingTypeCount, TotalOrdersCount,
-                                    TotalVolume, TotalWeightSchema, CourierStatisticsSchema)
-from src.statistics.utils import StatisticFilterUtils
-from src.users.models import Users, auth_group_permission, Permission, UsersOrders
-from src.users.schemas import Permission as PermissionSchema
+from src.statistics.models import (CourierDailyCounters, OrderDailyStatistics,
+                                   ShippingDailyStatistics, StatisticsDirtyDay)
+from src.statistics.schemas import (ORDER_GROUPS, CourierStatisticsSchema,
+                                    DashboardStatistics, OrdersStatistics,
+                                    PaymentStatistics, SeriesPoint,
+                                    ShippingStatistics, ShippingTypeCount,
+                                    StatisticsGranularity, TotalOrdersCount,
+                                    TotalVolume, TotalWeightSchema)
+from src.users.models import Users, UsersOrders
+
+logger = logging.getLogger(__name__)
+
+# keys of the advisory locks that let one worker process run each job at a time
+STATISTICS_ROLLUP_LOCK = 720_301
+COURIER_COUNTERS_LOCK = 720_302
+
+# users_orders statuses recorded when a courier brings an order to a warehouse
+COURIER_SELECTED_STATUSES = (OrderStatus.COURIER_DELIVERING_TO_WAREHOUSE.value, OrderStatus.ACCEPTED_TO_WAREHOUSE.value)
+
+
+def order_day_statistics(day):
+    """Aggregates orders into rows shaped like OrderDailyStatistics."""
+    return select(
+        day.label("day"),
+        Orders.direction_id,
+        Orders.order_status,
+        Payment.payment_type,
+        func.count(Orders.id).label("orders_count"),
+        func.coalesce(func.sum(Orders.total_weight), 0).label("total_weight"),
+        func.coalesce(func.sum(Orders.total_volume), 0).label("total_volume"),
+        func.count(Payment.id).label("payments_count"),
+        func.coalesce(func.sum(Payment.amount), 0).label("payments_amount")
+    ).outerjoin(Payment, Payment.order_id == Orders.id).group_by(
+        day, Orders.direction_id, Orders.order_status, Payment.payment_type)
+
+
+def shipping_day_statistics(day):
+    """Aggregates shippings into rows shaped like ShippingDailyStatistics."""
+    return select(
+        day.label("day"),
+        Shipping.direction_id,
+        cast(Shipping.shipping_type, String).label("shipping_type"),
+        func.count(Shipping.id).label("shippings_count")
+    ).group_by(day, Shipping.direction_id, Shipping.shipping_type)
+
+
+def time_series(rows, granularity: StatisticsGranularity, start_date: date | None, end_date: date | None,
+                group_by: list, aggregates: list):
+    """Sums ``rows`` per day, week or month, one row for every bucket in the range.
+
+    ``rows`` needs a ``day`` column. Buckets start at ``start_date``, or at the
+    first day in ``rows`` if it's None, and end at ``end_date`` or today.
+    Buckets without rows come back with NULL ``group_by`` columns and
+    aggregates.
+    """
+    # inlined rather than bound, so the grouped and selected expressions are identical
+    def truncate(day):
+        return func.date_trunc(literal_column(f"'{granularity.value}'"), cast(day, DateTime))
+
+    bucket = cast(truncate(rows.c.day), Date).label("bucket")
+    buckets = select(bucket, *group_by, *aggregates).group_by(bucket, *group_by).subquery()
+    first_day = start_date if start_date is not None else select(func.min(rows.c.day)).scalar_subquery()
+    series = func.generate_series(
+        truncate(first_day), truncate(end_date or date.today()), literal_column(f"interval '1 {granularity.value}'")
+    ).table_valued("bucket").render_derived()
+    return select(
+        cast(series.c.bucket, Date).label("bucket"),
+        *(buckets.c[column.name] for column in group_by),
+        *(buckets.c[aggregate.name] for aggregate in aggregates)
+    ).select_from(series).outerjoin(buckets, buckets.c.bucket == cast(series.c.bucket, Date)).order_by(series.c.bucket)
 
 
 class StatisticService:
+    """Reads statistics from the daily rollups.
+
+    Rollups cover days before today and lag behind writes by up to
+    STATISTICS_ROLLUP_INTERVAL seconds; today's figures are aggregated from
+    the orders and shipping tables on every request.
+    """
+
+    def __init__(self):
+        self.dashboard_flights = SingleFlight()
+
+    @staticmethod
+    def includes_today(start_date: date | None, end_date: date | None) -> bool:
+        today = date.today()
+        return (start_date is None or start_date <= today) and (end_date is None or end_date >= today)
+
+    def get_order_rows(self, start_date: date = None, end_date: date = None, direction_ids: List[int] = None):
+        rows = select(OrderDailyStatistics.day, OrderDailyStatistics.direction_id, OrderDailyStatistics.order_status,
+                      OrderDailyStatistics.payment_type, OrderDailyStatistics.orders_count,
+                      OrderDailyStatistics.total_weight, OrderDailyStatistics.total_volume,
+                      OrderDailyStatistics.payments_count, OrderDailyStatistics.payments_amount).where(
+            OrderDailyStatistics.day < date.today())
+        if start_date is not None:
+            rows = rows.where(OrderDailyStatistics.day >= start_date)
+        if end_date is not None:
+            rows = rows.where(OrderDailyStatistics.day <= end_date)
+        if direction_ids:
+            rows = rows.where(OrderDailyStatistics.direction_id.in_(direction_ids))
+        if self.includes_today(start_date, end_date):
+            today = order_day_statistics(cast(Orders.created_at, Date)).where(
+                Orders.created_at >= datetime.combine(date.today(), datetime.min.time()))
+            if direction_ids:
+                today = today.where(Orders.direction_id.in_(direction_ids))
+            rows = union_all(rows, today)
+        return rows.subquery()
+
+    def get_shipping_rows(self, start_date: date = None, end_date: date = None, direction_ids: List[int] = None):
+        rows = select(ShippingDailyStatistics.day, ShippingDailyStatistics.direction_id,
+                      ShippingDailyStatistics.shipping_type, ShippingDailyStatistics.shippings_count).where(
+            ShippingDailyStatistics.day < date.today())
+        if start_date is not None:
+            rows = rows.where(ShippingDailyStatistics.day >= start_date)
+        if end_date is not None:
+            rows = rows.where(ShippingDailyStatistics.day <= end_date)
+        if direction_ids:
+            rows = rows.where(ShippingDailyStatistics.direction_id.in_(direction_ids))
+        if self.includes_today(start_date, end_date):
+            today = shipping_day_statistics(cast(Shipping.created_at, Date)).where(
+                Shipping.created_at >= datetime.combine(date.today(), datetime.min.time()))
+            if direction_ids:
+                today = today.where(Shipping.direction_id.in_(direction_ids))
+            rows = union_all(rows, today)
+        return rows.subquery()
+
+    @staticmethod
+    def filter_transportation_type(query, rows, transportation_type: TransportationType = None):
+        if transportation_type is not None:
+            query = query.join(Directions, rows.c.direction_id == Directions.id).where(
+                Directions.transportation_type == transportation_type)
+        return query
 
     async def total_weight(self, db: AsyncSession = Depends(get_db), start_date: date = Query(None),
                            end_date: date = Query(None), direction_ids: List[int] = Query(None), transportation_type: TransportationType = Query(None)) -> TotalWeightSchema:
-        model = Orders
-        query = (select(func.sum(model.total_weight).label("total_weight")))
-        filters = StatisticFilterUtils.filter(
-            class_name=Orders,
-            query=query,
-            start_date=start_date,
-            end_date=end_date,
-            direction_id=direction_ids,
-            transportation_type=transportation_type)
-        data = await db.execute(filters)
-        total_weight = data.scalar()
+        rows = self.get_order_rows(start_date, end_date, direction_ids)
+        query = self.filter_transportation_type(select(func.sum(rows.c.total_weight)), rows, transportation_type)
+        total_weight = await db.scalar(query)
         return TotalWeightSchema(total_weight=total_weight if total_weight else 0.0)
 
     async def total_volume(self, db: AsyncSession = Depends(get_db), start_date: date = Query(None),
                            end_date: date = Query(None), direction_ids: List[int] = Query(None), transportation_type: TransportationType = Query(None)) -> TotalVolume:
-        model = Orders
-        query = (select(func.sum(model.total_volume).label("total_volume")))
-        filters = StatisticFilterUtils.filter(
-            class_name=Orders,
-            query=query,
-            start_date=start_date,
-            end_date=end_date,
-            direction_id=direction_ids,
-            transportation_type=transportation_type)
-        data = await db.execute(filters)
-        total_volume = data.scalar()
+        rows = self.get_order_rows(start_date, end_date, direction_ids)
+        query = self.filter_transportation_type(select(func.sum(rows.c.total_volume)), rows, transportation_type)
+        total_volume = await db.scalar(query)
         return TotalVolume(total_volume=total_volume if total_volume else 0.0)
 
     async def total_orders_count(self, db: AsyncSession = Depends(get_db), start_date: date = Query(None),
                                  end_date: date = Query(None),
                                  direction_ids: List[int] = Query(None), transportation_type: TransportationType = Query(None)) -> TotalOrdersCount:
-        model = Orders
-        query = (select(func.count(model.id).label("total_orders_count")))
-        filters = StatisticFilterUtils.filter(
-            class_name=Orders,
-            query=query,
-            start_date=start_date,
-            end_date=end_date,
-            direction_id=direction_ids,
-            transportation_type=transportation_type)
-        data = await db.execute(filters)
-        total_orders_count = data.scalar()
+        rows = self.get_order_rows(start_date, end_date, direction_ids)
+        query = self.filter_transportation_type(select(func.sum(rows.c.orders_count)), rows, transportation_type)
+        total_orders_count = await db.scalar(query)
         return TotalOrdersCount(total_orders_count=total_orders_count if total_orders_count else 0)
 
     async def orders(self, start_date: date = Query(None), end_date: date = Query(None),
                      direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db), transportation_type: TransportationType = Query(None)) -> List[
         OrdersStatistics]:
-        model = Orders
-        query = (select(model.order_status, func.count(model.id).label("count")))
-        filters = StatisticFilterUtils.filter(
-            class_name=Orders,
-            query=query,
-            start_date=start_date,
-            end_date=end_date,
-            direction_id=direction_ids,
-            transportation_type=transportation_type).group_by(
-            model.order_status)
-        data = await db.execute(filters)
+        rows = self.get_order_rows(start_date, end_date, direction_ids)
+        query = self.filter_transportation_type(
+            select(rows.c.order_status, func.sum(rows.c.orders_count)), rows, transportation_type).group_by(
+            rows.c.order_status)
+        data = await db.execute(query)
         select_type = data.fetchall()
         result = []
         count_pending = 0
@@ -95,49 +194,45 @@ class StatisticService:
         result.append(OrdersStatistics(status="PENDING", count=count_pending))
         return result
 
-    async def shippings(self, start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db)) -> List[ShippingStatistics]:
-        model = Shipping
-        query = (select(model.shipping_type, func.count(
-            model.id).label("count"), model.created_at))
-        filters = StatisticFilterUtils.filter(
-            class_name=Shipping,
-            query=query,
-            start_date=start_date,
-            end_date=end_date,
-            direction_id=direction_ids).group_by(
-            model.shipping_type,
-            model.created_at)
-        data = await db.execute(filters)
-        select_type = data.fetchall()
-        result_dict = defaultdict(lambda: defaultdict(int))
-        for shipping_type, count, created_at in select_type:
-            result_dict[created_at.date()][shipping_type] += count
-        result = [
-            ShippingStatistics(
-                shipping_types=[
-                    ShippingTypeCount(
-                        shipping_type=type,
-                        count=count) for type,
-                    count in counts.items()],
-                created_at=date) for date,
-            counts in result_dict.items()]
-        result.sort(key=lambda x: x.created_at)
-        return result
+    async def shippings(self, start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db),
+                        granularity: StatisticsGranularity = StatisticsGranularity.DAY) -> List[ShippingStatistics]:
+        rows = self.get_shipping_rows(start_date, end_date, direction_ids)
+        query = time_series(rows, granularity, start_date, end_date, [rows.c.shipping_type],
+                            [func.sum(rows.c.shippings_count).label("shippings_count")])
+        data = await db.execute(query)
+        result = {}
+        for bucket, shipping_type, count in data.fetchall():
+            point = result.setdefault(bucket, ShippingStatistics(shipping_types=[], created_at=bucket))
+            if shipping_type is not None:
+                point.shipping_types.append(ShippingTypeCount(shipping_type=shipping_type, count=count))
+        return list(result.values())
+
+    async def series(self, start_date: date = Query(None), end_date: date = Query(None),
+                     direction_ids: List[int] = Query(None), transportation_type: TransportationType = Query(None),
+                     granularity: StatisticsGranularity = StatisticsGranularity.DAY,
+                     db: AsyncSession = Depends(get_db)) -> List[SeriesPoint]:
+        orders = self.get_order_rows(start_date, end_date, direction_ids)
+        shippings = self.get_shipping_rows(start_date, end_date, direction_ids)
+        rows = union_all(
+            select(orders.c.day, orders.c.direction_id, orders.c.orders_count, orders.c.total_weight,
+                   orders.c.total_volume, orders.c.payments_count, orders.c.payments_amount,
+                   literal(0, Integer).label("shippings_count")),
+            select(shippings.c.day, shippings.c.direction_id, literal(0, Integer), literal(0, Float),
+                   literal(0, Float), literal(0, Integer), literal(0, Integer), shippings.c.shippings_count)
+        ).subquery()
+        if transportation_type is not None:
+            rows = select(rows).join(Directions, rows.c.direction_id == Directions.id).where(
+                Directions.transportation_type == transportation_type).subquery()
+        query = time_series(rows, granularity, start_date, end_date, [], [
+            func.sum(rows.c[name]).label(name) for name in SeriesPoint.model_fields if name != "bucket"])
+        data = await db.execute(query)
+        return [SeriesPoint(**{name: value if value is not None else 0 for name, value in row.items()})
+                for row in data.mappings().all()]
 
     async def payments(self, start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None), db: AsyncSession = Depends(get_db)) -> List[PaymentStatistics]:
-        query = select(
-            Payment.payment_type,
-            func.count(Payment.id).label("count")
-        ).join(
-            Orders.payment
-        )
-        if start_date:
-            query = query.filter(Orders.created_at >= datetime.combine(start_date, datetime.min.time()))
-        if end_date:
-            query = query.filter(Orders.created_at <= datetime.combine(end_date, datetime.max.time()))
-        if direction_ids:
-            query = query.filter(Orders.direction_id.in_(direction_ids))
-        query = query.group_by(Payment.payment_type)
+        rows = self.get_order_rows(start_date, end_date, direction_ids)
+        query = select(rows.c.payment_type, func.sum(rows.c.payments_count)).where(
+            rows.c.payments_count > 0).group_by(rows.c.payment_type)
         data = await db.execute(query)
         select_type = data.fetchall()
         result = []
@@ -150,6 +245,64 @@ class StatisticService:
                     payment_type=status, count=count))
         return result
 
+    async def compute_dashboard(self, start_date: date = None, end_date: date = None, direction_ids: List[int] = None,
+                                transportation_type: TransportationType = None) -> DashboardStatistics:
+        orders = self.get_order_rows(start_date, end_date, direction_ids)
+        shippings = self.get_shipping_rows(start_date, end_date, direction_ids)
+        rows = union_all(
+            select(orders.c.direction_id, orders.c.order_status, orders.c.payment_type, orders.c.orders_count,
+                   orders.c.total_weight, orders.c.total_volume, orders.c.payments_count,
+                   cast(null(), Date).label("day"), cast(null(), String).label("shipping_type"),
+                   literal(0, Integer).label("shippings_count")),
+            select(shippings.c.direction_id, cast(null(), String), cast(null(), String), literal(0, Integer),
+                   literal(0, Float), literal(0, Float), literal(0, Integer),
+                   shippings.c.day, shippings.c.shipping_type, shippings.c.shippings_count)
+        ).subquery()
+        # the empty grouping set gives the big numbers, the other one the shippings per day
+        query = select(
+            func.grouping(rows.c.day, rows.c.shipping_type).label("grouping"),
+            rows.c.day,
+            rows.c.shipping_type,
+            func.sum(rows.c.total_weight).label("total_weight"),
+            func.sum(rows.c.total_volume).label("total_volume"),
+            func.sum(rows.c.orders_count).label("total_orders_count"),
+            *(func.sum(rows.c.orders_count).filter(rows.c.order_status.in_(ORDER_GROUPS[group])).label(group)
+              for group in ("DELIVERED", "CANCELLED", "PENDING")),
+            *(func.sum(rows.c.payments_count).filter(rows.c.payment_type == payment_type.value).label(payment_type.value)
+              for payment_type in PaymentType),
+            func.sum(rows.c.shippings_count).label("shippings_count")
+        ).group_by(func.grouping_sets(tuple_(), tuple_(rows.c.day, rows.c.shipping_type)))
+        query = self.filter_transportation_type(query, rows, transportation_type)
+        # own session: the computation is shared by every request waiting on it
+        async with async_session() as db:
+            data = (await db.execute(query)).mappings().all()
+
+        totals = next(row for row in data if row["grouping"])
+        shipping_counts = defaultdict(list)
+        for row in data:
+            if not row["grouping"] and row["day"] is not None and row["shippings_count"]:
+                shipping_counts[row["day"]].append(
+                    ShippingTypeCount(shipping_type=row["shipping_type"], count=row["shippings_count"]))
+        return DashboardStatistics(
+            total_weight=totals["total_weight"] or 0.0,
+            total_volume=totals["total_volume"] or 0.0,
+            total_orders_count=totals["total_orders_count"] or 0,
+            orders=[OrdersStatistics(status=group, count=totals[group] or 0)
+                    for group in ("DELIVERED", "CANCELLED", "PENDING")],
+            payments=[PaymentStatistics(payment_type=payment_type, count=totals[payment_type.value] or 0)
+                      for payment_type in PaymentType],
+            shippings=[ShippingStatistics(shipping_types=counts, created_at=day)
+                       for day, counts in sorted(shipping_counts.items())]
+        )
+
+    async def dashboard(self, start_date: date = Query(None), end_date: date = Query(None),
+                        direction_ids: List[int] = Query(None),
+                        transportation_type: TransportationType = Query(None)) -> DashboardStatistics:
+        """Every dashboard figure in one query; concurrent loads with the same filters share it."""
+        key = (start_date, end_date, tuple(sorted(direction_ids or ())), transportation_type)
+        return await self.dashboard_flights.run(key, lambda: self.compute_dashboard(
+            start_date, end_date, direction_ids, transportation_type))
+
     async def couriers(self, start_date: date = Query(None), end_date: date = Query(None), direction_ids: List[int] = Query(None)) -> List[PaymentStatistics]:
         pass
 
@@ -157,45 +310,31 @@ class StatisticService:
                                      direction_ids: List[int] = Query(None),
                                      transportation_type: list[TransportationType] = Query(None),
                                      db: AsyncSession = Depends(get_db)) -> list[CourierStatisticsSchema]:
-        selected_filter = or_(
-            UsersOrders.status == OrderStatus.COURIER_DELIVERING_TO_WAREHOUSE.value,
-            UsersOrders.status == OrderStatus.ACCEPTED_TO_WAREHOUSE.value
-        )
-        delivered_filter = UsersOrders.status == OrderStatus.DELIVERED.value
-
+        counters = select(
+            CourierDailyCounters.courier_id,
+            func.sum(CourierDailyCounters.selected_orders).label("selected_orders"),
+            func.sum(CourierDailyCounters.delivered_orders).label("delivered_orders"),
+            func.sum(CourierDailyCounters.total_profit).label("total_profit")
+        ).group_by(CourierDailyCounters.courier_id)
         if direction_ids:
-            direction_filter = Orders.direction_id.in_(direction_ids)
-            selected_filter = and_(selected_filter, direction_filter)
-            delivered_filter = and_(delivered_filter, direction_filter)
-
+            counters = counters.where(CourierDailyCounters.direction_id.in_(direction_ids))
         if transportation_type:
-            transportation_values = [t.value for t in transportation_type]
-            selected_filter = and_(selected_filter, Directions.transportation_type.in_(transportation_values))
-            delivered_filter = and_(delivered_filter, Directions.transportation_type.in_(transportation_values))
-
+            counters = counters.join(Directions, CourierDailyCounters.direction_id == Directions.id).where(
+                Directions.transportation_type.in_([t.value for t in transportation_type]))
         if start_date:
-            date_range = Orders.created_at >= datetime.combine(start_date, datetime.min.time())
-            selected_filter = and_(selected_filter, date_range)
-            delivered_filter = and_(delivered_filter, date_range)
+            counters = counters.where(CourierDailyCounters.day >= start_date)
         if end_date:
-            date_range = Orders.created_at <= datetime.combine(end_date, datetime.max.time())
-            selected_filter = and_(selected_filter, date_range)
-            delivered_filter = and_(delivered_filter, date_range)
+            counters = counters.where(CourierDailyCounters.day <= end_date)
+        counters = counters.subquery()
 
         query = select(
-            Users.id.label('user_id'),
+            Users.id,
             Users.first_name,
             Users.last_name,
-            func.count(case((selected_filter, UsersOrders.order_id), else_=None)).label('selected_orders'),
-            func.count(case((delivered_filter, UsersOrders.order_id), else_=None)).label('delivered_orders'),
-            func.sum(case((delivered_filter, Payment.amount), else_=0)).label('total_profit')
-        ).outerjoin(UsersOrders, Users.id == UsersOrders.user_id
-                    ).outerjoin(Orders, Orders.id == UsersOrders.order_id
-                                ).outerjoin(Directions, Orders.direction_id == Directions.id
-                                            ).outerjoin(Payment, Orders.id == Payment.order_id
-                                                        ).group_by(
-            Users.id, Users.first_name, Users.last_name
-        )
+            counters.c.selected_orders,
+            counters.c.delivered_orders,
+            counters.c.total_profit
+        ).outerjoin(counters, counters.c.courier_id == Users.id)
 
         result = await db.execute(query)
         result = result.all()
@@ -203,12 +342,159 @@ class StatisticService:
             CourierStatisticsSchema(
                 user_id=row[0],
                 courier_name=f"{row[1]} {row[2]}",
-                selected_orders=row[3],
-                delivered_orders=row[4],
+                selected_orders=row[3] or 0,
+                delivered_orders=row[4] or 0,
                 total_profit=float(row[5]) if row[5] else 0.0
             )
             for row in result
         ]
 
 
+class CourierCounterService:
+    """Keeps courier_daily_counters in step with users_orders."""
+
+    async def add_courier_order(self, order: Orders, status: OrderStatus, db: AsyncSession) -> None:
+        """Links the order to its courier and counts it in the caller's transaction."""
+        db.add(UsersOrders(user_id=order.courier, order_id=order.id, status=status.value))
+        delivered = status == OrderStatus.DELIVERED
+        insert_counters = pg_insert(CourierDailyCounters).values(
+            courier_id=order.courier,
+            day=(order.created_at or datetime.now()).date(),
+            direction_id=order.direction_id,
+            selected_orders=int(status.value in COURIER_SELECTED_STATUSES),
+            delivered_orders=int(delivered),
+            total_profit=order.payment.amount if delivered and order.payment else 0
+        )
+        # the conflict target must repeat ix_courier_daily_counters_key exactly, so 0 isn't a bound parameter
+        await db.execute(insert_counters.on_conflict_do_update(
+            index_elements=[CourierDailyCounters.courier_id, CourierDailyCounters.day,
+                            func.coalesce(CourierDailyCounters.direction_id, literal_column("0"))],
+            set_={
+                name: getattr(CourierDailyCounters, name) + getattr(insert_counters.excluded, name)
+                for name in ("selected_orders", "delivered_orders", "total_profit")
+            }
+        ))
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        """Recomputes every counter from users_orders.
+
+        The table lock waits for transactions that have already counted
+        something and holds off new ones until the rebuild commits, so no
+        increment is lost or counted twice.
+        """
+        await db.execute(text("LOCK TABLE courier_daily_counters IN EXCLUSIVE MODE"))
+        await db.execute(delete(CourierDailyCounters))
+        selected = UsersOrders.status.in_(COURIER_SELECTED_STATUSES)
+        delivered = UsersOrders.status == OrderStatus.DELIVERED.value
+        day = cast(func.coalesce(Orders.created_at, UsersOrders.created_at), Date)
+        counters = select(
+            UsersOrders.user_id,
+            day,
+            Orders.direction_id,
+            func.count(UsersOrders.id).filter(selected),
+            func.count(UsersOrders.id).filter(delivered),
+            func.coalesce(func.sum(Payment.amount).filter(delivered), 0)
+        ).join(Orders, Orders.id == UsersOrders.order_id).outerjoin(
+            Payment, Payment.order_id == Orders.id
+        ).where(or_(selected, delivered)).group_by(UsersOrders.user_id, day, Orders.direction_id)
+        await db.execute(insert(CourierDailyCounters).from_select(
+            ["courier_id", "day", "direction_id", "selected_orders", "delivered_orders", "total_profit"], counters))
+
+
+class CourierCountersReconciler:
+    """Background task that rebuilds courier counters every COURIER_COUNTERS_RECONCILE_INTERVAL seconds.
+
+    Counters are updated in the same transactions as users_orders, so this
+    only repairs drift, e.g. from rows changed by hand.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._work())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self) -> bool:
+        async with async_session() as db:
+            if not await db.scalar(select(func.pg_try_advisory_xact_lock(COURIER_COUNTERS_LOCK))):
+                return False
+            await courier_counter_service.rebuild(db)
+            await db.commit()
+        return True
+
+    async def _work(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Failed to rebuild courier counters")
+
+
+class StatisticsRollupWorker:
+    """Background task that keeps the daily statistics rollups up to date.
+
+    Every STATISTICS_ROLLUP_INTERVAL seconds it takes the days logged in
+    statistics_dirty_days, except today, and rebuilds their rollups from
+    scratch. A transaction-level advisory lock keeps workers of other
+    processes from doing the same work at once.
+    """
+
+    def __init__(self, interval: int):
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._work())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def refresh(self, db: AsyncSession, days: list[date]) -> None:
+        first_day = datetime.combine(min(days), datetime.min.time())
+        order_day = cast(Orders.created_at, Date)
+        shipping_day = cast(Shipping.created_at, Date)
+        await db.execute(delete(OrderDailyStatistics).where(OrderDailyStatistics.day.in_(days)))
+        await db.execute(delete(ShippingDailyStatistics).where(ShippingDailyStatistics.day.in_(days)))
+        orders = order_day_statistics(order_day).where(Orders.created_at >= first_day, order_day.in_(days))
+        await db.execute(insert(OrderDailyStatistics).from_select(
+            [column.name for column in orders.selected_columns], orders))
+        shippings = shipping_day_statistics(shipping_day).where(Shipping.created_at >= first_day, shipping_day.in_(days))
+        await db.execute(insert(ShippingDailyStatistics).from_select(
+            [column.name for column in shippings.selected_columns], shippings))
+
+    async def run(self) -> list[date]:
+        async with async_session() as db:
+            if not await db.scalar(select(func.pg_try_advisory_xact_lock(STATISTICS_ROLLUP_LOCK))):
+                return []
+            days = await db.scalars(delete(StatisticsDirtyDay).where(
+                StatisticsDirtyDay.day < date.today()).returning(StatisticsDirtyDay.day))
+            days = sorted(set(days))
+            if days:
+                await self.refresh(db, days)
+            await db.commit()
+        return days
+
+    async def _work(self):
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Failed to refresh statistics rollups")
+            await asyncio.sleep(self.interval)
+
+
 statistic_service = StatisticService()
+statistics_rollup_worker = StatisticsRollupWorker(interval=settings.STATISTICS_ROLLUP_INTERVAL)
+courier_counter_service = CourierCounterService()
+courier_counters_reconciler = CourierCountersReconciler(interval=settings.COURIER_COUNTERS_RECONCILE_INTERVAL)
@@ -1,2 +1,4 @@
 class ErrorCode:
     TARIF_NOT_FOUND = "Не найден тариф."
+    TARIF_AMOUNT_REQUIRED = "Тариф задаёт цену для диапазона, укажите amount или whole_range."
+    TARIF_AMOUNT_OUT_OF_RANGE = "amount не входит в диапазон тарифа."
@@ -1,6 +1,14 @@
-from src.exceptions import NotFound
+from src.exceptions import BadRequest, NotFound
 from src.tarifs.constants import ErrorCode
 
 
 class TarifNotFound(NotFound):
     DETAIL = ErrorCode.TARIF_NOT_FOUND
+
+
+class TarifAmountRequired(BadRequest):
+    DETAIL = ErrorCode.TARIF_AMOUNT_REQUIRED
+
+
+class TarifAmountOutOfRange(BadRequest):
+    DETAIL = ErrorCode.TARIF_AMOUNT_OUT_OF_RANGE
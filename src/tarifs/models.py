@@ -22,14 +22,24 @@ class Tarifs(Base):
     id = Column(Integer, primary_key=True, index=True)
     calculation_type = Column(PgEnum(CalculationType), nullable=False)
     direction_id = Column(Integer, ForeignKey("directions.id"), nullable=True)
-    amount = Column(Integer, nullable=False)
+    # the row prices every amount in [start_amount, end_amount]
+    start_amount = Column(Integer, nullable=False)
+    end_amount = Column(Integer, nullable=False)
+    # price at start_amount, growing by increment for each following amount
     price = Column(Float, nullable=False)
-    is_limit = Column(Boolean, default=False)
+    increment = Column(Float, nullable=False, default=0, server_default="0")
+    # the limit row of a type starts at 0 too, so it's kept apart from the ranges by the unique key
+    is_limit = Column(Boolean, nullable=False, default=False, server_default="false")
 
     __table_args__ = (
         UniqueConstraint(
             'calculation_type',
             'direction_id',
-            'amount',
-            name='idx_tarifs_calculation_type_direction_id_amount'),
+            'start_amount',
+            'is_limit',
+            name='idx_tarifs_calculation_type_direction_id_start_amount_is_limit'),
+        CheckConstraint('end_amount >= start_amount', name='check_tarifs_range'),
     )
+
+    def price_for(self, amount: int) -> float:
+        return self.price + (amount - self.start_amount) * self.increment
@@ -82,6 +82,10 @@ class TarifLimitSchemas(BaseModel):
 class TarifUpdateSchemas(BaseModel):
     id: int
     price: confloat(ge=0.0)
+    # the amount to reprice, required when the tarif prices a range of amounts
+    amount: conint(ge=0) | None = None
+    # reprices the starting price of the whole range instead of a single amount
+    whole_range: bool = False
 
     model_config = {
         "json_schema_extra": {
@@ -89,6 +93,7 @@ class TarifUpdateSchemas(BaseModel):
             {
                 "id": 1,
                 "price": 500.0,
+                "amount": 3
             }
         }
     }
@@ -1,19 +1,20 @@
 from fastapi import Depends, HTTPException, Query, status
-from sqlalchemy import select, update, func
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.dao.base import BaseDao
 from src.database import get_db
-from src.tarifs.exceptions import TarifNotFound
+from src.tarifs.exceptions import (TarifAmountOutOfRange, TarifAmountRequired,
+                                   TarifNotFound)
 from src.tarifs.models import Tarifs
 from src.tarifs.schemas import (CalculationType, TarifCreateSchemas,
                                 TarifUpdateSchemas, TarifViewSchemas, TarifLimitSchemas, DeliveryTarifSchemas)
+from src.tarifs.utils import tarif_index
 
 
 DELIVERY_WEIGHT_LIMIT = 500
 DELIVERY_VOLUME_LIMIT = 15
-TARIF_LIMIT = 100
 
 
 class TarifService(BaseDao):
@@ -22,12 +23,18 @@ class TarifService(BaseDao):
     async def get_tarifs(self, calculation_type: CalculationType, db: AsyncSession = Depends(get_db), amount: int | None = None, direction_id: int | None = None) -> list[TarifViewSchemas]:
         query = select(Tarifs).filter_by(
             calculation_type=calculation_type).order_by(
-            Tarifs.amount)
+            Tarifs.start_amount)
         if amount is not None:
-            query = query.filter_by(amount=amount)
+            query = query.where(Tarifs.start_amount <= amount, Tarifs.end_amount >= amount)
         if direction_id is not None:
             query = query.filter_by(direction_id=direction_id)
-        return (await db.execute(query)).scalars().all()
+        tarifs = (await db.execute(query)).scalars().all()
+        return [
+            TarifViewSchemas(id=tarif.id, amount=tarif_amount, price=tarif.price_for(tarif_amount))
+            for tarif in tarifs
+            for tarif_amount in range(tarif.start_amount, tarif.end_amount + 1)
+            if amount is None or tarif_amount == amount
+        ]
 
     async def get_delivery_tarifs(self, calculation_type: CalculationType, db: AsyncSession = Depends(get_db),
                                   amount: int | None = None, direction_id: int | None = None) -> list[
@@ -35,36 +42,24 @@ class TarifService(BaseDao):
         if calculation_type != CalculationType.DELIVERY_VOLUME.value and calculation_type != CalculationType.DELIVERY_WEIGHT.value and calculation_type != CalculationType.SENDER_CARGO_PICKUP_WEIGHT.value and calculation_type != CalculationType.SENDER_CARGO_PICKUP_VOLUME.value:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail=f'calculation_type should be {CalculationType.DELIVERY_VOLUME.value} or {CalculationType.DELIVERY_WEIGHT.value}')
-        query = select(
-            Tarifs.price,
-            func.min(Tarifs.amount).label("starting_amount"),
-            func.max(Tarifs.amount).label("ending_amount"),
-            Tarifs.calculation_type,
-            Tarifs.direction_id
-        ).where(
+        query = select(Tarifs).where(
             Tarifs.calculation_type == calculation_type
-        ).group_by(
-            Tarifs.price,
-            Tarifs.calculation_type,
-            Tarifs.direction_id
         ).order_by(
-            func.min(Tarifs.amount)
+            Tarifs.start_amount
         )
 
         if amount is not None:
-            query = query.having(
-                (func.min(Tarifs.amount) <= amount) & (func.max(Tarifs.amount) >= amount)
-            )
+            query = query.where(Tarifs.start_amount <= amount, Tarifs.end_amount >= amount)
         if direction_id is not None:
             query = query.where(Tarifs.direction_id == direction_id)
 
         result = await db.execute(query)
-        tarifs = result.all()
+        tarifs = result.scalars().all()
 
         return [DeliveryTarifSchemas(
             calculation_type=calculation_type,
-            starting_amount=tarif.starting_amount,
-            ending_amount=tarif.ending_amount,
+            starting_amount=tarif.start_amount,
+            ending_amount=tarif.end_amount,
             price=tarif.price,
             direction_id=tarif.direction_id
         ) for tarif in tarifs]
@@ -86,40 +81,54 @@ class TarifService(BaseDao):
                 await db.execute(update(Tarifs).where(Tarifs.id == existing_tarif.id).values(price=payload.price))
             else:
                 new_tarif = Tarifs(calculation_type=payload.calculation_type,
-                                   direction_id=payload.direction_id, amount=0, price=payload.price, is_limit=True)
+                                   direction_id=payload.direction_id, start_amount=0, end_amount=0,
+                                   price=payload.price, is_limit=True)
                 db.add(new_tarif)
             await db.commit()
+            tarif_index.invalidate(payload.direction_id)
         except IntegrityError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=str(e._message))
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
 
+    def split_range(self, tarif: Tarifs, start_amount: int, end_amount: int) -> dict:
+        return {'calculation_type': tarif.calculation_type, 'direction_id': tarif.direction_id,
+                'start_amount': start_amount, 'end_amount': end_amount,
+                'price': tarif.price_for(start_amount), 'increment': tarif.increment, 'is_limit': False}
+
+    async def set_range(self, calculation_type: CalculationType, direction_id: int | None, start_amount: int,
+                        end_amount: int, price: float, increment: float = 0, db: AsyncSession = Depends(get_db)) -> None:
+        """Prices [start_amount, end_amount], trimming the ranges it overlaps. Doesn't commit."""
+        overlapping = await db.execute(select(Tarifs).where(
+            Tarifs.calculation_type == calculation_type,
+            Tarifs.direction_id.is_not_distinct_from(direction_id),
+            Tarifs.is_limit.is_not(True),
+            Tarifs.start_amount <= end_amount,
+            Tarifs.end_amount >= start_amount
+        ).with_for_update())
+        overlapping = overlapping.scalars().all()
+        ranges = [{'calculation_type': calculation_type, 'direction_id': direction_id,
+                   'start_amount': start_amount, 'end_amount': end_amount,
+                   'price': price, 'increment': increment, 'is_limit': False}]
+        for tarif in overlapping:
+            if tarif.start_amount < start_amount:
+                ranges.append(self.split_range(tarif, tarif.start_amount, start_amount - 1))
+            if tarif.end_amount > end_amount:
+                ranges.append(self.split_range(tarif, end_amount + 1, tarif.end_amount))
+        if overlapping:
+            await db.execute(delete(Tarifs).where(Tarifs.id.in_([tarif.id for tarif in overlapping])))
+        await db.execute(insert(Tarifs).values(ranges))
+
     async def create_tarifs(self, payload: TarifCreateSchemas, db: AsyncSession = Depends(get_db)) -> list[TarifViewSchemas]:
         if payload.ending_amount > DELIVERY_WEIGHT_LIMIT:
             raise HTTPException(status_code=400, detail="ending amount should be less than 500")
+        if payload.ending_amount < payload.starting_amount:
+            raise HTTPException(status_code=400, detail="ending amount should be greater than starting amount")
         try:
-            tarifs = []
-            price = payload.starting_price
-            for amount in range(payload.starting_amount, payload.ending_amount + 1):
-                tarif_data = {'calculation_type': payload.calculation_type,
-                              'direction_id': payload.direction_id, 'amount': amount, 'price': price}
-                price += payload.increment
-                if payload.calculation_type == CalculationType.VOLUME or payload.calculation_type == CalculationType.WEIGHT or payload.calculation_type == CalculationType.HANDLING:
-                    existing_tarif = await db.execute(select(Tarifs).filter_by(calculation_type=payload.calculation_type,
-                                                                               direction_id=payload.direction_id,
-                                                                               amount=amount))
-                    existing_tarif = existing_tarif.scalars().first()
-                else:
-                    existing_tarif = await db.execute(
-                        select(Tarifs).filter_by(calculation_type=payload.calculation_type, amount=amount))
-                    existing_tarif = existing_tarif.scalars().first()
-                if existing_tarif:
-                    await db.execute(update(Tarifs).where(Tarifs.id == existing_tarif.id).values(price=tarif_data['price']))
-                else:
-                    tarifs.append(tarif_data)
-            if tarifs:
-                await db.run_sync(lambda session: session.bulk_insert_mappings(Tarifs, tarifs))
+            await self.set_range(payload.calculation_type, payload.direction_id, payload.starting_amount,
+                                 payload.ending_amount, payload.starting_price, payload.increment, db)
             await db.commit()
+            tarif_index.invalidate(payload.direction_id)
         except IntegrityError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=str(e._message))
@@ -135,25 +144,15 @@ class TarifService(BaseDao):
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ending amount should be less than 500")
             if (payload.calculation_type == CalculationType.DELIVERY_VOLUME.value or payload.calculation_type == CalculationType.SENDER_CARGO_PICKUP_VOLUME.value) and payload.ending_amount > DELIVERY_VOLUME_LIMIT:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ending amount should be less than 15")
+            if payload.ending_amount < payload.starting_amount:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ending amount should be greater than starting amount")
         try:
             for payload in payloads:
-                tarifs = []
-                price = payload.price
-                for amount in range(payload.starting_amount, payload.ending_amount + 1):
-                    tarif_data = {'calculation_type': payload.calculation_type,
-                                  'direction_id': payload.direction_id, 'amount': amount, 'price': price}
-
-                    existing_tarif = await db.execute(select(Tarifs).filter_by(calculation_type=payload.calculation_type,
-                                                                               direction_id=payload.direction_id,
-                                                                               amount=amount))
-                    existing_tarif = existing_tarif.scalars().first()
-                    if existing_tarif:
-                        await db.execute(update(Tarifs).where(Tarifs.id == existing_tarif.id).values(price=tarif_data['price']))
-                    else:
-                        tarifs.append(tarif_data)
-                if tarifs:
-                    await db.run_sync(lambda session: session.bulk_insert_mappings(Tarifs, tarifs))
-                await db.commit()
+                await self.set_range(payload.calculation_type, payload.direction_id, payload.starting_amount,
+                                     payload.ending_amount, payload.price, 0, db)
+            await db.commit()
+            for payload in payloads:
+                tarif_index.invalidate(payload.direction_id)
         except IntegrityError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=str(e._message))
@@ -162,9 +161,35 @@ class TarifService(BaseDao):
 
     async def update_tarifs(self, payload: list[TarifUpdateSchemas], db: AsyncSession = Depends(get_db)) -> list[TarifViewSchemas]:
         try:
-            tarifs = [{'id': tarif.id, 'price': tarif.price} for tarif in payload]
-            await db.run_sync(lambda session: session.bulk_update_mappings(Tarifs, tarifs))
+            tarif_ranges = await db.execute(select(
+                Tarifs.id, Tarifs.calculation_type, Tarifs.direction_id, Tarifs.start_amount, Tarifs.end_amount,
+                Tarifs.is_limit
+            ).where(Tarifs.id.in_([tarif.id for tarif in payload])))
+            tarif_ranges = {tarif_range.id: tarif_range for tarif_range in tarif_ranges.all()}
+            tarifs = []
+            amount_updates = []
+            for tarif in payload:
+                tarif_range = tarif_ranges.get(tarif.id)
+                if tarif_range is None:
+                    raise TarifNotFound()
+                if tarif.amount is not None:
+                    if not tarif_range.start_amount <= tarif.amount <= tarif_range.end_amount:
+                        raise TarifAmountOutOfRange()
+                    amount_updates.append((tarif, tarif_range))
+                # ids listed by GET /tarifs are shared by every amount of a range,
+                # so a whole range is only repriced when asked for explicitly
+                elif tarif.whole_range or tarif_range.is_limit or tarif_range.start_amount == tarif_range.end_amount:
+                    tarifs.append({'id': tarif.id, 'price': tarif.price})
+                else:
+                    raise TarifAmountRequired()
+            if tarifs:
+                await db.run_sync(lambda session: session.bulk_update_mappings(Tarifs, tarifs))
+            # a single amount of a range is repriced by splitting the range around it
+            for tarif, tarif_range in amount_updates:
+                await self.set_range(tarif_range.calculation_type, tarif_range.direction_id, tarif.amount,
+                                     tarif.amount, tarif.price, 0, db)
             await db.commit()
+            tarif_index.invalidate()
         except IntegrityError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=str(e._message))
@@ -0,0 +1,184 @@
+import math
+import time
+from array import array
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from src.config import settings
+from src.database import async_session
+from src.orders.models import DeliveryType
+from src.tarifs.models import CalculationType, Tarifs
+
+TARIF_LIMIT = 100
+MISSING_PRICE = math.nan
+
+
+def build_price_table(ranges: list) -> array:
+    """Expands tariff ranges into an array of prices indexed by amount, NaN for gaps.
+
+    Earlier ranges win where ranges overlap.
+    """
+    size = max((tarif.end_amount for tarif in ranges), default=-1) + 1
+    table = array("d", [MISSING_PRICE]) * size
+    for tarif in reversed(ranges):
+        for amount in range(tarif.start_amount, tarif.end_amount + 1):
+            table[amount] = tarif.price + (amount - tarif.start_amount) * tarif.increment
+    return table
+
+
+def lookup_price(table: array, amount: float) -> float | None:
+    index = math.ceil(amount)
+    if 0 <= index < len(table) and not math.isnan(table[index]):
+        return table[index]
+    return None
+
+
+@dataclass(frozen=True)
+class DirectionTarifs:
+    weight: array
+    handling: array
+    volume_price: float | None
+    weight_limit_price: float
+    handling_limit_price: float
+
+
+@dataclass(frozen=True)
+class DeliveryTarifs:
+    weight: array
+    volume: array
+
+
+class TarifIndex:
+    """In-memory price tables used to quote orders without hitting the database.
+
+    Tables are loaded per direction on first use; those of directions that
+    have tariffs are kept for TARIF_INDEX_TTL seconds. TarifService and
+    DirectionService invalidate the index of the worker that handled the
+    edit; other workers pick the change up once their entries expire.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._directions: dict[int, tuple[float, DirectionTarifs]] = {}
+        self._delivery: tuple[float, DeliveryTarifs] | None = None
+
+    def invalidate(self, direction_id: int | None = None):
+        # delivery tariffs are shared by all directions, so any edit drops them
+        self._delivery = None
+        if direction_id is None:
+            self._directions.clear()
+        else:
+            self._directions.pop(direction_id, None)
+
+    async def get_directions(self, direction_ids: set[int]) -> dict[int, DirectionTarifs]:
+        now = time.monotonic()
+        directions = {
+            direction_id: self._directions[direction_id][1] for direction_id in direction_ids
+            if direction_id in self._directions and self._directions[direction_id][0] > now
+        }
+        missing = direction_ids - directions.keys()
+        if not missing:
+            return directions
+        async with async_session() as session:
+            rows = await session.execute(select(
+                Tarifs.direction_id, Tarifs.calculation_type, Tarifs.start_amount, Tarifs.end_amount,
+                Tarifs.price, Tarifs.increment, Tarifs.is_limit
+            ).where(
+                Tarifs.direction_id.in_(missing),
+                Tarifs.calculation_type.in_([CalculationType.WEIGHT, CalculationType.HANDLING, CalculationType.VOLUME])
+            ).order_by(Tarifs.start_amount))
+            rows = rows.all()
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row.direction_id, []).append(row)
+        expires_at = time.monotonic() + self.ttl
+        for direction_id, direction_rows in grouped.items():
+            directions[direction_id] = self._build_direction(direction_rows)
+            self._directions[direction_id] = (expires_at, directions[direction_id])
+        # ids come from clients, only directions that have tariffs are kept
+        empty = self._build_direction([])
+        for direction_id in missing - grouped.keys():
+            directions[direction_id] = empty
+        return directions
+
+    @staticmethod
+    def _build_direction(rows) -> DirectionTarifs:
+        prices = {CalculationType.WEIGHT: [], CalculationType.HANDLING: []}
+        limits = {CalculationType.WEIGHT: 0, CalculationType.HANDLING: 0}
+        volume_price = None
+        for row in rows:
+            calculation_type = CalculationType(row.calculation_type)
+            if calculation_type == CalculationType.VOLUME:
+                if volume_price is None and not row.is_limit:
+                    volume_price = row.price
+            elif row.is_limit:
+                limits[calculation_type] = row.price
+            else:
+                prices[calculation_type].append(row)
+        return DirectionTarifs(
+            weight=build_price_table(prices[CalculationType.WEIGHT]),
+            handling=build_price_table(prices[CalculationType.HANDLING]),
+            volume_price=volume_price,
+            weight_limit_price=limits[CalculationType.WEIGHT],
+            handling_limit_price=limits[CalculationType.HANDLING]
+        )
+
+    async def get_delivery(self) -> DeliveryTarifs:
+        if self._delivery is not None and self._delivery[0] > time.monotonic():
+            return self._delivery[1]
+        async with async_session() as session:
+            rows = await session.execute(select(
+                Tarifs.calculation_type, Tarifs.start_amount, Tarifs.end_amount, Tarifs.price, Tarifs.increment
+            ).where(
+                Tarifs.calculation_type.in_([CalculationType.DELIVERY_WEIGHT, CalculationType.DELIVERY_VOLUME])
+            ).order_by(Tarifs.id))
+            rows = rows.all()
+        # delivery prices are looked up by amount only; the oldest row wins on overlaps
+        delivery = DeliveryTarifs(
+            weight=build_price_table([row for row in rows if row.calculation_type == CalculationType.DELIVERY_WEIGHT]),
+            volume=build_price_table([row for row in rows if row.calculation_type == CalculationType.DELIVERY_VOLUME])
+        )
+        self._delivery = (time.monotonic() + self.ttl, delivery)
+        return delivery
+
+    def price(self, direction_id: int, direction: DirectionTarifs, delivery: DeliveryTarifs, total_weight: float,
+              total_volume: float, cargo_pickup_type: str | None = None, delivery_type: str | None = None) -> float:
+        max_price_for_delivery = max(lookup_price(delivery.weight, total_weight) or 0,
+                                     lookup_price(delivery.volume, total_volume) or 0)
+        extra_cargo_cost = max_price_for_delivery if cargo_pickup_type == DeliveryType.DELIVERY.value else 0
+        extra_delivery_cost = max_price_for_delivery if delivery_type == DeliveryType.DELIVERY.value else 0
+
+        extra_costs = 0
+        if total_weight > TARIF_LIMIT:
+            extra_costs = (total_weight - TARIF_LIMIT) * (direction.weight_limit_price + direction.handling_limit_price)
+            total_weight = TARIF_LIMIT
+        weight_price = lookup_price(direction.weight, total_weight)
+        handling_price = lookup_price(direction.handling, total_weight)
+        if weight_price is None or handling_price is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Укажите ценовой диапазон для текущего направления {direction_id} и weight_amount {total_weight}")
+        volume_price = direction.volume_price * total_volume if direction.volume_price is not None else 0
+        tarif_price = max(volume_price, weight_price) + handling_price
+        return tarif_price + extra_costs + extra_cargo_cost + extra_delivery_cost
+
+    async def quote(self, direction_id: int, total_weight: float = 0, total_volume: float = 0,
+                    cargo_pickup_type: str | None = None, delivery_type: str | None = None) -> float:
+        directions = await self.get_directions({direction_id})
+        delivery = await self.get_delivery()
+        return self.price(direction_id, directions[direction_id], delivery, total_weight, total_volume, cargo_pickup_type, delivery_type)
+
+    async def quote_many(self, quotes: list[tuple[int, float, float, str | None, str | None]]) -> list[float]:
+        """Prices (direction_id, weight, volume, cargo_pickup_type, delivery_type) tuples."""
+        directions = await self.get_directions({quote[0] for quote in quotes})
+        delivery = await self.get_delivery()
+        return [
+            self.price(direction_id, directions[direction_id], delivery, total_weight, total_volume,
+                       cargo_pickup_type, delivery_type)
+            for direction_id, total_weight, total_volume, cargo_pickup_type, delivery_type in quotes
+        ]
+
+
+tarif_index = TarifIndex(ttl=settings.TARIF_INDEX_TTL)
@@ -1,5 +1,5 @@
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import get_db
@@ -17,8 +17,8 @@ async def create_transportation_type(transportation_type: TransportationTypeBase
 
 
 @router.get("/transportation_types")
-async def get_transportation_types(db: AsyncSession = Depends(get_db)):
-    return await transportation_type_service.get_all(db)
+async def get_transportation_types(request: Request):
+    return (await transportation_type_service.get_reference()).to_response(request)
 
 
 @router.get("/transportation_types/{id}")
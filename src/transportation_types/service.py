@@ -1,6 +1,7 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.common.cache import ReferenceData, reference_cache
 from src.dao.base import BaseDao
 from src.database import get_db
 from src.transportation_types.models import TransportationTypeDB
@@ -14,20 +15,26 @@ class TransportationTypeService(BaseDao):
         types = await TransportationTypeService.find_all({})
         return types
 
+    async def get_reference(self) -> ReferenceData:
+        return await reference_cache.get("transportation_types", ("transportation_types",), self.get_all)
+
     async def get_by_id(self, id: int, db: AsyncSession = Depends(get_db)):
         type = await TransportationTypeService.find_by_id(id)
         return type
 
     async def create_transportation_type(self, transportation_type: TransportationTypeBase, db: AsyncSession = Depends(get_db)):
         type = await TransportationTypeService.add(transportation_type.dict())
+        reference_cache.bump("transportation_types")
         return type
 
     async def update_transportation_type(self, id: int, transportation_type: TransportationTypeBase, db: AsyncSession = Depends(get_db)):
         type = await TransportationTypeService.update(id, transportation_type.dict())
+        reference_cache.bump("transportation_types")
         return type
 
     async def delete_transportation_type(self, id: int, db: AsyncSession = Depends(get_db)):
         type = await TransportationTypeService.delete({"id": id})
+        reference_cache.bump("transportation_types")
         return type
 
 
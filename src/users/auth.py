@@ -10,6 +10,9 @@ from passlib.context import CryptContext
 from src.config import settings
 from src.dao.base import BaseDao
 from src.users.models import Users
+from src.users.principal import (Principal, current_principal,
+                                 group_permissions_cache,
+                                 principal_from_claims)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -32,6 +35,21 @@ async def create_access_token(data: dict) -> str:
     return encoded_jwt
 
 
+async def create_user_access_token(user: Users) -> str:
+    group = await group_permissions_cache.get_group(user.group_id)
+    return await create_access_token({
+        "user_id": str(user.id),
+        "group_id": user.group_id,
+        "warehouse_id": user.warehouse_id,
+        "city": user.city,
+        "direction_id": user.direction_id,
+        "is_superuser": bool(user.is_superuser),
+        "is_direction_user": bool(user.is_direction_user),
+        "pv": group.version,
+        "uv": user.auth_version
+    })
+
+
 def decodeJWT(token: str) -> dict:
     try:
         decoded_token = jwt.decode(token, settings.SECRET_KEY, settings.ALGORITHM)
@@ -55,21 +73,26 @@ class JWTBearer(HTTPBearer, BaseDao):
                 raise HTTPException(
                     status_code=401, detail="Invalid authentication scheme."
                 )
-            if not self.verify_jwt(credentials.credentials):
-                raise HTTPException(
-                    status_code=401, detail="Invalid token or expired token."
-                )
-            payload = decodeJWT(credentials.credentials)
-            return await JWTBearer.find_one_or_none({"id": int(payload.get("user_id"))})
+            principal = getattr(request.state, "principal", None)
+            if principal is None or principal.token != credentials.credentials:
+                payload = decodeJWT(credentials.credentials)
+                if not payload:
+                    raise HTTPException(
+                        status_code=401, detail="Invalid token or expired token."
+                    )
+                if settings.STATELESS_AUTH and "pv" in payload:
+                    principal = await principal_from_claims(payload, credentials.credentials)
+                    if principal is None:
+                        raise HTTPException(
+                            status_code=401, detail="Invalid token or expired token."
+                        )
+                else:
+                    user = await JWTBearer.find_one_or_none({"id": int(payload.get("user_id"))})
+                    if user is None:
+                        return None
+                    principal = Principal(user, credentials.credentials)
+                request.state.principal = principal
+            current_principal.set(principal)
+            return principal.user
         else:
             raise HTTPException(status_code=401, detail="Invalid authorization code.")
-
-    def verify_jwt(self, jwtoken: str) -> bool:
-        isTokenValid: bool = False
-        try:
-            payload = decodeJWT(jwtoken)
-        except BaseException:
-            payload = None
-        if payload:
-            isTokenValid = True
-        return isTokenValid
@@ -1,8 +1,8 @@
 from enum import Enum
 
-from sqlalchemy import (DECIMAL, Boolean, Column, Float, ForeignKey, Integer,
-                        String, Table, UniqueConstraint, text)
-from sqlalchemy.orm import relationship
+from sqlalchemy import (DECIMAL, Boolean, Column, Float, ForeignKey, Index,
+                        Integer, String, Table, Text, UniqueConstraint, text)
+from sqlalchemy.orm import deferred, relationship
 
 from src.common.models import TimestampMixin
 from src.database import Base
@@ -15,6 +15,7 @@ class Group(Base):
     name = Column(String(150), comment="group name")
     name_ru = Column(String(150), nullable=True,
                      comment="group name in English")
+    permissions_version = Column(Integer, nullable=False, server_default=text('0'))
     user = relationship("Users", back_populates="group", )
     permissions = relationship(
         "Permission",
@@ -94,10 +95,16 @@ class Users(Base):
         "ReviewsDriver",
         back_populates="creator",
         foreign_keys=ReviewsDriver.creator_id)
-    selected_orders = Column(Integer, default=0)
-    total_profit = Column(Float, default=0)
-    delivered_orders = Column(Integer, default=0)
     orders = relationship("UsersOrders", back_populates="user")
+    # bumped by a database trigger when anything a stateless token carries changes
+    auth_version = Column(Integer, nullable=False, server_default=text('0'))
+    # text matched by the search query param, filled in by database triggers
+    search_document = deferred(Column(Text, nullable=True))
+
+    __table_args__ = (
+        Index("ix_users_search_document", "search_document", postgresql_using="gin",
+              postgresql_ops={"search_document": "gin_trgm_ops"}),
+    )
 
     @property
     def full_name(self):
@@ -1,34 +1,24 @@
 from fastapi import Depends
-from sqlalchemy import select
 
 from src.database import get_db
 from src.exceptions import PermissionDenied
 from src.users.auth import JWTBearer
-from src.users.models import Users
-from src.users.service import permission_service
+from src.users.principal import get_principal
 
 
 async def user_has_permissions(db, user_id: int, need_permissions: list[str]):
-    permissions = {permission.codename for permission in await permission_service.get_permissions(user_id=user_id, db=db)}
-    user = select(Users).where(Users.id == user_id)
-    user = await db.execute(user)
-    user = user.scalar_one()
-    if user.is_superuser or user.is_direction_user:
+    principal = await get_principal(db, user_id)
+    if principal.is_privileged:
         return
-    if not set(need_permissions).issubset(set(permissions)):
+    if not await principal.has_permissions(need_permissions):
         raise PermissionDenied
 
 
 async def if_user_has_permissions(db, user_id: int, need_permissions: list[str]) -> bool:
-    permissions = {permission.codename for permission in await permission_service.get_permissions(user_id=user_id, db=db)}
-    user = select(Users).where(Users.id == user_id)
-    user = await db.execute(user)
-    user = user.scalar_one()
-    if user.is_superuser or user.is_direction_user:
+    principal = await get_principal(db, user_id)
+    if principal.is_privileged:
         return False
-    if set(need_permissions).issubset(set(permissions)):
-        return True
-    return False
+    return await principal.has_permissions(need_permissions)
 
 
 class PermsRequired:
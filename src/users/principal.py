@@ -0,0 +1,167 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import settings
+from src.database import async_session
+from src.users.models import Group, Users, auth_group_permission
+
+
+@dataclass(frozen=True)
+class GroupPermissions:
+    permissions: frozenset[str]
+    # None when the user has no group or the group was deleted
+    version: int | None
+
+
+NO_GROUP = GroupPermissions(permissions=frozenset(), version=None)
+
+
+class GroupPermissionsCache:
+    """Process-wide cache of group id -> permission codenames and version.
+
+    GroupService invalidates entries of the worker that handled the edit;
+    other workers pick the change up once the entry expires.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: dict[int, tuple[float, GroupPermissions]] = {}
+
+    async def get_group(self, group_id: int | None) -> GroupPermissions:
+        if group_id is None:
+            return NO_GROUP
+        entry = self._entries.get(group_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        async with async_session() as session:
+            row = await session.execute(
+                select(
+                    Group.permissions_version,
+                    func.array_remove(func.array_agg(auth_group_permission.c.codename), None)
+                ).outerjoin(
+                    auth_group_permission, auth_group_permission.c.group_id == Group.id
+                ).where(Group.id == group_id).group_by(Group.id))
+            row = row.first()
+        group = GroupPermissions(permissions=frozenset(row[1]), version=row[0]) if row else NO_GROUP
+        self._entries[group_id] = (time.monotonic() + self.ttl, group)
+        return group
+
+    async def get(self, group_id: int | None) -> frozenset[str]:
+        return (await self.get_group(group_id)).permissions
+
+    def invalidate(self, group_id: int | None = None):
+        if group_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(group_id, None)
+
+
+group_permissions_cache = GroupPermissionsCache(ttl=settings.PERMISSIONS_CACHE_TTL)
+
+
+class UserAuthVersionCache:
+    """Process-wide cache of user id -> auth version, None for deleted or inactive users.
+
+    A trigger on users bumps the version whenever a field carried by the
+    token, the password or the active flag changes. UserService invalidates
+    entries of the worker that handled the edit; other workers pick the
+    change up once the entry expires.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: dict[int, tuple[float, int | None]] = {}
+
+    async def get(self, user_id: int) -> int | None:
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        async with async_session() as session:
+            version = await session.scalar(select(Users.auth_version).where(
+                Users.id == user_id, Users.is_active.is_not(False), Users.is_delete.is_not(True)))
+        self._entries[user_id] = (time.monotonic() + self.ttl, version)
+        return version
+
+    def invalidate(self, user_id: int | None = None):
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+
+user_auth_cache = UserAuthVersionCache(ttl=settings.PERMISSIONS_CACHE_TTL)
+
+
+class Principal:
+    """The authenticated user of the current request with its permission set."""
+
+    def __init__(self, user: Users, token: str | None = None):
+        self.user = user
+        self.token = token
+        self._permissions: frozenset[str] | None = None
+
+    @property
+    def is_privileged(self) -> bool:
+        return bool(self.user.is_superuser or self.user.is_direction_user)
+
+    async def get_permissions(self) -> frozenset[str]:
+        if self._permissions is None:
+            self._permissions = await group_permissions_cache.get(self.user.group_id)
+        return self._permissions
+
+    async def has_permissions(self, need_permissions: list[str]) -> bool:
+        return set(need_permissions).issubset(await self.get_permissions())
+
+
+current_principal: ContextVar[Principal | None] = ContextVar("current_principal", default=None)
+
+
+def principal_for(user: Users) -> Principal:
+    principal = current_principal.get()
+    if principal is not None and principal.user.id == user.id:
+        return principal
+    return Principal(user)
+
+
+async def principal_from_claims(claims: dict, token: str) -> Principal | None:
+    """Builds the principal from a stateless token without loading the user.
+
+    Returns None, which revokes the token, when the group's permission set
+    or the user's auth version changed after the token was issued, or the
+    user was deleted or deactivated.
+
+    The user is a transient ``Users`` carrying only the claims: id,
+    group_id, warehouse_id, city, direction_id, is_superuser and
+    is_direction_user. Everything else (phone, names, device_registration_id)
+    is None, handlers needing it load the user from the database.
+    """
+    group = await group_permissions_cache.get_group(claims.get("group_id"))
+    if group.version != claims.get("pv"):
+        return None
+    user_version = await user_auth_cache.get(int(claims["user_id"]))
+    if user_version is None or user_version != claims.get("uv"):
+        return None
+    user = Users(
+        id=int(claims["user_id"]),
+        group_id=claims.get("group_id"),
+        warehouse_id=claims.get("warehouse_id"),
+        city=claims.get("city"),
+        direction_id=claims.get("direction_id"),
+        is_superuser=claims.get("is_superuser", False),
+        is_direction_user=claims.get("is_direction_user", False)
+    )
+    principal = Principal(user, token)
+    principal._permissions = group.permissions
+    return principal
+
+
+async def get_principal(db: AsyncSession, user_id: int) -> Principal:
+    principal = current_principal.get()
+    if principal is not None and principal.user.id == user_id:
+        return principal
+    user = await db.execute(select(Users).where(Users.id == user_id))
+    return Principal(user.scalar_one())
@@ -3,20 +3,22 @@ import random
 import statistics
 
 from fastapi import Depends, HTTPException, Query, status
-from sqlalchemy import delete, exc, func, or_, select, update
+from sqlalchemy import delete, exc, func, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from src.clients.sendgrid import mail_client
 from src.common.models import SendEmail
+from src.common.search import search_by_document
+from src.common.utils import paginator
 from src.config import settings
 from src.dao.base import BaseDao
 from src.database import async_session, get_db
 from src.exceptions import NotUnique
 from src.geography.models import City, District
 from src.geography.schemas import CityOut, DistrictShortViewSchemas
-from src.users.auth import (JWTBearer, create_access_token, decodeJWT,
+from src.notification.service import notification_service
+from src.users.auth import (JWTBearer, create_user_access_token, decodeJWT,
                             get_password_hash, verify_password)
 from src.users.exceptions import (EmailNotFound, EmailTaken,
                                   InvalidCredentials, UserNotFound)
@@ -32,6 +34,7 @@ from src.users.schemas import (AuthGroupPermissionCreateSchemas,
                                UserPaginated, UserSchemas,
                                UserSetPasswordSchemas, UserUpdateSchemas,
                                UserViewSchemas)
+from src.users.principal import group_permissions_cache, user_auth_cache
 
 
 class EmailCodeService(BaseDao):
@@ -100,6 +103,7 @@ class GroupService(BaseDao):
                 group.name = payload.name
             if payload.name_ru:
                 group.name_ru = payload.name_ru
+            group.permissions_version = Group.permissions_version + 1
             await db.execute(delete(auth_group_permission).where(auth_group_permission.c.group_id == group_id))
             await db.flush()
             if payload.permissions:
@@ -111,6 +115,7 @@ class GroupService(BaseDao):
                                                                         codename=permission.codename)
                     await db.execute(association)
             await db.commit()
+            group_permissions_cache.invalidate(group_id)
             return {"id": group.id, "name": group.name,
                     "permissions": [permission.codename for permission in permissions]}
 
@@ -122,6 +127,7 @@ class GroupService(BaseDao):
             await db.execute(delete(auth_group_permission).where(auth_group_permission.c.group_id == group_id))
             await db.delete(group)
             await db.commit()
+            group_permissions_cache.invalidate(group_id)
             return {"detail": "Group deleted"}
 
 
@@ -154,10 +160,13 @@ class AuthGroupPermissionService(BaseDao):
                 )
                 data = await session.execute(query)
                 inserted_data = data.first()
+                await session.execute(update(Group).where(Group.id == paylaod.group_id).values(
+                    permissions_version=Group.permissions_version + 1))
                 await session.commit()
             except IntegrityError:
                 await session.rollback()
                 raise NotUnique()
+            group_permissions_cache.invalidate(paylaod.group_id)
             return inserted_data
 
     async def bulk_create(self, payload: list[AuthGroupPermissionCreateSchemas], db: AsyncSession = Depends(get_db)):
@@ -165,10 +174,14 @@ class AuthGroupPermissionService(BaseDao):
             group_permissions = [{'group_id': group_permission.group_id,
                                   'codename': group_permission.codename} for group_permission in payload]
             await db.execute(auth_group_permission.insert(), group_permissions)
+            await db.execute(update(Group).where(Group.id.in_({group_permission.group_id for group_permission in payload})).values(
+                permissions_version=Group.permissions_version + 1))
             await db.commit()
         except IntegrityError:
             await db.rollback()
             raise NotUnique()
+        for group_permission in payload:
+            group_permissions_cache.invalidate(group_permission.group_id)
 
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -225,8 +238,8 @@ class UserService(BaseDao):
             subject="Войдите в аккаунт B-Express",
             message=f"Ваш пароль: {password} \n Ссылка для входа: {url}"
         )
-        mail_client.send(send_mail)
         session.add(user)
+        await notification_service.send_email(send_mail, session)
         await session.commit()
         user_dict = user.__dict__
         user_dict['city'] = CityOut(id=city.id, name=city.name)
@@ -237,7 +250,7 @@ class UserService(BaseDao):
         return user_view
 
     async def logout(self, user: Users, db: AsyncSession = Depends(get_db)):
-        user.device_registration_id = None
+        await db.execute(update(Users).where(Users.id == user.id).values(device_registration_id=None))
         await db.commit()
         return {"detail": "User has been logged out"}
 
@@ -265,6 +278,7 @@ class UserService(BaseDao):
             hashed_password=hashed_password))
         await db.execute(stmt)
         await db.commit()
+        user_auth_cache.invalidate(user_id)
         return {"detail": "Password has been updated"}
 
     async def me(self, user: UserViewSchemas) -> UserViewSchemas:
@@ -311,6 +325,7 @@ class UserService(BaseDao):
                 **payload.model_dump(exclude_unset=True, exclude={"city_id"}), city=payload.city_id))
             await db.execute(stmt)
             await db.commit()
+            user_auth_cache.invalidate(user.id)
             await db.refresh(data)
             return payload
         except exc.IntegrityError as e:
@@ -326,6 +341,7 @@ class UserService(BaseDao):
             raise EmailNotFound()
         await db.delete(data)
         await db.commit()
+        user_auth_cache.invalidate(id)
         return data
 
     async def update_user(self, id: int, payload: UserUpdateSchemas, user: UserViewSchemas, db: AsyncSession = Depends(get_db)):
@@ -349,6 +365,7 @@ class UserService(BaseDao):
             )
             await db.execute(stmt)
             await db.commit()
+            user_auth_cache.invalidate(id)
             await db.refresh(data)
             return payload
         except exc.IntegrityError as e:
@@ -395,11 +412,7 @@ class UserService(BaseDao):
         return await self.enrich_user(data, db)
 
     def search(self, users, search: str = None):
-        if search and not search.isspace():
-            users = users.join(City).where(or_(Users.first_name.ilike(f"%{search}%"), Users.last_name.ilike(
-                f"%{search}%"), Users.middle_name.ilike(f"%{search}%"), Users.phone.ilike(f"%{search}%"),
-                Users.email.ilike(f"%{search}%"), City.name.ilike(f"%{search}%")))
-        return users
+        return search_by_document(users, Users.search_document, search)
 
     async def get_users(self, district_id: int = Query(None), group_id: int | None = None, page: int = 1, limit: int = 10, user: UserViewSchemas = None, search: str = None) -> UserPaginated:
         session = async_session()
@@ -409,25 +422,16 @@ class UserService(BaseDao):
         if district_id:
             filtered_users = filtered_users.where(
                 Users.district_id == district_id)
-        filtered_users = self.search(filtered_users, search)
-        result = await session.execute(self.paginate(filtered_users, page, limit))
-        users = result.scalars().all()
-        users_view = [await self.enrich_user(user, session) for user in users]
-        total = await session.execute(filtered_users)
-        total = len(total.scalars().all())
-        pages_number = total // limit
-        if total % limit != 0:
-            pages_number += 1
+        filtered_users = self.search(filtered_users, search).order_by(Users.id)
+        users = await paginator.paginate(session, filtered_users, page, limit)
+        users_view = [await self.enrich_user(user, session) for user in users.items]
         return UserPaginated(
-            total=total,
-            pages_number=pages_number,
+            total=users.total,
+            pages_number=users.pages_number,
             data=users_view,
             page=page,
             limit=limit)
 
-    def paginate(self, users, page: int, limit: int):
-        return users.offset((page - 1) * limit).limit(limit)
-
     async def login(self, payload: UserSchemas) -> dict:
         session = async_session()
         user = await UserService.find_one_or_none({"email": payload.email})
@@ -435,7 +439,7 @@ class UserService(BaseDao):
             raise EmailNotFound()
         if not await verify_password(plain_password=payload.password, hashed_password=user.hashed_password):
             raise InvalidCredentials()
-        access_token = await create_access_token({"user_id": str(user.id)})
+        access_token = await create_user_access_token(user)
         if payload.device_registration_id:
             user.device_registration_id = payload.device_registration_id
             await session.execute(update(Users).where(Users.id == user.id).values(device_registration_id=payload.device_registration_id))
@@ -472,8 +476,11 @@ class UserService(BaseDao):
         user.is_active = True
         hashed_password = await get_password_hash(password=payload.password)
         user.hashed_password = hashed_password
-        access_token = await create_access_token({"user_id": str(user.id)})
         await UserService.update(id=user.id, data=user.to_dict())
+        user_auth_cache.invalidate(user.id)
+        # the update bumped the auth version, the token must carry the new one
+        user = await UserService.find_by_id(user.id)
+        access_token = await create_user_access_token(user)
         return Token(access_token=access_token, token_type="bearer")
 
     async def create_review(self, user_id: int, payload: ReviewsDriverCreateSchema, user: Users = Depends(JWTBearer()), db: AsyncSession = Depends(get_db)) -> ReviewsDriverViewSchema:
@@ -525,7 +532,8 @@ class UserService(BaseDao):
             subject="Восстановление пароля",
             message=message
         )
-        mail_client.send(send_mail)
+        await notification_service.send_email(send_mail, db)
+        await db.commit()
         return {"detail": "Ссылка для восстановления пароля отправлена на вашу почту",
                 "link": forget_url_link, "code": email_code.code, "user_id": user_data.id}
 
@@ -545,6 +553,7 @@ class UserService(BaseDao):
         user.hashed_password = hashed_password
         await db.delete(email_code)
         await db.commit()
+        user_auth_cache.invalidate(user.id)
         return {"detail": "Пароль успешно изменен"}
 
 
@@ -7,7 +7,8 @@ from sqlalchemy import select
 from src.database import async_session
 from src.users.auth import JWTBearer
 from src.users.exceptions import RoleNotFound
-from src.users.models import Users, auth_group_permission
+from src.users.models import Users
+from src.users.principal import principal_for
 
 
 def func_user_has_permissions(need_permissions: List[str] = None) -> Callable:
@@ -25,16 +26,10 @@ def func_user_has_permissions(need_permissions: List[str] = None) -> Callable:
             return user
         if user.group_id is None:
             raise RoleNotFound()
-        async with async_session() as session:
-            for need_permission in need_permissions:
-                query = select(auth_group_permission).where(auth_group_permission.c.group_id == user.group_id).where(
-                    auth_group_permission.c.codename == need_permission)
-                data = await session.execute(query)
-                resp = data.scalars().all()
-                if not resp:
-                    raise HTTPException(
-                        status_code=403, detail="Permission denied")
-            return user
+        if not await principal_for(user).has_permissions(need_permissions):
+            raise HTTPException(
+                status_code=403, detail="Permission denied")
+        return user
 
     return user_has_permission
 
@@ -31,8 +31,7 @@ class WarehouseService(BaseDao):
             query = query.where(Warehouse.city.in_(city_ids))
         execute = await db.execute(query)
         data = execute.scalars().all()
-        response = [await nested_serializer.serialize_by_id(warehouse.id, db) for warehouse in data]
-        return response
+        return await nested_serializer.serialize_many(data, db)
 
     async def get_one(self, id: int, db: AsyncSession = Depends(get_db)) -> WarehouseViewSchemas:
         return await nested_serializer.serialize_by_id(id, db)
@@ -1,5 +1,5 @@
 from fastapi import Depends
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database import async_session, get_db
@@ -22,44 +22,54 @@ class WarehouseViewSerialized:
     async def serialize_by_id(self, id: int, db: AsyncSession = Depends(get_db)) -> WarehouseViewSchemas:
         warehouse_query = await db.execute(select(Warehouse).where(Warehouse.id == id))
         warehouse = warehouse_query.scalar_one_or_none()
+        return (await self.serialize_many([warehouse], db))[0]
 
-        user_model = None
-        user_query = await db.execute(select(Users).where(Users.id == warehouse.warehouse_user))
-        user = user_query.scalar_one_or_none()
-        if user:
-            user_model = UserShortViewSchemas(**user.__dict__)
+    async def serialize_many(self, warehouses: list[Warehouse], db: AsyncSession = Depends(get_db)) -> list[WarehouseViewSchemas]:
+        """Serializes warehouses with one query per related table, whatever their number."""
+        if not warehouses:
+            return []
+        ids = [warehouse.id for warehouse in warehouses]
+        user_ids = {warehouse.warehouse_user for warehouse in warehouses if warehouse.warehouse_user}
+        city_ids = {warehouse.city for warehouse in warehouses}
+        district_ids = {warehouse.district for warehouse in warehouses if warehouse.district}
 
-        city_query = await db.execute(select(City).where(City.id == warehouse.city))
-        city = city_query.scalar_one_or_none()
-        city_model = None
-        if city:
-            city_model = GeographyViewSchemas(**city.__dict__)
+        users = {}
+        if user_ids:
+            users = (await db.execute(select(Users).where(Users.id.in_(user_ids)))).scalars().all()
+            users = {user.id: UserShortViewSchemas(**user.__dict__) for user in users}
+        cities = (await db.execute(select(City).where(City.id.in_(city_ids)))).scalars().all()
+        cities = {city.id: GeographyViewSchemas(**city.__dict__) for city in cities}
+        districts = {}
+        if district_ids:
+            districts = (await db.execute(select(District).where(District.id.in_(district_ids)))).scalars().all()
+            districts = {district.id: district for district in districts}
+        orders_items_numbers = dict((await db.execute(
+            select(OrderItems.warehouse_id, func.count(OrderItems.id)).where(
+                OrderItems.warehouse_id.in_(ids)).group_by(OrderItems.warehouse_id))).all())
+        orders_counts = dict((await db.execute(
+            select(Orders.warehouse_id, func.count(Orders.id)).where(
+                Orders.warehouse_id.in_(ids)).group_by(Orders.warehouse_id))).all())
 
-        district_query = await db.execute(select(District).where(District.id == warehouse.district))
-        district = district_query.scalar_one_or_none()
-        district_model = None
-        if district:
-            district_model = DistrictShortViewSchemas(
-                id=district.id, name=district.name, city=city.id)
-        order_items = await db.execute(select(OrderItems).where(OrderItems.warehouse_id == id))
-        order_items = order_items.scalars().all()
-        orders_items_number = len(order_items)
-        orders = await db.execute(select(Orders).where(Orders.warehouse_id == id))
-        orders = orders.scalars().all()
-        orders_count = len(orders)
-        warehouse_model = WarehouseViewSchemas(
-            id=warehouse.id,
-            address=warehouse.address,
-            name=warehouse.name,
-            city=city_model,
-            warehouse_user=user_model,
-            district=district_model,
-            status=warehouse.status,
-            orders_items_number=orders_items_number,
-            phone=warehouse.phone,
-            orders_count=orders_count
-        )
-        return warehouse_model
+        response = []
+        for warehouse in warehouses:
+            district = districts.get(warehouse.district)
+            district_model = None
+            if district:
+                district_model = DistrictShortViewSchemas(
+                    id=district.id, name=district.name, city=warehouse.city)
+            response.append(WarehouseViewSchemas(
+                id=warehouse.id,
+                address=warehouse.address,
+                name=warehouse.name,
+                city=cities.get(warehouse.city),
+                warehouse_user=users.get(warehouse.warehouse_user),
+                district=district_model,
+                status=warehouse.status,
+                orders_items_number=orders_items_numbers.get(warehouse.id, 0),
+                phone=warehouse.phone,
+                orders_count=orders_counts.get(warehouse.id, 0)
+            ))
+        return response
 
 
 nested_serializer = WarehouseViewSerialized()
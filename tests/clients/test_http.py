@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.clients.http import HttpClient, fan_out
+from src.exceptions import ServiceRejectedRequest, ServiceUnavailable
+
+
+def run_with_stub(handler, test):
+    """Runs ``test(client, calls)`` against a local server answering every POST /send with ``handler``."""
+    calls = []
+
+    async def send(request: web.Request) -> web.Response:
+        calls.append(await request.json())
+        return await handler(request)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/send", send)
+        server = TestServer(app)
+        await server.start_server()
+        client = HttpClient(str(server.make_url("")), timeout=2, failure_threshold=2, reset_timeout=0.2)
+        try:
+            await test(client, calls)
+        finally:
+            await client.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_fan_out_sends_concurrently():
+    async def handler(request):
+        await asyncio.sleep(0.2)
+        return web.Response(text="ok")
+
+    async def test(client, calls):
+        started = time.monotonic()
+        results = await fan_out((client.post("/send", json={"n": n}) for n in range(5)), limit=5)
+        assert time.monotonic() - started < 0.6
+        assert results == [(200, "ok")] * 5
+        assert len(calls) == 5
+
+    run_with_stub(handler, test)
+
+
+def test_client_error_is_raised_without_opening_the_breaker():
+    async def handler(request):
+        return web.Response(status=400, text="invalid phone")
+
+    async def test(client, calls):
+        for _ in range(3):
+            with pytest.raises(ServiceRejectedRequest) as error:
+                await client.post("/send", json={})
+            assert error.value.response_status == 400
+            assert error.value.response_text == "invalid phone"
+        assert client.breaker.opened_at is None
+        assert len(calls) == 3
+
+    run_with_stub(handler, test)
+
+
+def test_breaker_opens_on_server_errors_and_closes_after_a_trial():
+    statuses = [502, 502, 200]
+
+    async def handler(request):
+        return web.Response(status=statuses.pop(0), text="")
+
+    async def test(client, calls):
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                await client.post("/send", json={})
+        # open: fails without reaching the server
+        with pytest.raises(ServiceUnavailable):
+            await client.post("/send", json={})
+        assert len(calls) == 2
+        await asyncio.sleep(0.25)
+        assert await client.post("/send", json={}) == (200, "")
+        assert client.breaker.opened_at is None
+        assert len(calls) == 3
+
+    run_with_stub(handler, test)
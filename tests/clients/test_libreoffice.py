@@ -0,0 +1,71 @@
+import asyncio
+import sys
+
+import pytest
+
+from src.clients.libreoffice import LibreOfficeConverter
+from src.exceptions import DocumentConversionFailed
+
+# stands in for unoserver: answers its XML-RPC calls without LibreOffice
+STUB_SERVER = '''
+import argparse
+import os
+import time
+from xmlrpc.client import Binary
+from xmlrpc.server import SimpleXMLRPCServer
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--port", type=int)
+args, _ = parser.parse_known_args()
+
+
+def convert(inpath, indata, outpath, convert_to, *options):
+    if indata.data == b"hang":
+        time.sleep(60)
+    return Binary(f"{convert_to} from {os.getpid()}: ".encode() + indata.data)
+
+
+server = SimpleXMLRPCServer(("127.0.0.1", args.port), logRequests=False, allow_none=True)
+server.register_function(lambda: {"api": "3", "unoserver": "stub", "import_filters": {}, "export_filters": {}}, "info")
+server.register_function(convert, "convert")
+server.serve_forever()
+'''
+
+
+@pytest.fixture
+def converter(tmp_path, monkeypatch):
+    package = tmp_path / "unoserver"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "server.py").write_text(STUB_SERVER)
+    monkeypatch.setenv("PYTHONPATH", str(tmp_path))
+    return LibreOfficeConverter(python=sys.executable, binary="libreoffice", workers=1, timeout=1, start_timeout=10)
+
+
+def run(converter: LibreOfficeConverter, *documents: bytes) -> list[bytes | Exception]:
+    async def main():
+        results = []
+        try:
+            for data in documents:
+                try:
+                    results.append(await converter.convert(data))
+                except DocumentConversionFailed as e:
+                    results.append(e)
+        finally:
+            await converter.stop()
+        return results
+
+    return asyncio.run(main())
+
+
+def test_jobs_share_one_running_process(converter):
+    first, second = run(converter, b"a", b"b")
+    assert first.startswith(b"pdf from ") and first.endswith(b": a")
+    assert second == first[:-1] + b"b"
+
+
+def test_stuck_conversion_restarts_the_process(converter):
+    before, stuck, after = run(converter, b"a", b"hang", b"b")
+    assert isinstance(stuck, DocumentConversionFailed)
+    assert after.endswith(b": b")
+    assert after.split(b":")[0] != before.split(b":")[0]
@@ -0,0 +1,37 @@
+import io
+
+import docx
+
+from src.common.documents import DocxTemplate
+
+
+def make_template(tmp_path, runs: list[str]) -> DocxTemplate:
+    document = docx.Document()
+    paragraph = document.add_paragraph()
+    for text in runs:
+        paragraph.add_run(text)
+    path = tmp_path / "template.docx"
+    document.save(path)
+    return DocxTemplate(str(path))
+
+
+def rendered_text(data: bytes) -> str:
+    return "\n".join(paragraph.text for paragraph in docx.Document(io.BytesIO(data)).paragraphs)
+
+
+def test_placeholder_split_between_braces(tmp_path):
+    template = make_template(tmp_path, ["Код: {", "{otp_code}}", "."])
+    assert rendered_text(template.render({"otp_code": "4821"})) == "Код: 4821."
+
+
+def test_placeholder_split_across_runs_keeps_the_run_formatting(tmp_path):
+    template = make_template(tmp_path, ["{{ful", "l_name}", "} ", "<b>"])
+    data = template.render({"full_name": "Иванов & Ко"})
+    assert rendered_text(data) == "Иванов & Ко <b>"
+    runs = docx.Document(io.BytesIO(data)).paragraphs[0].runs
+    assert [run.text for run in runs] == ["Иванов & Ко", "", " ", "<b>"]
+
+
+def test_placeholder_without_value_is_left_as_written(tmp_path):
+    template = make_template(tmp_path, ["{{", "date}}"])
+    assert rendered_text(template.render({})) == "{{date}}"
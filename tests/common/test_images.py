@@ -0,0 +1,19 @@
+import io
+
+from PIL import Image
+
+from src.common.images import render_image
+from src.common.models import ImageRendition
+
+
+def test_render_16_bit_grayscale_png():
+    buffer = io.BytesIO()
+    Image.new("I;16", (1000, 1000), 40000).save(buffer, format="PNG")
+    renditions = render_image(buffer.getvalue(), "png")
+
+    medium = Image.open(io.BytesIO(renditions[ImageRendition.MEDIUM]))
+    assert medium.size == (800, 800)
+    assert medium.getpixel((0, 0)) == 40000
+    thumbnail = Image.open(io.BytesIO(renditions[ImageRendition.THUMBNAIL]))
+    assert (thumbnail.format, thumbnail.mode, thumbnail.size) == ("WEBP", "RGB", (200, 200))
+    assert thumbnail.getpixel((0, 0)) == (156, 156, 156)
@@ -0,0 +1,109 @@
+import asyncio
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+MIGRATION = Path(__file__).parents[2] / "migration" / "versions" / "f2a8d5c61e07_add_courier_daily_counters.py"
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="needs a PostgreSQL database in TEST_DATABASE_URL")
+
+# the tables the migration reads, as they were before it
+SCHEMA = """
+CREATE TABLE users (
+    id integer PRIMARY KEY,
+    selected_orders integer DEFAULT 0,
+    delivered_orders integer DEFAULT 0,
+    total_profit double precision DEFAULT 0
+);
+CREATE TABLE orders (
+    id integer PRIMARY KEY,
+    courier integer REFERENCES users (id),
+    direction_id integer,
+    order_status varchar NOT NULL,
+    created_at timestamp,
+    updated_at timestamp
+);
+CREATE TABLE payments (id serial PRIMARY KEY, order_id integer NOT NULL REFERENCES orders (id), amount integer NOT NULL);
+CREATE TABLE users_orders (
+    id serial PRIMARY KEY,
+    user_id integer NOT NULL REFERENCES users (id),
+    order_id integer NOT NULL REFERENCES orders (id),
+    status varchar NOT NULL,
+    created_at timestamp,
+    updated_at timestamp
+);
+CREATE TABLE action_history (
+    id serial PRIMARY KEY,
+    order_id integer REFERENCES orders (id),
+    courier_id integer REFERENCES users (id),
+    action_code varchar NOT NULL,
+    created_at timestamp
+);
+"""
+
+# what the old code left behind: counters on users, no DELIVERED rows in users_orders
+DATA = """
+INSERT INTO users (id, selected_orders, delivered_orders, total_profit) VALUES (1, 2, 2, 3500), (2, 1, 1, 700), (3, 0, 0, 0);
+INSERT INTO orders (id, courier, direction_id, order_status, created_at, updated_at) VALUES
+    (10, 1, 5, 'DELIVERED', '2024-05-01 10:00', '2024-05-03 12:00'),
+    (11, 1, NULL, 'DELIVERED', '2024-05-02 10:00', '2024-05-04 12:00'),
+    (12, 2, 5, 'NOT_DELIVERED', '2024-05-02 11:00', '2024-05-06 12:00'),
+    (13, 3, 5, 'DELIVERING_TO_RECIPIENT', '2024-05-02 11:00', '2024-05-06 12:00');
+INSERT INTO payments (order_id, amount) VALUES (10, 1000), (11, 2500), (12, 700), (13, 900);
+INSERT INTO users_orders (user_id, order_id, status, created_at) VALUES
+    (1, 10, 'COURIER_DELIVERING_TO_WAREHOUSE', '2024-05-01 11:00'),
+    (1, 11, 'COURIER_DELIVERING_TO_WAREHOUSE', '2024-05-02 11:00'),
+    (2, 12, 'ACCEPTED_TO_WAREHOUSE', '2024-05-02 12:00');
+-- order 12 was delivered, then its status was changed back
+INSERT INTO action_history (order_id, courier_id, action_code, created_at) VALUES
+    (10, 1, 'DELIVERED', '2024-05-03 12:00'),
+    (12, 2, 'DELIVERED', '2024-05-05 12:00');
+"""
+
+
+def upgrade(connection):
+    spec = importlib.util.spec_from_file_location("courier_daily_counters_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(connection)):
+        migration.upgrade()
+
+
+def test_counters_keep_the_totals_of_the_dropped_columns():
+    async def main():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.connect() as connection:
+                await connection.execute(text("DROP SCHEMA IF EXISTS courier_counters_test CASCADE"))
+                await connection.execute(text("CREATE SCHEMA courier_counters_test"))
+                await connection.execute(text("SET search_path TO courier_counters_test"))
+                for statement in (SCHEMA + DATA).split(";"):
+                    if statement.strip():
+                        await connection.execute(text(statement))
+                old_totals = (await connection.execute(text(
+                    "SELECT id, selected_orders, delivered_orders, total_profit FROM users ORDER BY id"))).all()
+
+                await connection.run_sync(upgrade)
+
+                new_totals = (await connection.execute(text(
+                    """
+                    SELECT users.id, coalesce(sum(selected_orders), 0), coalesce(sum(delivered_orders), 0),
+                           coalesce(sum(total_profit), 0)
+                    FROM users LEFT OUTER JOIN courier_daily_counters ON courier_daily_counters.courier_id = users.id
+                    GROUP BY users.id ORDER BY users.id
+                    """))).all()
+                await connection.execute(text("DROP SCHEMA courier_counters_test CASCADE"))
+                await connection.commit()
+        finally:
+            await engine.dispose()
+        assert [tuple(row) for row in new_totals] == [(id, selected, delivered, int(profit))
+                                                       for id, selected, delivered, profit in old_totals]
+
+    asyncio.run(main())